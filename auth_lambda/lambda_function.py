@@ -1,10 +1,15 @@
 import json
-import os
-import pymysql
+import db
 from configparser import ConfigParser
 import bcrypt
-import uuid
-import datetime
+import token_auth
+
+# Load configuration once per container
+config_file = 'auth_config.ini'
+configur = ConfigParser()
+configur.read(config_file)
+token_auth.configure(configur)
+TOKEN_FORMAT = configur.get("auth", "token_format", fallback="opaque")
 
 def hash_password(password):
     return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
@@ -12,44 +17,30 @@ def hash_password(password):
 def check_password(password, hashed):
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
-def generate_token():
-    return str(uuid.uuid4())
-
 def validate_token(dbConn, token):
     """
     Validates an authentication token and checks if it has expired.
+    The rules live in the shared token_auth layer so handlers can apply them in-process.
     """
     try:
-        with dbConn.cursor() as cursor:
-            sql = "SELECT userId, expiration_utc FROM Tokens WHERE token = %s"
-            cursor.execute(sql, (token,))
-            user = cursor.fetchone()
-
-            if not user:
-                response = {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token", "loggedOut": True})}
-                print("Auth Lambda Response:", response)
-                return response
+        user_id, error = token_auth.check_token(dbConn, token)
 
-            # Check if the token is expired
-            import datetime
-            current_time = datetime.datetime.utcnow()
-            expiration_time = user["expiration_utc"]
-
-            if expiration_time < current_time:
-                response = {"statusCode": 401, "body": json.dumps({"error": "Session expired. Please log in again.", "loggedOut": True})}
-                print("Auth Lambda Response:", response)
-                return response
-
-            response = {"statusCode": 200, "body": json.dumps({"userId": user["userId"]})}
+        if error:
+            response = {"statusCode": 401, "body": json.dumps(error)}
             print("Auth Lambda Response:", response)
             return response
+
+        response = {"statusCode": 200, "body": json.dumps({"userId": user_id})}
+        print("Auth Lambda Response:", response)
+        return response
     except Exception as e:
         print("**ERROR in Token Validation**", str(e))
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
 
-def authenticate_user(dbConn, username, password, duration):
+def authenticate_user(dbConn, username, password, duration, token_format="opaque"):
     """
     Authenticates user and returns a token.
+    token_format "signed" issues a stateless signed token instead of a Tokens row.
     """
     try:
         with dbConn.cursor() as cursor:
@@ -69,14 +60,8 @@ def authenticate_user(dbConn, username, password, duration):
                 print("Auth Lambda Response:", response)
                 return response
 
-            # Generate Token
-            token = generate_token()
-            expiration_utc = datetime.datetime.utcnow() + datetime.timedelta(minutes=duration)
-
-            # Store token in database
-            sql = "INSERT INTO Tokens (token, userId, expiration_utc) VALUES (%s, %s, %s)"
-            cursor.execute(sql, (token, user["userId"], expiration_utc))
-            dbConn.commit()
+            # Generate and store token
+            token = token_auth.issue_token(dbConn, user["userId"], duration, token_format)
 
             response = {"statusCode": 200, "body": json.dumps({"token": token})}
             print("Auth Lambda Response:", response)
@@ -90,19 +75,13 @@ def lambda_handler(event, context):
     try:
         print("** Lambda Auth Handler **")
         
-        # Load configuration
-        config_file = 'auth_config.ini'
-        configur = ConfigParser()
-        configur.read(config_file)
-        
-        # Configure RDS connection
-        dbConn = pymysql.connect(
-            host=configur.get('rds', 'endpoint'),
-            user=configur.get('rds', 'user_name'),
-            password=configur.get('rds', 'user_pwd'),
-            database=configur.get('rds', 'db_name'),
-            port=int(configur.get('rds', 'port_number')),
-            cursorclass=pymysql.cursors.DictCursor
+        # Reuse this container's RDS connection
+        dbConn = db.get_connection(
+            configur.get('rds', 'endpoint'),
+            configur.get('rds', 'user_name'),
+            configur.get('rds', 'user_pwd'),
+            configur.get('rds', 'db_name'),
+            int(configur.get('rds', 'port_number'))
         )
 
         # Parse request body
@@ -118,7 +97,7 @@ def lambda_handler(event, context):
         elif "username" in body and "password" in body:
             print(f"** Authenticating User: {body['username']} **")
             duration = body.get("duration", 30)  # Default to 30 minutes
-            return authenticate_user(dbConn, body["username"], body["password"], duration)
+            return authenticate_user(dbConn, body["username"], body["password"], duration, TOKEN_FORMAT)
         else:
             print("** ERROR: Missing credentials in request **")
             return {"statusCode": 400, "body": json.dumps({"error": "Missing credentials in request"})}
@@ -129,5 +108,4 @@ def lambda_handler(event, context):
 
     finally:
         if dbConn:
-            dbConn.close()
-            print("** Database Connection Closed **")
+            db.release(dbConn)
@@ -1,6 +1,9 @@
 import requests
 import json
+import re
+import difflib
 import sys
+import os
 from configparser import ConfigParser
 
 # Load Config
@@ -9,6 +12,10 @@ config.read("api_config.ini")
 
 BASE_URL = config["api"]["base_url"]
 
+# Dashboard paging: snippets per page, and the last (ETag, page) seen for each page
+DASHBOARD_PAGE_SIZE = 20
+_dashboard_cache = {}
+
 # =============================== UTILITY FUNCTIONS ===============================
 def get_headers(token=None, require_auth=True):
     """Return headers for API requests, including Authorization if required."""
@@ -19,6 +26,19 @@ def get_headers(token=None, require_auth=True):
         print("Warning: No token provided in request headers!")
     return headers
 
+def split_lines(text):
+    """Split on "\n" only, keeping line endings (the server splits patches the same way)."""
+    return [line for line in re.split(r"(?<=\n)", text) if line]
+
+def make_patch(old_text, new_text):
+    """Return a unified diff from old_text to new_text, marking a missing final newline like diff -u."""
+    patch = []
+    for line in difflib.unified_diff(split_lines(old_text), split_lines(new_text), n=2):
+        patch.append(line)
+        if not line.endswith("\n"):
+            patch.append("\n\\ No newline at end of file\n")
+    return "".join(patch)
+
 # =============================== API FUNCTIONS ===============================
 def create_account():
     """Send a request to create a new account."""
@@ -74,22 +94,45 @@ def download_snippet(token):
     data = response.json()
 
     if response.status_code == 200:
-        print("Snippet downloaded successfully.")
+        print(f"Snippet downloaded successfully (downloaded about {data.get('downloadCount', 0)} times before).")
         print("\n=== Snippet Content ===\n")
         print(data["content"])
     else:
         print(f"Download failed: {data.get('error', 'Unknown error')}")
 
 def update_snippet(token):
-    """Update an existing snippet by file name."""
+    """Update an existing snippet by file name, refusing to overwrite someone else's newer edit."""
     file_name = input("Enter filename: ").strip()
-    new_content = input("Enter new snippet content:\n")
+    if not file_name:
+        print("File name is required.")
+        return
 
-    if not file_name or not new_content:
-        print("File name and content are required.")
+    # Fetch the current version (not counted as a download); the update is only applied if nobody changes it meanwhile
+    url = f"{BASE_URL}{config['snippets']['download']}"
+    response = requests.post(url, json={"fileName": file_name, "mode": "edit"}, headers=get_headers(token))
+    data = response.json()
+    if response.status_code != 200:
+        print(f"Update failed: {data.get('error', 'Unknown error')}")
         return
+    if data["clientEncrypted"]:
+        print(f"\nThis snippet (version {data['version']}) is encrypted client-side; its new content will be stored server-encrypted.")
+    else:
+        print(f"\n=== Current content (version {data['version']}) ===\n")
+        print(data["content"])
 
-    payload = {"fileName": file_name, "fileContent": new_content}
+    new_content = input("Enter new snippet content:\n")
+    if not new_content:
+        print("Content is required.")
+        return
+
+    # Send only the changes when that is smaller than the new content
+    payload = {"fileName": file_name, "baseVersion": data["version"]}
+    patch = make_patch(data["content"], new_content) if not data["clientEncrypted"] else None
+    if patch and len(patch.encode()) < len(new_content.encode()):
+        payload["patch"] = patch
+        print(f"Sending a {len(patch.encode())}-byte patch instead of {len(new_content.encode())} bytes.")
+    else:
+        payload["fileContent"] = new_content
     url = f"{BASE_URL}{config['snippets']['update']}"
 
     response = requests.put(url, json=payload, headers=get_headers(token))
@@ -98,6 +141,8 @@ def update_snippet(token):
     if response.status_code == 200:
         print("Snippet updated successfully.")
         print(response.json())
+    elif response.status_code == 409:
+        print("Update rejected: someone else changed this snippet after you opened it. Download it again and reapply your edit.")
     else:
         try:
             error = response.json().get("error", "Unknown error")
@@ -105,6 +150,83 @@ def update_snippet(token):
             error = "Unknown error"
         print(f"Update failed: {error}")
 
+def get_client_cipher():
+    """Return a Fernet cipher for the client-side key in api_config.ini, or None if none is set."""
+    client_key = config.get("encryption", "client_key", fallback=None)
+    if not client_key:
+        print("Direct transfers need a client_key in the [encryption] section of api_config.ini.")
+        print("Generate one with: python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\"")
+        return None
+    from cryptography.fernet import Fernet
+    return Fernet(client_key.encode())
+
+def direct_upload_snippet(token):
+    """Encrypt a local file with the client key and upload it straight to S3."""
+    cipher = get_client_cipher()
+    if not cipher:
+        return
+    path = input("Enter path of the file to upload: ").strip()
+    file_name = input("Enter file name to store it as (blank = same as the file): ").strip() or os.path.basename(path)
+
+    try:
+        with open(path, "rb") as f:
+            encrypted_data = cipher.encrypt(f.read())
+    except OSError as e:
+        print(f"Could not read {path}: {e}")
+        return
+
+    url = f"{BASE_URL}{config['snippets']['upload']}"
+    response = requests.post(url, json={"fileName": file_name, "mode": "presigned"}, headers=get_headers(token))
+    data = response.json()
+    if response.status_code != 200:
+        print(f"Upload failed: {data.get('error', 'Unknown error')}")
+        return
+    if len(encrypted_data) > data["maxBytes"]:
+        print(f"Upload failed: encrypted file is larger than {data['maxBytes']} bytes.")
+        return
+
+    print(f"Uploading {len(encrypted_data)} encrypted bytes directly to storage...")
+    s3_response = requests.post(data["url"], data=data["fields"], files={"file": (file_name, encrypted_data)})
+    if s3_response.status_code not in (200, 204):
+        print(f"Upload to storage failed ({s3_response.status_code}): {s3_response.text}")
+        return
+
+    response = requests.post(url, json={"mode": "complete", "uploadId": data["uploadId"]}, headers=get_headers(token))
+    print(response.json())
+
+def direct_download_snippet(token):
+    """Download a client-side encrypted snippet straight from S3 and decrypt it locally."""
+    cipher = get_client_cipher()
+    if not cipher:
+        return
+    file_name = input("Enter the file name you want to download: ").strip()
+    save_path = input("Save to path (blank = print it): ").strip()
+
+    url = f"{BASE_URL}{config['snippets']['download']}"
+    response = requests.post(url, json={"fileName": file_name, "mode": "presigned"}, headers=get_headers(token))
+    data = response.json()
+    if response.status_code != 200:
+        print(f"Download failed: {data.get('error', 'Unknown error')}")
+        return
+
+    s3_response = requests.get(data["url"])
+    if s3_response.status_code != 200:
+        print(f"Download from storage failed ({s3_response.status_code})")
+        return
+
+    try:
+        content = cipher.decrypt(s3_response.content)
+    except Exception:
+        print("Could not decrypt the snippet. It was encrypted with a different client key.")
+        return
+
+    if save_path:
+        with open(save_path, "wb") as f:
+            f.write(content)
+        print(f"Saved {len(content)} bytes to {save_path}")
+    else:
+        print("\n=== Snippet Content ===\n")
+        print(content.decode(errors="replace"))
 
 def set_permissions(token):
     """Grant or revoke permissions for another user."""
@@ -122,6 +244,35 @@ def set_permissions(token):
     response = requests.post(url, json=payload, headers=get_headers(token))
     print(response.json())
 
+def bulk_set_permissions(token):
+    """Grant or revoke permissions for several files and users in one request."""
+    file_names = [name.strip() for name in input("Enter file names (comma separated): ").split(",") if name.strip()]
+    target_usernames = [name.strip() for name in input("Enter target usernames (comma separated): ").split(",") if name.strip()]
+    action = input("Enter action (grant/revoke): ").strip().lower()
+
+    if action not in ["grant", "revoke"]:
+        print("Invalid action. Use 'grant' or 'revoke'.")
+        return
+
+    if not file_names or not target_usernames:
+        print("At least one file name and one username are required.")
+        return
+
+    payload = {"fileNames": file_names, "targetUsernames": target_usernames, "permissionAction": action}
+    url = f"{BASE_URL}{config['snippets']['set_permissions']}"
+
+    response = requests.post(url, json=payload, headers=get_headers(token))
+    data = response.json()
+
+    if response.status_code != 200:
+        print(f"Bulk update failed: {data.get('error', 'Unknown error')}")
+        return
+
+    print(data["message"])
+    for result in data["results"]:
+        outcome = result.get("message") or result.get("error")
+        print(f"- {result['fileName']} / {result['targetUsername']}: {outcome}")
+
 def project_summary(token):
     """Fetch user summary including total uploads, downloads, and most active file types."""
     url = f"{BASE_URL}/summary"
@@ -149,30 +300,67 @@ def delete_snippet(token):
 
     print(response.json())
 
+def iter_dashboard_pages(token, page_size=DASHBOARD_PAGE_SIZE):
+    """Yield dashboard pages one request at a time, reusing cached pages the server reports unchanged."""
+    url = f"{BASE_URL}/dashboard"
+    cursor = None
+
+    while True:
+        params = {"pageSize": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        headers = get_headers(token)
+        cache_key = (token, cursor, page_size)
+        if cache_key in _dashboard_cache:
+            headers["If-None-Match"] = _dashboard_cache[cache_key][0]
+
+        response = requests.get(url, params=params, headers=headers)
+        if response.status_code == 304:
+            page = _dashboard_cache[cache_key][1]
+        elif response.status_code == 200:
+            page = response.json()
+            if response.headers.get("ETag"):
+                _dashboard_cache[cache_key] = (response.headers["ETag"], page)
+        else:
+            print(f"Status Code: {response.status_code}")
+            print(f"Response: {response.text}")
+            return
+
+        yield page
+        cursor = page.get("nextCursor")
+        if not cursor:
+            return
+
 def view_dashboard(token):
     """View all files the user has access to, including owner and last modified date."""
-    url = f"{BASE_URL}/dashboard"
-    
     print("Fetching dashboard...")
-    response = requests.get(url, headers=get_headers(token))
-    
-    print(f"Status Code: {response.status_code}")
-    print(f"Response: {response.text}")
+    for page_number, page in enumerate(iter_dashboard_pages(token), start=1):
+        if page_number == 1:
+            print(f"Account: {page.get('account')}")
+        for snippet in page.get("snippets", []):
+            shared = ", ".join(snippet["usersWithAccess"]) or "-"
+            print(f"- {snippet['fileName']} | owner: {snippet['owner']} | last modified: {snippet['lastModified']} | shared with: {shared}")
 
-    print(response.json())
+        if page.get("nextCursor") and input("Press Enter for more, or q to stop: ").strip().lower() == "q":
+            break
 
 def search(token):
-    """Find the tags based on a search query."""
-    query = input("Enter a search keyword (ex. bubble sort): ").strip()
+    """Find snippets by their tags, or by text or a regex in their content."""
+    modes = {"1": "metadata", "2": "substring", "3": "regex"}
+    mode = modes.get(input("Search (1) tags and file names, (2) content for text, (3) content by regex [1]: ").strip() or "1")
+    if not mode:
+        print("Please choose 1, 2 or 3.")
+        return
+    query = input("Enter a search keyword (ex. bubble sort): " if mode == "metadata" else "Enter the text or pattern to find: ").strip()
     if not query:
         print("Please enter a valid query.")
         return
 
     url = f"{BASE_URL}/search"
-    payload = {"query": query}
+    payload = {"query": query, "mode": mode}
     headers = get_headers(token)
 
-    print("Searching tags...")
+    print("Searching snippets...")
     response = requests.post(url, json=payload, headers=headers)
 
     print(f"Status Code: {response.status_code}")
@@ -180,7 +368,14 @@ def search(token):
         data = response.json()
         print("Search Results:")
         for result in data.get("results", []):
-            print(f"- {result['fileName']}: Tags -> {result['tags']}")
+            if mode == "metadata":
+                print(f"- {result['fileName']} (owner: {result['owner']}): Tags -> {result['tags']}")
+                continue
+            print(f"- {result['fileName']} (owner: {result['owner']}): {result['matchCount']} matching lines")
+            for line in result["lines"]:
+                print(f"    {line['line']}: {line['text']}")
+        if data.get("truncated"):
+            print("More snippets may match; refine the query to narrow it down.")
     else:
         try:
             error = response.json().get("error", "Unknown error")
@@ -227,6 +422,9 @@ def prompt():
     print("9. View Dashboard")
     print("10. Search")
     print("11. Sign Out")
+    print("12. Bulk Set Permissions")
+    print("13. Direct Upload (client-side encrypted)")
+    print("14. Direct Download (client-side encrypted)")
     print("0. Exit")
     try:
         return int(input("Enter command: "))
@@ -258,9 +456,15 @@ if __name__ == "__main__":
         elif cmd == 9 and token:
             view_dashboard(token)
         elif cmd == 10 and token:
-            token = search(token)
+            search(token)
         elif cmd == 11 and token:
             token = sign_out(token)
+        elif cmd == 12 and token:
+            bulk_set_permissions(token)
+        elif cmd == 13 and token:
+            direct_upload_snippet(token)
+        elif cmd == 14 and token:
+            direct_download_snippet(token)
         elif cmd == 0:
             sys.exit(0)
         else:
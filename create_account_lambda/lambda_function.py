@@ -1,5 +1,6 @@
 import json
 import pymysql
+import db
 import bcrypt
 import uuid
 from configparser import ConfigParser
@@ -18,14 +19,7 @@ DB_PORT = int(config.get("rds", "port_number"))
 
 # Function to connect to the MySQL database
 def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 
 # **Lambda Handler**
@@ -69,7 +63,6 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": "Database error", "details": str(e)})}
 
     finally:
-        if connection:
-            connection.close()
+        db.release(connection)
 
     return {"statusCode": 200, "body": json.dumps({"userId": user_id, "message": "Account created successfully"})}
@@ -1,13 +1,21 @@
 import json
 import pymysql
-import boto3
+import db
+import backends
 from configparser import ConfigParser
-import requests
+import token_auth
+import snippet_lookup
+import user_stats
+import dashboard_versions
+import snippet_objects
+import search_index
+import content_index
 
 # Load Config
 config_file = "delete_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
 
 # Database Config
 DB_HOST = config["rds"]["endpoint"]
@@ -18,39 +26,23 @@ DB_PORT = int(config["rds"]["port_number"])
 
 # S3 Config
 S3_BUCKET = config["s3"]["bucket_name"]
-S3_CLIENT = boto3.client("s3")
-
-# Auth Config
-AUTH_API_URL = config["auth"]["api_url"]
+S3_CLIENT = backends.client("s3")
 
 def get_db_connection():
     """Establish database connection."""
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 def lambda_handler(event, context):
     connection = None
     try:
         print("** Delete Lambda Triggered **")
 
-        # Validate Token
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        connection = get_db_connection()
 
-        requester_id = json.loads(auth_response.text)["userId"]
+        # Validate Token
+        requester_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
         # Parse body
         body = json.loads(event["body"])
@@ -59,24 +51,21 @@ def lambda_handler(event, context):
         if not file_name:
             return {"statusCode": 400, "body": json.dumps({"error": "Missing fileName"})}
 
-        connection = get_db_connection()
         with connection.cursor() as cursor:
-            # Find the snippet by fileName
-            cursor.execute("SELECT snippetId, ownerId, s3Path FROM Snippets WHERE fileName = %s", (file_name,))
-            snippet = cursor.fetchone()
+            # Find the requester's snippet by fileName
+            snippet = snippet_lookup.find_owned_snippet(cursor, requester_id, file_name)
 
             if not snippet:
+                # Shared with the requester but owned by someone else
+                if snippet_lookup.find_accessible_snippet(cursor, requester_id, file_name):
+                    return {"statusCode": 403, "body": json.dumps({"error": "You cannot delete a snippet you don't own. You can only edit it!"})}
                 return {"statusCode": 404, "body": json.dumps({"error": "Snippet not found."})}
 
-            # Check if requester is the owner
-            if requester_id != snippet["ownerId"]:
-                return {"statusCode": 403, "body": json.dumps({"error": "You cannot delete a snippet you don't own. You can only edit it!"})}
-
-            s3_key = snippet["s3Path"].replace(f"s3://{S3_BUCKET}/", "")
+            # Drop the reference to the stored content; shared content is swept once unreferenced
+            released_paths = snippet_objects.release(cursor, snippet)
 
-            # Delete file from S3
-            S3_CLIENT.delete_object(Bucket=S3_BUCKET, Key=s3_key)
-            print(f"Deleted snippet from S3: {s3_key}")
+            # Drop the snippet from every dashboard that lists it, while its grants still exist
+            dashboard_versions.bump_for_snippet(cursor, snippet["snippetId"])
 
             # Remove snippet record from database
             cursor.execute("DELETE FROM Snippets WHERE snippetId = %s", (snippet["snippetId"],))
@@ -84,13 +73,24 @@ def lambda_handler(event, context):
             # Remove snippet metadata from SnippetMetadata table
             cursor.execute("DELETE FROM SnippetMetadata WHERE snippetId = %s", (snippet["snippetId"],))
             print(f"Deleted snippet metadata for snippetId: {snippet['snippetId']}")
+            search_index.remove_snippet(cursor, snippet["snippetId"])
+            content_index.remove_content(cursor, snippet["snippetId"])
+
+            # Remove everyone's access to the snippet
+            cursor.execute("DELETE FROM SnippetPermissions WHERE snippetId = %s", (snippet["snippetId"],))
 
             # Update owner's upload count
             cursor.execute("UPDATE Users SET totalUploads = GREATEST(IFNULL(totalUploads, 0) - 1, 0) WHERE userId = %s", (requester_id,))
 
+            # Remove the file type from the owner's summary stats
+            user_stats.record_delete(cursor, requester_id, snippet["fileName"])
+
             # Commit changes
             connection.commit()
 
+        # Objects only this snippet used go once the delete is committed
+        snippet_objects.delete_owned_objects(S3_CLIENT, S3_BUCKET, released_paths)
+
         return {
             "statusCode": 200,
             "body": json.dumps({
@@ -106,5 +106,4 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
@@ -0,0 +1,76 @@
+import json
+import time
+import pymysql
+import db
+import download_counters
+from configparser import ConfigParser
+
+# Load configuration
+config_file = "download_counter_config.ini"
+config = ConfigParser()
+config.read(config_file)
+
+# RDS MySQL Configuration
+DB_HOST = config.get("rds", "endpoint")
+DB_USER = config.get("rds", "user_name")
+DB_PASSWORD = config.get("rds", "user_pwd")
+DB_NAME = config.get("rds", "db_name")
+DB_PORT = int(config.get("rds", "port_number"))
+
+# Flush Settings
+BATCH_SIZE = config.getint("counters", "batch_size", fallback=1000)
+# Stop before the Lambda timeout; the next scheduled run picks up the rest
+STOP_WHEN_REMAINING_MS = 10000
+
+# Establish MySQL Connection
+def get_db_connection():
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
+
+# Download Counter Function (scheduled)
+def lambda_handler(event, context):
+    """
+    Folds pending DownloadEvents into Snippets.downloadCount and Users.totalDownloads.
+    """
+    connection = None
+    try:
+        print("** Download Counter Lambda Triggered **")
+
+        event = event or {}
+        batch_size = int(event.get("batchSize", BATCH_SIZE))
+
+        connection = get_db_connection()
+
+        start = time.perf_counter()
+        flushed = 0
+        batches = 0
+        while True:
+            count = download_counters.flush_download_events(connection, batch_size)
+            if not count:
+                break
+            flushed += count
+            batches += 1
+            if count < batch_size:
+                break
+            if context and context.get_remaining_time_in_millis() < STOP_WHEN_REMAINING_MS:
+                print("** Stopping early to stay within the Lambda timeout **")
+                break
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        print(f"** Flushed {flushed} download events in {batches} batches ({elapsed_ms} ms) **")
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": "Download counters updated.", "eventsFlushed": flushed, "batches": batches, "elapsedMs": elapsed_ms})
+        }
+
+    except pymysql.MySQLError as e:
+        print("** ERROR: Database error **", str(e))
+        return {"statusCode": 500, "body": json.dumps({"error": "Database error", "details": str(e)})}
+
+    except Exception as e:
+        print("** ERROR: General error **", str(e))
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+    finally:
+        if connection:
+            db.release(connection)
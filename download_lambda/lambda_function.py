@@ -1,14 +1,24 @@
 import json
 import pymysql
-import boto3
+import db
+import backends
 from configparser import ConfigParser
-from cryptography.fernet import Fernet
-import requests
+import token_auth
+import snippet_crypto
+import snippet_keys
+import snippet_cache
+import snippet_lookup
+import snippet_objects
+import download_counters
 
 # Load Config
 config_file = "download_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
+snippet_crypto.configure(config)
+snippet_keys.configure(config)
+snippet_cache.configure(config)
 
 # Database Config
 DB_HOST = config["rds"]["endpoint"]
@@ -19,47 +29,26 @@ DB_PORT = int(config["rds"]["port_number"])
 
 # S3 Config
 S3_BUCKET = config["s3"]["bucket_name"]
-S3_CLIENT = boto3.client("s3")
+S3_CLIENT = backends.client("s3")
 
-# Auth Config
-AUTH_API_URL = config["auth"]["api_url"]
-
-# Encryption
-FERNET_KEY = config["encryption"]["fernet_key"]
-cipher = Fernet(FERNET_KEY.encode())
+# Lifetime of presigned download URLs
+PRESIGNED_URL_SECONDS = config.getint("s3", "presigned_url_seconds", fallback=900)
 
 def get_db_connection():
     """Establish a database connection."""
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-def decrypt_snippet(ciphertext):
-    """Decrypts a given snippet."""
-    return cipher.decrypt(ciphertext.encode()).decode()
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 def lambda_handler(event, context):
     connection = None
     try:
         print("** Download Lambda Triggered **")
 
-        # Validate Token
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        connection = get_db_connection()
 
-        requester_id = json.loads(auth_response.text)["userId"]
+        # Validate Token
+        requester_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
         # Parse body
         body = json.loads(event["body"])
@@ -67,32 +56,66 @@ def lambda_handler(event, context):
         if not requested_filename:
             return {"statusCode": 400, "body": json.dumps({"error": "Missing fileName"})}
 
-        connection = get_db_connection()
         with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT snippetId, s3Path, ownerId, allowedUsers
-                FROM Snippets
-                WHERE fileName = %s AND (JSON_CONTAINS(allowedUsers, %s) OR ownerId = %s)
-            """, (requested_filename, json.dumps(requester_id), requester_id))
-
-            snippet = cursor.fetchone()
+            # Owned snippet first, then one shared through SnippetPermissions
+            snippet = snippet_lookup.find_accessible_snippet(cursor, requester_id, requested_filename)
             if not snippet:
                 return {"statusCode": 403, "body": json.dumps({"error": "Access denied or file not found."})}
 
-            # Fetch and decrypt snippet from S3
             s3_key = snippet["s3Path"].replace(f"s3://{S3_BUCKET}/", "")
-            s3_response = S3_CLIENT.get_object(Bucket=S3_BUCKET, Key=s3_key)
-            encrypted_content = s3_response["Body"].read().decode()
-            decrypted_content = decrypt_snippet(encrypted_content)
+
+            # Edit mode: the version (and content) an update is based on; not counted as a download
+            if body.get("mode") == "edit":
+                result = {"snippetId": snippet["snippetId"], "version": snippet["version"],
+                          "clientEncrypted": bool(snippet["clientEncrypted"])}
+                if not snippet["clientEncrypted"]:
+                    result["content"] = snippet_cache.get_or_load(
+                        snippet["snippetId"], snippet["version"],
+                        lambda: snippet_objects.load_content(S3_CLIENT, S3_BUCKET, snippet)
+                    )
+                return {"statusCode": 200, "body": json.dumps(result)}
+
+            # Direct mode: hand out a presigned URL; the client fetches and decrypts the bytes itself
+            if body.get("mode") == "presigned":
+                if not snippet["clientEncrypted"]:
+                    return {"statusCode": 400, "body": json.dumps({"error": "Only client-side encrypted snippets can be downloaded directly."})}
+
+                download_counters.record_download(cursor, snippet["snippetId"], requester_id)
+                connection.commit()
+
+                url = S3_CLIENT.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": S3_BUCKET, "Key": s3_key},
+                    ExpiresIn=PRESIGNED_URL_SECONDS
+                )
+                return {
+                    "statusCode": 200,
+                    "body": json.dumps({
+                        "message": "Download the snippet from the returned URL.",
+                        "snippetId": snippet["snippetId"],
+                        "url": url,
+                        "clientEncrypted": True,
+                        "expiresIn": PRESIGNED_URL_SECONDS,
+                        "downloadCount": snippet["downloadCount"] or 0
+                    })
+                }
+
+            if snippet["clientEncrypted"]:
+                return {"statusCode": 400, "body": json.dumps({"error": "This snippet is encrypted client-side; download it with mode 'presigned'."})}
+
+            # Fetch and decrypt snippet (from the row or S3), unless this container already holds this version
+            decrypted_content = snippet_cache.get_or_load(
+                snippet["snippetId"], snippet["version"],
+                lambda: snippet_objects.load_content(S3_CLIENT, S3_BUCKET, snippet)
+            )
 
             # Fetch owner's username
             cursor.execute("SELECT username FROM Users WHERE userId = %s", (snippet["ownerId"],))
             owner_info = cursor.fetchone()
             owner_username = owner_info["username"] if owner_info else "Unknown"
 
-            # Update download counts
-            cursor.execute("UPDATE Users SET totalDownloads = totalDownloads + 1 WHERE userId = %s", (requester_id,))
-            cursor.execute("UPDATE Snippets SET downloadCount = IFNULL(downloadCount, 0) + 1 WHERE snippetId = %s", (snippet["snippetId"],))            
+            # Record the download; counters are updated in batches by download_counter_lambda
+            download_counters.record_download(cursor, snippet["snippetId"], requester_id)
             connection.commit()
 
         print(f"Snippet Content:\n{decrypted_content}")  # Print the decrypted file
@@ -102,6 +125,9 @@ def lambda_handler(event, context):
             "body": json.dumps({
                 "message": "Snippet download successful.",
                 "snippetId": snippet["snippetId"],
+                "version": snippet["version"],
+                # Stored counter, as of the last flush; this download is counted in the next one
+                "downloadCount": snippet["downloadCount"] or 0,
                 "content": decrypted_content  # Return decrypted file content
             })
         }
@@ -113,5 +139,4 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
@@ -1,7 +1,9 @@
 import json
 import pymysql
-import requests
-import boto3
+import db
+import token_auth
+import backends
+import search_index
 from configparser import ConfigParser
 import datetime
 
@@ -9,6 +11,7 @@ import datetime
 config_file = "extract_metadata_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
 
 # Database Config
 DB_HOST = config["rds"]["endpoint"]
@@ -17,22 +20,12 @@ DB_PASSWORD = config["rds"]["user_pwd"]
 DB_NAME = config["rds"]["db_name"]
 DB_PORT = int(config["rds"]["port_number"])
 
-# Auth Config
-AUTH_API_URL = config["auth"]["api_url"]
-
 # Amazon Comprehend Client
-comprehend = boto3.client("comprehend", region_name=config["aws"]["region"])
+comprehend = backends.client("comprehend", region_name=config["aws"]["region"])
 
 def get_db_connection():
     """Establish database connection."""
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 def extract_metadata(snippet_text, file_name):
     """Extract metadata from the snippet using Amazon Comprehend and file heuristics."""
@@ -61,19 +54,12 @@ def lambda_handler(event, context):
     try:
         print("** Extract Metadata Lambda Triggered **")
 
-        # Validate Token
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        connection = get_db_connection()
 
-        # Extract userId from authentication response
-        authenticated_user_id = json.loads(auth_response.text)["userId"]
+        # Validate Token
+        authenticated_user_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
         # Parse event body
         if isinstance(event["body"], str):
@@ -95,7 +81,6 @@ def lambda_handler(event, context):
         # Extract metadata
         file_type, key_phrases, entities = extract_metadata(snippet_text, file_name)
 
-        connection = get_db_connection()
         with connection.cursor() as cursor:
             # Insert metadata into SnippetMetadata
 
@@ -124,6 +109,9 @@ def lambda_handler(event, context):
                 file_name
             ))
 
+            # Keep the search index in step with the metadata it is built from
+            search_index.index_snippet(cursor, snippet_id, file_name, file_type, key_phrases, entities)
+
         connection.commit()
         print(f"** Metadata stored for snippet: {snippet_id} **")
 
@@ -145,5 +133,4 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
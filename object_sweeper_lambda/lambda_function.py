@@ -0,0 +1,66 @@
+import json
+import time
+import pymysql
+import db
+import backends
+import snippet_objects
+from configparser import ConfigParser
+
+# Load configuration
+config_file = "object_sweeper_config.ini"
+config = ConfigParser()
+config.read(config_file)
+
+# RDS MySQL Configuration
+DB_HOST = config.get("rds", "endpoint")
+DB_USER = config.get("rds", "user_name")
+DB_PASSWORD = config.get("rds", "user_pwd")
+DB_NAME = config.get("rds", "db_name")
+DB_PORT = int(config.get("rds", "port_number"))
+
+# S3 Config (required: this function exists to delete content objects)
+S3_BUCKET = config.get("s3", "bucket_name")
+S3_CLIENT = backends.client("s3")
+
+# Sweep Settings
+BATCH_SIZE = config.getint("sweeper", "batch_size", fallback=500)
+
+# Establish MySQL Connection
+def get_db_connection():
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
+
+# Object Sweeper Function (scheduled)
+def lambda_handler(event, context):
+    """
+    Deletes the S3 objects of SnippetObjects rows whose refCount has dropped to 0, then the rows.
+    """
+    connection = None
+    try:
+        print("** Object Sweeper Lambda Triggered **")
+
+        event = event or {}
+        batch_size = int(event.get("batchSize", BATCH_SIZE))
+
+        connection = get_db_connection()
+
+        start = time.perf_counter()
+        removed = snippet_objects.sweep_unreferenced(connection, S3_CLIENT, S3_BUCKET, batch_size)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        print(f"** SnippetObjects: removed {removed} unreferenced objects ({elapsed_ms} ms) **")
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": "Unreferenced objects swept.", "objectsRemoved": removed, "elapsedMs": elapsed_ms})
+        }
+
+    except pymysql.MySQLError as e:
+        print("** ERROR: Database error **", str(e))
+        return {"statusCode": 500, "body": json.dumps({"error": "Database error", "details": str(e)})}
+
+    except Exception as e:
+        print("** ERROR: General error **", str(e))
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+    finally:
+        if connection:
+            db.release(connection)
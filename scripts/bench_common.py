@@ -0,0 +1,82 @@
+import json
+import statistics
+import time
+from configparser import ConfigParser
+
+import pymysql
+import requests
+
+# Small helpers shared by the benchmark and maintenance scripts in this folder.
+
+def load_config(path):
+    config = ConfigParser()
+    config.read(path)
+    return config
+
+def get_db_connection(config):
+    """Connects with the [rds] section of a script config (same keys as the lambda configs)."""
+    return pymysql.connect(
+        host=config["rds"]["endpoint"],
+        user=config["rds"]["user_name"],
+        password=config["rds"]["user_pwd"],
+        database=config["rds"]["db_name"],
+        port=int(config["rds"]["port_number"]),
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+def sign_in(config, username, password):
+    """Signs in through the API (client_side api_config.ini) and returns the token."""
+    url = f"{config['api']['base_url']}{config['auth']['sign_in']}"
+    response = requests.post(url, json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["token"]
+
+def timed(fn, *args, **kwargs):
+    """Calls fn and returns (result, elapsed milliseconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+def summarize(samples):
+    """Returns count/mean/p50/p95/max (ms) for a list of latency samples."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.mean(ordered), 2),
+        "p50": round(ordered[len(ordered) // 2], 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+def print_table(results, title=None):
+    """Prints {name: summary} as a fixed-width table."""
+    if title:
+        print(f"\n=== {title} ===")
+    print(f"{'case':<28}{'n':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for name, s in results.items():
+        if not s.get("count"):
+            print(f"{name:<28}{0:>6}")
+            continue
+        print(f"{name:<28}{s['count']:>6}{s['mean']:>10}{s['p50']:>10}{s['p95']:>10}{s['max']:>10}")
+
+def save_results(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
+
+def compare_results(before_path, after_path):
+    """Prints the per-case p50/p95 change between two saved result files."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{'case':<28}{'p50 before':>12}{'p50 after':>12}{'p95 before':>12}{'p95 after':>12}{'p50 change':>12}")
+    for name in before:
+        if name not in after or not before[name].get("count") or not after[name].get("count"):
+            continue
+        b, a = before[name], after[name]
+        change = (a["p50"] - b["p50"]) / b["p50"] * 100 if b["p50"] else 0
+        print(f"{name:<28}{b['p50']:>12}{a['p50']:>12}{b['p95']:>12}{a['p95']:>12}{change:>11.1f}%")
@@ -0,0 +1,189 @@
+"""
+Index size and query latency of the content search trigram index (shared_layer/python/content_index.py).
+
+    python bench_content_index.py --local [--files 5000] [--iterations 5]
+    python bench_content_index.py --config bench_config.ini [--corpus /path/to/source] [--files 5000]
+
+The corpus is real code: by default the .py files of this Python installation's standard
+library (--corpus points it at any other source tree). Each file becomes a bench-content-*
+snippet owned by one bench user and is indexed with content_index.index_content. --local runs
+against the SQLite stand-in in a temporary directory; --config against the database in its
+[rds] section, with sql/014 applied (bench rows are removed at the end).
+
+Reports indexing throughput, postings per KB of source, and the on-disk size of the index
+tables where the database exposes it (MySQL information_schema). Each query is timed through
+content_index.search (index lookup, candidate rows, verification of candidates against the
+plaintext, which is held in memory here instead of S3) and compared with a brute-force scan that
+runs the same matcher over every file, with how many candidates the index let through. Like the
+handler, search stops once it has MAX_LIMIT (50) matching snippets; the scan always reads everything.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import sys
+import sysconfig
+import tempfile
+import time
+from configparser import ConfigParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import backends
+import content_index
+import snippet_cache
+
+from cryptography.fernet import Fernet
+
+from bench_common import timed, summarize, print_table, save_results, load_config
+from rotate_snippet_keys import connect
+
+USER_ID = "bench-content-user"
+MAX_FILE_BYTES = 256 * 1024
+# name -> (query, regex)
+QUERIES = {
+    "identifier": ("getattr(", False),
+    "api_call": ("os.path.join(", False),
+    "rare_string": ("_PyTime_", False),
+    "phrase": ("raise ValueError(", False),
+    "regex_def": (r"def \w+_cache\(", True),
+    "regex_alternation": (r"import (json|pickle)$", True),
+    "regex_class": (r"except [A-Z]\w+Error as", True),
+}
+
+def load_corpus(root, limit):
+    files = []
+    for directory, _, names in sorted(os.walk(root)):
+        for name in sorted(names):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+            except (UnicodeDecodeError, OSError):
+                continue
+            if text and len(text.encode()) <= MAX_FILE_BYTES:
+                files.append((os.path.relpath(path, root), text))
+            if len(files) >= limit:
+                return files
+    return files
+
+def seed(connection, files):
+    updated = datetime.datetime(2024, 1, 1)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT IGNORE INTO Users (userId, username, passwordHash, totalUploads, totalDownloads, createdAt) VALUES (%s, %s, 'x', 0, 0, NOW())",
+            (USER_ID, USER_ID)
+        )
+        cursor.executemany("""
+            INSERT IGNORE INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, allowedUsers, lastUpdated)
+            VALUES (%s, %s, %s, %s, 'py', 'inline', '[]', %s)
+        """, [(f"bench-content-{i:06d}", USER_ID, USER_ID, name, (updated + datetime.timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'))
+              for i, (name, _) in enumerate(files)])
+    connection.commit()
+
+    start = time.perf_counter()
+    with connection.cursor() as cursor, contextlib.redirect_stdout(io.StringIO()):
+        for i, (_, text) in enumerate(files):
+            content_index.index_content(cursor, f"bench-content-{i:06d}", text)
+            if i % 200 == 199:
+                connection.commit()
+    connection.commit()
+    return time.perf_counter() - start
+
+def index_size(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) AS postings FROM SnippetTrigrams
+            WHERE docId IN (SELECT docId FROM SnippetTextIndex WHERE snippetId LIKE 'bench-content-%')
+        """)
+        postings = cursor.fetchone()["postings"]
+        cursor.execute("SELECT COALESCE(SUM(LENGTH(trigrams)), 0) AS packed FROM SnippetTextIndex WHERE snippetId LIKE 'bench-content-%'")
+        packed = cursor.fetchone()["packed"]
+        tables = {}
+        if not backends.is_local():
+            cursor.execute("""
+                SELECT table_name AS name, data_length + index_length AS bytes
+                FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name IN ('SnippetTrigrams', 'SnippetTextIndex')
+            """)
+            tables = {row["name"]: row["bytes"] for row in cursor.fetchall()}
+    connection.rollback()
+    return postings, packed, tables
+
+def cleanup(connection):
+    with connection.cursor() as cursor, contextlib.redirect_stdout(io.StringIO()):
+        cursor.execute("SELECT snippetId FROM SnippetTextIndex WHERE snippetId LIKE 'bench-content-%'")
+        for row in cursor.fetchall():
+            content_index.remove_content(cursor, row["snippetId"])
+        cursor.execute("DELETE FROM Snippets WHERE snippetId LIKE 'bench-content-%'")
+        cursor.execute("DELETE FROM Users WHERE userId = %s", (USER_ID,))
+    connection.commit()
+
+def run(connection, files, iterations):
+    texts = {f"bench-content-{i:06d}": text for i, (_, text) in enumerate(files)}
+    load = lambda row: texts[row["snippetId"]]
+    results = {}
+    for name, (query, regex) in QUERIES.items():
+        matcher, _ = content_index.parse_query(query, regex)
+        indexed, scanned = [], []
+        for _ in range(iterations):
+            with connection.cursor() as cursor, contextlib.redirect_stdout(io.StringIO()):
+                found, elapsed = timed(content_index.search, cursor, USER_ID, query, load,
+                                       regex=regex, limit=content_index.MAX_LIMIT)
+            connection.rollback()
+            indexed.append(elapsed)
+            matches, elapsed = timed(lambda: sum(1 for text in texts.values() if any(map(matcher.search, text.splitlines()))))
+            scanned.append(elapsed)
+        results[f"{name}_index"] = summarize(indexed)
+        results[f"{name}_scan"] = summarize(scanned)
+        print(f"{name:<20}{query!r:<28} {found['candidates']:>6} candidates, {matches:>6} files match")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    parser.add_argument("--local", action="store_true", help="use the SQLite stand-in in a temporary directory")
+    parser.add_argument("--corpus", default=sysconfig.get_paths()["stdlib"])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--save", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.local:
+        os.environ["SNIPPET_HUB_BACKEND"] = "local"
+        os.environ["SNIPPET_HUB_LOCAL_DIR"] = tempfile.mkdtemp(prefix="bench_content_index_")
+        config = ConfigParser()
+        config.read_dict({
+            "rds": {"endpoint": "localhost", "port_number": "3306", "user_name": "local", "user_pwd": "local", "db_name": "bench"},
+            "encryption": {"fernet_key": Fernet.generate_key().decode()},
+        })
+    else:
+        config = load_config(args.config)
+    content_index.configure(config)
+    # Time the index and verification, not the per-container content cache
+    config.read_dict({"cache": {"max_bytes": "0"}})
+    snippet_cache.configure(config)
+
+    files = load_corpus(args.corpus, args.files)
+    corpus_bytes = sum(len(text.encode()) for _, text in files)
+    connection = connect(config)
+    try:
+        elapsed = seed(connection, files)
+        postings, packed, tables = index_size(connection)
+        print(f"Indexed {len(files)} files, {corpus_bytes / 1024 / 1024:.1f} MB of source, in {elapsed:.1f}s "
+              f"({corpus_bytes / elapsed / 1024 / 1024:.2f} MB/s)")
+        print(f"{postings} postings ({postings / (corpus_bytes / 1024):.0f} per KB of source), "
+              f"{packed / 1024 / 1024:.1f} MB of packed trigram lists ({packed / corpus_bytes:.2f}x source)")
+        for name, size in tables.items():
+            print(f"{name}: {size / 1024 / 1024:.1f} MB on disk ({size / corpus_bytes:.2f}x source)")
+        print()
+
+        results = run(connection, files, args.iterations)
+        print_table(results, f"Content search over {len(files)} files (ms)")
+        if args.save:
+            save_results(args.save, results)
+    finally:
+        cleanup(connection)
+        connection.close()
@@ -0,0 +1,87 @@
+"""
+Crypto micro-benchmark: the original Fernet path against the chunked AES-GCM stream format.
+
+    python bench_crypto.py [--sizes 1024 65536 1048576 16777216] [--iterations 5]
+
+For each snippet size and path it reports encrypt and decrypt throughput and the peak
+Python memory allocated per call (tracemalloc). "fernet" is what the handlers used to do
+(encrypt, .decode() to a str, .encode() back, decrypt); "envelope" is snippet_crypto format
+version 1; "stream_none" and "stream_zlib" are format version 2 without and with compression.
+The input is base64 of random bytes, so zlib has something (but not much) to compress.
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import time
+import tracemalloc
+from configparser import ConfigParser
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import snippet_crypto
+
+def configure(key, codec):
+    config = ConfigParser()
+    config.read_dict({"encryption": {"fernet_key": key, "codec": codec}})
+    snippet_crypto.configure(config)
+
+def fernet_path(cipher):
+    encrypt = lambda text: cipher.encrypt(text.encode()).decode()
+    decrypt = lambda stored: cipher.decrypt(stored.encode()).decode()
+    return encrypt, decrypt
+
+def envelope_path():
+    return snippet_crypto.encrypt_snippet, snippet_crypto.decrypt_snippet
+
+def stream_path():
+    def encrypt(text):
+        data = text.encode()
+        return b"".join(snippet_crypto.encrypt_stream(
+            memoryview(data)[start:start + snippet_crypto.STREAM_CHUNK_SIZE]
+            for start in range(0, len(data), snippet_crypto.STREAM_CHUNK_SIZE)
+        ))
+    def decrypt(stored):
+        return b"".join(snippet_crypto.decrypt_stream(io.BytesIO(stored))).decode()
+    return encrypt, decrypt
+
+def measure(fn, arg, iterations):
+    """Returns (result, best seconds, peak bytes allocated)."""
+    best = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    key = Fernet.generate_key().decode()
+    print(f"{'size':>10}  {'path':<12}{'enc MB/s':>10}{'dec MB/s':>10}{'enc peak':>12}{'dec peak':>12}{'stored':>12}")
+    for size in args.sizes:
+        text = base64.b64encode(os.urandom(size * 3 // 4)).decode()[:size]
+        paths = [("fernet", lambda: fernet_path(Fernet(key.encode())), "zlib"),
+                 ("envelope", envelope_path, "zlib"),
+                 ("stream_none", stream_path, "none"),
+                 ("stream_zlib", stream_path, "zlib")]
+        for name, make_path, codec in paths:
+            configure(key, codec)
+            encrypt, decrypt = make_path()
+            stored, encrypt_seconds, encrypt_peak = measure(encrypt, text, args.iterations)
+            result, decrypt_seconds, decrypt_peak = measure(decrypt, stored, args.iterations)
+            assert result == text
+            mb = size / (1024 * 1024)
+            print(f"{size:>10}  {name:<12}{mb / encrypt_seconds:>10.1f}{mb / decrypt_seconds:>10.1f}"
+                  f"{encrypt_peak / size:>11.2f}x{decrypt_peak / size:>11.2f}x{len(stored) / size:>11.2f}x")
@@ -0,0 +1,155 @@
+"""
+Times dashboard assembly for a user who can see 10k and 100k snippets.
+
+    python bench_dashboard_query.py --config bench_config.ini --visible 10000 100000 --seed
+    python bench_dashboard_query.py --config bench_config.ini --visible 10000 100000
+    python bench_dashboard_query.py --config bench_config.ini --cleanup
+
+Run against a scratch copy of the database with sql/003 and sql/007 applied. --seed creates
+one bench-dash-* user per size; half of their snippets are their own and half are shared
+with them by other bench users, and every snippet has up to three further grantees.
+
+"legacy" is the old unpaginated dashboard: a username lookup, the owned/shared union and a
+second IN query for the access lists. "page_first" and "page_deep" run
+snippet_lookup.DASHBOARD_PAGE_SQL for the first page and for a page halfway down the list.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import snippet_lookup
+
+from bench_common import timed, summarize, print_table, load_config, get_db_connection
+
+BATCH_SIZE = 5000
+OTHER_USERS = 200
+GRANTS_PER_SNIPPET = 3
+PAGE_SIZE = 50
+FIRST_PAGE_POSITION = ("9999-12-31 23:59:59", "")
+
+def viewer_id(size):
+    return f"bench-dash-viewer-{size}"
+
+def other_id(i):
+    return f"bench-dash-other-{i:04d}"
+
+def seed(connection, size):
+    rng = random.Random(size)
+    viewer = viewer_id(size)
+    others = [other_id(i) for i in range(OTHER_USERS)]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT IGNORE INTO Users (userId, username, passwordHash, totalUploads, totalDownloads, createdAt) VALUES (%s, %s, 'x', 0, 0, NOW())",
+            [(user, user) for user in [viewer] + others]
+        )
+    connection.commit()
+
+    start_time = datetime.datetime(2024, 1, 1)
+    for start in range(0, size, BATCH_SIZE):
+        snippets = []
+        grants = []
+        for i in range(start, min(start + BATCH_SIZE, size)):
+            snippet_id = f"bench-dash-{size}-{i:08d}"
+            owner = viewer if i % 2 == 0 else rng.choice(others)
+            updated = (start_time + datetime.timedelta(seconds=rng.randrange(365 * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+            snippets.append((snippet_id, owner, owner, f"file_{i}.py", "py", f"s3://bench/{snippet_id}", "bench", "[]", updated))
+            grantees = {rng.choice(others) for _ in range(rng.randrange(GRANTS_PER_SNIPPET + 1))} - {owner}
+            if owner != viewer:
+                grantees.add(viewer)
+            grants.extend((snippet_id, grantee) for grantee in sorted(grantees))
+
+        with connection.cursor() as cursor:
+            cursor.executemany("""
+                INSERT IGNORE INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, encryptionKey, allowedUsers, lastUpdated)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, snippets)
+            if grants:
+                cursor.executemany("INSERT IGNORE INTO SnippetPermissions (snippetId, userId, role) VALUES (%s, %s, 'editor')", grants)
+        connection.commit()
+        print(f"Seeded {start + len(snippets)} / {size} snippets visible to {viewer}")
+
+def cleanup(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM SnippetPermissions WHERE snippetId LIKE 'bench-dash-%'")
+        cursor.execute("DELETE FROM Snippets WHERE snippetId LIKE 'bench-dash-%'")
+        cursor.execute("DELETE FROM Users WHERE userId LIKE 'bench-dash-%'")
+    connection.commit()
+
+def legacy_dashboard(cursor, user):
+    cursor.execute("SELECT username FROM Users WHERE userId = %s", (user,))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT snippetId, fileName, ownerUsername, lastUpdated
+        FROM Snippets
+        WHERE ownerId = %s
+        UNION
+        SELECT s.snippetId, s.fileName, s.ownerUsername, s.lastUpdated
+        FROM SnippetPermissions p
+        JOIN Snippets s ON s.snippetId = p.snippetId
+        WHERE p.userId = %s
+    """, (user, user))
+    snippets = cursor.fetchall()
+    if snippets:
+        cursor.execute("""
+            SELECT p.snippetId, u.username
+            FROM SnippetPermissions p
+            JOIN Users u ON u.userId = p.userId
+            WHERE p.snippetId IN %s
+        """, (tuple(snippet["snippetId"] for snippet in snippets),))
+        cursor.fetchall()
+
+def deep_position(cursor, user, size):
+    """(lastUpdated, snippetId) of the row halfway down the user's dashboard."""
+    cursor.execute("""
+        SELECT lastUpdated, snippetId FROM (
+            SELECT snippetId, lastUpdated FROM Snippets WHERE ownerId = %s
+            UNION
+            SELECT s.snippetId, s.lastUpdated FROM SnippetPermissions p JOIN Snippets s ON s.snippetId = p.snippetId WHERE p.userId = %s
+        ) visible
+        ORDER BY lastUpdated DESC, snippetId DESC
+        LIMIT 1 OFFSET %s
+    """, (user, user, size // 2))
+    row = cursor.fetchone()
+    return (row["lastUpdated"].strftime('%Y-%m-%d %H:%M:%S'), row["snippetId"]) if row else FIRST_PAGE_POSITION
+
+def run(connection, size, iterations):
+    user = viewer_id(size)
+    with connection.cursor() as cursor:
+        deep = deep_position(cursor, user, size)
+    samples = {f"legacy_{size}": [], f"page_first_{size}": [], f"page_deep_{size}": []}
+    for _ in range(iterations):
+        with connection.cursor() as cursor:
+            _, elapsed = timed(legacy_dashboard, cursor, user)
+            samples[f"legacy_{size}"].append(elapsed)
+            _, elapsed = timed(snippet_lookup.find_dashboard_page, cursor, user, *FIRST_PAGE_POSITION, PAGE_SIZE + 1)
+            samples[f"page_first_{size}"].append(elapsed)
+            _, elapsed = timed(snippet_lookup.find_dashboard_page, cursor, user, *deep, PAGE_SIZE + 1)
+            samples[f"page_deep_{size}"].append(elapsed)
+        connection.rollback()
+    return {name: summarize(values) for name, values in samples.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    parser.add_argument("--visible", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", action="store_true", help="insert the bench rows before timing")
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench rows and exit")
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    try:
+        if args.cleanup:
+            cleanup(connection)
+        else:
+            results = {}
+            for size in args.visible:
+                if args.seed:
+                    seed(connection, size)
+                results.update(run(connection, size, args.iterations))
+            print_table(results, f"Dashboard assembly, page size {PAGE_SIZE} (ms)")
+    finally:
+        connection.close()
@@ -0,0 +1,65 @@
+"""
+Load test: many concurrent downloads of the same snippet through API Gateway.
+
+Before write-behind counters every download updated the same Snippets and Users rows,
+so concurrent downloads queued on those row locks. Run against both deployments:
+
+    python bench_download_contention.py --username alice --password secret --file-name hot.py --save before.json
+    python bench_download_contention.py --username alice --password secret --file-name hot.py --save after.json
+    python bench_download_contention.py --compare before.json after.json
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_common import timed, summarize, print_table, save_results, compare_results, load_config, sign_in
+
+def download_many(url, headers, file_name, count):
+    samples = []
+    errors = 0
+    with requests.Session() as session:
+        for _ in range(count):
+            response, elapsed = timed(session.post, url, json={"fileName": file_name}, headers=headers)
+            if response.status_code == 200:
+                samples.append(elapsed)
+            else:
+                errors += 1
+    return samples, errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="../client_side/api_config.ini")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--file-name", help="an existing snippet the user can download")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--downloads-per-thread", type=int, default=25)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+    else:
+        config = load_config(args.config)
+        token = sign_in(config, args.username, args.password)
+        url = f"{config['api']['base_url']}{config['snippets']['download']}"
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            futures = [pool.submit(download_many, url, headers, args.file_name, args.downloads_per_thread)
+                       for _ in range(args.threads)]
+            outcomes = [future.result() for future in futures]
+        wall_seconds = time.perf_counter() - start
+
+        samples = [sample for thread_samples, _ in outcomes for sample in thread_samples]
+        errors = sum(thread_errors for _, thread_errors in outcomes)
+        results = {f"download_x{args.threads}_threads": summarize(samples)}
+
+        print_table(results, "Concurrent download latency (ms)")
+        print(f"Throughput: {len(samples) / wall_seconds:.1f} downloads/s, {errors} errors")
+        if args.save:
+            save_results(args.save, results)
@@ -0,0 +1,73 @@
+"""
+Measures end-to-end latency of every protected endpoint through API Gateway.
+
+Run it once against the old deployment and once against the new one, then compare:
+
+    python bench_endpoint_latency.py --username alice --password secret --save before.json
+    python bench_endpoint_latency.py --username alice --password secret --save after.json
+    python bench_endpoint_latency.py --compare before.json after.json
+
+Uses the same api_config.ini as client_side/main.py.
+"""
+import argparse
+import uuid
+
+import requests
+
+from bench_common import timed, summarize, print_table, save_results, compare_results, load_config, sign_in
+
+def run(config, token, iterations, share_with):
+    base = config["api"]["base_url"]
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    samples = {name: [] for name in ["upload", "download", "update", "set_permissions", "search", "dashboard", "summary", "delete"]}
+
+    for i in range(iterations):
+        file_name = f"bench_{uuid.uuid4().hex[:8]}.py"
+        calls = [
+            ("upload", requests.post, f"{base}{config['snippets']['upload']}", {"fileName": file_name, "fileContent": "print('bench')\n"}),
+            ("download", requests.post, f"{base}{config['snippets']['download']}", {"fileName": file_name}),
+            ("update", requests.put, f"{base}{config['snippets']['update']}", {"fileName": file_name, "fileContent": f"print('bench {i}')\n"}),
+            ("set_permissions", requests.post, f"{base}{config['snippets']['set_permissions']}",
+             {"fileName": file_name, "targetUsername": share_with, "permissionAction": "grant"} if share_with else None),
+            ("search", requests.post, f"{base}/search", {"query": "bench"}),
+            ("dashboard", requests.get, f"{base}/dashboard", None),
+            ("summary", requests.get, f"{base}/summary", None),
+            ("delete", requests.delete, f"{base}/delete", {"fileName": file_name}),
+        ]
+        version = None
+        for name, method, url, payload in calls:
+            if name == "set_permissions" and not share_with:
+                continue
+            if name == "update":
+                payload = {**payload, "baseVersion": version}
+            response, elapsed = timed(method, url, json=payload, headers=headers)
+            # An early rejection (400/409) would time a different code path, so only 2xx counts
+            if not 200 <= response.status_code < 300:
+                print(f"{name} failed ({response.status_code}): {response.text}")
+                continue
+            samples[name].append(elapsed)
+            if name == "download":
+                version = response.json()["version"]
+
+    return {name: summarize(values) for name, values in samples.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="../client_side/api_config.ini")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--share-with", help="existing username to use for the set_permissions call")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+    else:
+        config = load_config(args.config)
+        token = sign_in(config, args.username, args.password)
+        results = run(config, token, args.iterations, args.share_with)
+        print_table(results, "Endpoint latency (ms)")
+        if args.save:
+            save_results(args.save, results)
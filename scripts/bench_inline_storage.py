@@ -0,0 +1,84 @@
+"""
+Small-snippet latency with and without the inline storage tier (Snippets.inlineContent).
+
+    python bench_inline_storage.py [--iterations 100] [--size 300] [--s3-latency-ms 15] [--save inline.json]
+    python bench_inline_storage.py --compare before.json after.json
+
+Runs upload, download, update and delete through the handlers on the local backends
+(scripts/local_run.py), once with inline_max_bytes = 0 (every snippet in S3, as before) and
+once with the default threshold. The local S3 stand-in is a directory, so each S3 request is
+given --s3-latency-ms of delay to stand in for the round trip to S3; pass 0 to see only the
+handler and database cost. The decrypted-content cache is disabled so downloads read storage.
+"""
+import argparse
+import os
+import uuid
+from configparser import ConfigParser
+
+from bench_common import timed, summarize, print_table, save_results, compare_results
+import local_run
+import snippet_cache
+import snippet_objects
+
+OPERATIONS = ["upload", "download", "update", "delete"]
+
+def configure_tier(inline_max_bytes):
+    config = ConfigParser()
+    config.read_dict({"storage": {"inline_max_bytes": str(inline_max_bytes)}, "cache": {"max_bytes": "0"}})
+    snippet_objects.configure(config)
+    snippet_cache.configure(config)
+
+def run(api, tier, iterations, size):
+    samples = {f"{operation}_{tier}": [] for operation in OPERATIONS}
+    for i in range(iterations):
+        file_name = f"inline_bench_{uuid.uuid4().hex[:8]}.py"
+        content = (f"def snippet_{i}(value):\n    return value * {i}\n" * size)[:size]
+        response, elapsed = timed(api.call, "upload_snippet_lambda", {"fileName": file_name, "fileContent": content})
+        samples[f"upload_{tier}"].append(elapsed)
+        response, elapsed = timed(api.call, "download_lambda", {"fileName": file_name})
+        samples[f"download_{tier}"].append(elapsed)
+        version = local_run.payload(response)["version"]
+        calls = [
+            ("update", "update_lambda", {"fileName": file_name, "fileContent": content[:-1] + "#", "baseVersion": version}),
+            ("delete", "delete_lambda", {"fileName": file_name}),
+        ]
+        for operation, handler, body in calls:
+            response, elapsed = timed(api.call, handler, body)
+            if response["statusCode"] >= 400:
+                print(f"{operation} failed ({response['statusCode']}): {response.get('body')}")
+                continue
+            samples[f"{operation}_{tier}"].append(elapsed)
+    return {name: summarize(values) for name, values in samples.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--local-dir", default=os.path.join(local_run.REPO_ROOT, ".snippet_hub_local"))
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--size", type=int, default=300, help="snippet size in bytes")
+    parser.add_argument("--s3-latency-ms", type=float, default=15)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+    else:
+        os.environ["SNIPPET_HUB_LOCAL_S3_LATENCY_MS"] = str(args.s3_latency_ms)
+        api = local_run.start(args.local_dir)
+        username = f"inline_bench_{uuid.uuid4().hex[:8]}"
+        api.call("create_account_lambda", {"username": username, "password": "secret"})
+        api.token = local_run.payload(api.call("sign_in_lambda", {"username": username, "password": "secret"}))["token"]
+
+        results = {}
+        for tier, inline_max_bytes in [("s3", 0), ("inline", snippet_objects.DEFAULT_INLINE_MAX_BYTES)]:
+            configure_tier(inline_max_bytes)
+            results.update(run(api, tier, args.iterations, args.size))
+
+        print_table(results, f"{args.size}-byte snippets, {args.s3_latency_ms} ms per S3 request (ms)")
+        print(f"\n{'operation':<12}{'p50 s3':>10}{'p50 inline':>12}{'saved':>10}")
+        for operation in OPERATIONS:
+            s3, inline = results[f"{operation}_s3"], results[f"{operation}_inline"]
+            if s3.get("count") and inline.get("count"):
+                print(f"{operation:<12}{s3['p50']:>10}{inline['p50']:>12}{s3['p50'] - inline['p50']:>10.2f}")
+        if args.save:
+            save_results(args.save, results)
@@ -0,0 +1,51 @@
+"""
+Measures sign-in latency through API Gateway (bcrypt check + token issuance).
+
+    python bench_login_latency.py --username alice --password secret --save before.json
+    python bench_login_latency.py --username alice --password secret --save after.json
+    python bench_login_latency.py --compare before.json after.json
+
+Each successful sign-in creates a session; opaque tokens are signed out again so the
+run does not leave rows behind in the Tokens table.
+"""
+import argparse
+from configparser import ConfigParser
+
+import requests
+
+from bench_common import timed, summarize, print_table, save_results, compare_results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="../client_side/api_config.ini")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+    else:
+        config = ConfigParser()
+        config.read(args.config)
+        base = config["api"]["base_url"]
+        sign_in_url = f"{base}{config['auth']['sign_in']}"
+
+        samples = {"sign_in": [], "sign_in_bad_password": []}
+        for _ in range(args.iterations):
+            response, elapsed = timed(requests.post, sign_in_url, json={"username": args.username, "password": args.password})
+            if response.status_code != 200:
+                print(f"Sign in failed ({response.status_code}): {response.text}")
+                continue
+            samples["sign_in"].append(elapsed)
+            requests.post(f"{base}/sign-out", json={"token": response.json()["token"]})
+
+            response, elapsed = timed(requests.post, sign_in_url, json={"username": args.username, "password": args.password + "x"})
+            samples["sign_in_bad_password"].append(elapsed)
+
+        results = {name: summarize(values) for name, values in samples.items()}
+        print_table(results, "Sign-in latency (ms)")
+        if args.save:
+            save_results(args.save, results)
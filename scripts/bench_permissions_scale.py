@@ -0,0 +1,129 @@
+"""
+Compares JSON_CONTAINS(allowedUsers, ...) access checks with SnippetPermissions joins.
+
+    python bench_permissions_scale.py --config bench_config.ini --snippets 1000000 --seed
+    python bench_permissions_scale.py --config bench_config.ini --snippets 1000000
+    python bench_permissions_scale.py --config bench_config.ini --cleanup
+
+Run against a scratch copy of the database with sql/003 applied. --seed inserts bench-*
+users and snippets whose grants are written both to allowedUsers and to SnippetPermissions,
+so the old and new queries answer the same question over the same data.
+"""
+import argparse
+import json
+import random
+
+from bench_common import timed, summarize, print_table, load_config, get_db_connection
+
+BATCH_SIZE = 5000
+GRANTS_PER_SNIPPET = 3
+
+QUERIES = {
+    "download_json_contains": """
+        SELECT snippetId, s3Path, ownerId
+        FROM Snippets
+        WHERE fileName = %(file)s AND (JSON_CONTAINS(allowedUsers, %(user_json)s) OR ownerId = %(user)s)
+    """,
+    "download_permissions_join": """
+        SELECT snippetId, s3Path, ownerId
+        FROM Snippets
+        WHERE fileName = %(file)s AND ownerId = %(user)s
+        UNION ALL
+        SELECT s.snippetId, s.s3Path, s.ownerId
+        FROM SnippetPermissions p
+        JOIN Snippets s ON s.snippetId = p.snippetId
+        WHERE p.userId = %(user)s AND s.fileName = %(file)s
+        LIMIT 1
+    """,
+    "dashboard_json_contains": """
+        SELECT snippetId, fileName, ownerUsername, lastUpdated
+        FROM Snippets
+        WHERE ownerId = %(user)s OR JSON_CONTAINS(allowedUsers, %(user_json)s)
+    """,
+    "dashboard_permissions_join": """
+        SELECT snippetId, fileName, ownerUsername, lastUpdated
+        FROM Snippets
+        WHERE ownerId = %(user)s
+        UNION
+        SELECT s.snippetId, s.fileName, s.ownerUsername, s.lastUpdated
+        FROM SnippetPermissions p
+        JOIN Snippets s ON s.snippetId = p.snippetId
+        WHERE p.userId = %(user)s
+    """,
+}
+
+def user_id(i):
+    return f"bench-user-{i:08d}"
+
+def seed(connection, snippet_count, user_count):
+    rng = random.Random(42)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT IGNORE INTO Users (userId, username, passwordHash, totalUploads, totalDownloads, createdAt) VALUES (%s, %s, 'x', 0, 0, NOW())",
+            [(user_id(i), user_id(i)) for i in range(user_count)]
+        )
+    connection.commit()
+
+    for start in range(0, snippet_count, BATCH_SIZE):
+        snippets = []
+        grants = []
+        for i in range(start, min(start + BATCH_SIZE, snippet_count)):
+            snippet_id = f"bench-{i:010d}"
+            owner = rng.randrange(user_count)
+            allowed = sorted({user_id(rng.randrange(user_count)) for _ in range(rng.randrange(GRANTS_PER_SNIPPET + 1))})
+            snippets.append((snippet_id, user_id(owner), user_id(owner), f"file_{i}.py", "py",
+                             f"s3://bench/{snippet_id}", "bench", json.dumps(allowed)))
+            grants.extend((snippet_id, allowed_id) for allowed_id in allowed)
+
+        with connection.cursor() as cursor:
+            cursor.executemany("""
+                INSERT IGNORE INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, encryptionKey, allowedUsers)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, snippets)
+            if grants:
+                cursor.executemany("INSERT IGNORE INTO SnippetPermissions (snippetId, userId, role) VALUES (%s, %s, 'editor')", grants)
+        connection.commit()
+        print(f"Seeded {start + len(snippets)} / {snippet_count} snippets")
+
+def cleanup(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM SnippetPermissions WHERE snippetId LIKE 'bench-%'")
+        cursor.execute("DELETE FROM Snippets WHERE snippetId LIKE 'bench-%'")
+        cursor.execute("DELETE FROM Users WHERE userId LIKE 'bench-user-%'")
+    connection.commit()
+
+def run(connection, snippet_count, user_count, iterations):
+    rng = random.Random(7)
+    samples = {name: [] for name in QUERIES}
+    for _ in range(iterations):
+        params = {"user": user_id(rng.randrange(user_count)), "file": f"file_{rng.randrange(snippet_count)}.py"}
+        params["user_json"] = json.dumps(params["user"])
+        for name, sql in QUERIES.items():
+            with connection.cursor() as cursor:
+                _, elapsed = timed(cursor.execute, sql, params)
+                cursor.fetchall()
+            samples[name].append(elapsed)
+        connection.rollback()
+    return {name: summarize(values) for name, values in samples.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    parser.add_argument("--snippets", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", action="store_true", help="insert the bench rows before timing")
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench rows and exit")
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    try:
+        if args.cleanup:
+            cleanup(connection)
+        else:
+            if args.seed:
+                seed(connection, args.snippets, args.users)
+            results = run(connection, args.snippets, args.users, args.iterations)
+            print_table(results, f"Access checks over {args.snippets} snippets (ms)")
+    finally:
+        connection.close()
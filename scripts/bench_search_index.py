@@ -0,0 +1,214 @@
+"""
+Times /search queries (shared_layer/python/search_index.py) over a large index.
+
+    python bench_search_index.py --config bench_config.ini --documents 1000000 --seed
+    python bench_search_index.py --config bench_config.ini
+    python bench_search_index.py --config bench_config.ini --cleanup
+
+Run against a scratch copy of the database with sql/003 and sql/013 applied. --seed indexes
+--documents synthetic snippets (bench-search-*) owned by OTHER_USERS users, with Zipf-distributed
+key phrases and entities so a few terms are in a large share of the index and most are rare.
+Two viewers are timed: "light" owns 1 in 10,000 snippets; "heavy" owns 1 in 100 and was
+granted 4 in 100, so at 1M snippets it can access 50k of them.
+
+Each query case goes through search_index.search, so the timings include the document
+frequency lookup, the accessible postings query, BM25 scoring and the result rows.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import search_index
+
+from bench_common import timed, summarize, print_table, save_results, load_config, get_db_connection
+
+BATCH_SIZE = 2000
+OTHER_USERS = 1000
+SYNTHETIC_WORDS = 50000
+COMMON_WORDS = ["sort", "parse", "config", "request", "client", "list", "file", "read", "write", "cache", "user",
+                "token", "query", "string", "buffer", "tree", "graph", "node", "path", "retry", "json", "http",
+                "server", "stream", "bubble", "merge", "binary", "search", "hash", "queue"]
+FILE_TYPES = ["py", "js", "ts", "java", "go", "c", "cpp", "rs", "sql", "sh"]
+VIEWERS = {
+    "light": lambda i: "owner" if i % 10000 == 5 else None,
+    "heavy": lambda i: "owner" if i % 100 == 0 else ("grant" if i % 100 in (1, 2, 3, 4) else None),
+}
+QUERIES = {
+    "common_term": "sort",
+    "two_common_terms": "bubble sort",
+    "rare_term": f"w{SYNTHETIC_WORDS // 2}",
+    "identifier": "parseConfig",
+    "mixed_three_terms": f"http retry w{SYNTHETIC_WORDS // 3}",
+    "no_match": "zzzunknownterm",
+}
+
+def viewer_id(name):
+    return f"bench-search-viewer-{name}"
+
+def other_id(i):
+    return f"bench-search-other-{i:04d}"
+
+def vocabulary():
+    return COMMON_WORDS + [f"w{n}" for n in range(SYNTHETIC_WORDS)]
+
+def zipf_words(rng, words, cumulative, count):
+    return rng.choices(words, cum_weights=cumulative, k=count)
+
+def synthetic_metadata(rng, words, cumulative, i):
+    """(fileName, fileType, keyPhrases, entities) for the i-th bench snippet."""
+    file_type = FILE_TYPES[i % len(FILE_TYPES)]
+    name_words = zipf_words(rng, words, cumulative, 2)
+    key_phrases = zipf_words(rng, words, cumulative, 8)
+    entities = []
+    for _ in range(3):
+        first, second = zipf_words(rng, words, cumulative, 2)
+        entities.append(first + second.capitalize())
+    return f"{'_'.join(name_words)}_{i}.{file_type}", file_type, key_phrases, entities
+
+def seed(connection, documents):
+    rng = random.Random(documents)
+    words = vocabulary()
+    cumulative = []
+    total = 0.0
+    for rank in range(len(words)):
+        total += 1 / (rank + 1) ** 1.05
+        cumulative.append(total)
+
+    others = [other_id(i) for i in range(OTHER_USERS)]
+    users = [viewer_id(name) for name in VIEWERS] + others
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT IGNORE INTO Users (userId, username, passwordHash, totalUploads, totalDownloads, createdAt) VALUES (%s, %s, 'x', 0, 0, NOW())",
+            [(user, user) for user in users]
+        )
+    connection.commit()
+
+    document_counts = Counter()
+    total_length = 0.0
+    updated = datetime.datetime(2024, 1, 1).strftime('%Y-%m-%d %H:%M:%S')
+    for start in range(0, documents, BATCH_SIZE):
+        snippets, grants, metadata, postings = [], [], [], []
+        for i in range(start, min(start + BATCH_SIZE, documents)):
+            snippet_id = f"bench-search-{i:09d}"
+            owner = rng.choice(others)
+            for name, role_of in VIEWERS.items():
+                role = role_of(i)
+                if role == "owner":
+                    owner = viewer_id(name)
+                elif role == "grant":
+                    grants.append((snippet_id, viewer_id(name)))
+
+            file_name, file_type, key_phrases, entities = synthetic_metadata(rng, words, cumulative, i)
+            snippets.append((snippet_id, owner, owner, file_name, file_type, f"s3://bench/{snippet_id}", updated))
+            metadata.append((snippet_id, file_type, json.dumps(key_phrases), json.dumps(entities), updated, file_name))
+
+            weights = search_index.document_terms(file_name, file_type, key_phrases, entities)
+            length = sum(weights.values())
+            postings.extend((term, snippet_id, weight, length) for term, weight in weights.items())
+            document_counts.update(weights.keys())
+            total_length += length
+
+        with connection.cursor() as cursor:
+            cursor.executemany("""
+                INSERT IGNORE INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, encryptionKey, allowedUsers, lastUpdated)
+                VALUES (%s, %s, %s, %s, %s, %s, NULL, '[]', %s)
+            """, snippets)
+            if grants:
+                cursor.executemany("INSERT IGNORE INTO SnippetPermissions (snippetId, userId, role) VALUES (%s, %s, 'editor')", grants)
+            cursor.executemany("""
+                INSERT IGNORE INTO SnippetMetadata (snippetId, fileType, keyPhrases, entities, lastUpdated, popularity, fileName)
+                VALUES (%s, %s, %s, %s, %s, 0, %s)
+            """, metadata)
+            cursor.executemany(
+                "INSERT IGNORE INTO SearchPostings (term, snippetId, weight, docLength) VALUES (%s, %s, %s, %s)",
+                postings
+            )
+        connection.commit()
+        if (start // BATCH_SIZE) % 50 == 0 or start + BATCH_SIZE >= documents:
+            print(f"Seeded {start + len(snippets)} / {documents} snippets ({len(document_counts)} distinct terms so far)")
+
+    # Document frequencies and collection stats once at the end instead of per snippet
+    terms = sorted(document_counts.items())
+    with connection.cursor() as cursor:
+        for offset in range(0, len(terms), BATCH_SIZE):
+            cursor.executemany("""
+                INSERT INTO SearchTerms (term, documentCount) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE documentCount = documentCount + VALUES(documentCount)
+            """, terms[offset:offset + BATCH_SIZE])
+        cursor.execute(
+            "UPDATE SearchStats SET documentCount = documentCount + %s, totalLength = totalLength + %s WHERE statsId = 1",
+            (documents, total_length)
+        )
+    connection.commit()
+
+def cleanup(connection):
+    with connection.cursor() as cursor:
+        # Take the bench snippets back out of the document frequencies and collection stats
+        cursor.execute("""
+            SELECT term, COUNT(*) AS documentCount FROM SearchPostings
+            WHERE snippetId LIKE 'bench-search-%' GROUP BY term
+        """)
+        cursor.executemany(
+            "UPDATE SearchTerms SET documentCount = GREATEST(documentCount - %s, 0) WHERE term = %s",
+            [(row["documentCount"], row["term"]) for row in sorted(cursor.fetchall(), key=lambda row: row["term"])]
+        )
+        cursor.execute("""
+            SELECT COUNT(*) AS documentCount, COALESCE(SUM(docLength), 0) AS totalLength FROM (
+                SELECT snippetId, MAX(docLength) AS docLength FROM SearchPostings
+                WHERE snippetId LIKE 'bench-search-%' GROUP BY snippetId
+            ) bench
+        """)
+        removed = cursor.fetchone()
+        cursor.execute(
+            "UPDATE SearchStats SET documentCount = GREATEST(documentCount - %s, 0), totalLength = GREATEST(totalLength - %s, 0) WHERE statsId = 1",
+            (removed["documentCount"], removed["totalLength"])
+        )
+        cursor.execute("DELETE FROM SearchPostings WHERE snippetId LIKE 'bench-search-%'")
+        cursor.execute("DELETE FROM SnippetMetadata WHERE snippetId LIKE 'bench-search-%'")
+        cursor.execute("DELETE FROM SnippetPermissions WHERE snippetId LIKE 'bench-search-%'")
+        cursor.execute("DELETE FROM Snippets WHERE snippetId LIKE 'bench-search-%'")
+        cursor.execute("DELETE FROM Users WHERE userId LIKE 'bench-search-%'")
+    connection.commit()
+
+def run(connection, iterations):
+    results = {}
+    for viewer in VIEWERS:
+        for name, query in QUERIES.items():
+            samples = []
+            for _ in range(iterations):
+                with connection.cursor() as cursor:
+                    found, elapsed = timed(search_index.search, cursor, viewer_id(viewer), query)
+                connection.rollback()
+                samples.append(elapsed)
+            results[f"{viewer}_{name}"] = summarize(samples)
+            print(f"{viewer:<6} {query!r}: {len(found)} results")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    parser.add_argument("--documents", type=int, default=1000000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", action="store_true", help="index the bench snippets before timing")
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench rows and exit")
+    parser.add_argument("--save", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    try:
+        if args.cleanup:
+            cleanup(connection)
+        else:
+            if args.seed:
+                seed(connection, args.documents)
+            results = run(connection, args.iterations)
+            print_table(results, f"Search latency, top {search_index.DEFAULT_LIMIT} (ms)")
+            if args.save:
+                save_results(args.save, results)
+    finally:
+        connection.close()
@@ -0,0 +1,88 @@
+"""
+Download read path with and without the decrypted-content cache (shared_layer/python/snippet_cache.py).
+
+    python bench_snippet_cache.py [--snippets 500] [--reads 5000] [--size 4096] [--max-bytes 1048576] [--encrypt]
+
+Snippets are stored through snippet_crypto into the local S3 stand-in (a temporary directory),
+then read in a Zipf-like order (a few snippets are downloaded far more often than the rest),
+once straight from S3 and once through the cache. Every 50th read is preceded by an update of
+that snippet, which bumps its version. Reports per-read latency, hit ratio and bytes held.
+Against real S3 each miss also pays a network round trip, so the gap is wider in production.
+"""
+import argparse
+import base64
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+from configparser import ConfigParser
+
+from cryptography.fernet import Fernet
+
+from bench_common import timed, summarize, print_table
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import local_aws
+import snippet_cache
+import snippet_crypto
+
+BUCKET = "bench"
+
+def zipf_order(count, reads, rng, exponent=1.1):
+    weights = [1 / (rank + 1) ** exponent for rank in range(count)]
+    return rng.choices(range(count), weights=weights, k=reads)
+
+def run(s3, content, order, use_cache):
+    versions = {i: 1 for i in range(len(content))}
+    samples = []
+    for n, i in enumerate(order):
+        key = f"snippets/{i}-{versions[i]}"
+        if n % 50 == 49:
+            versions[i] += 1
+            key = f"snippets/{i}-{versions[i]}"
+            snippet_crypto.put_snippet(s3, BUCKET, key, f"# version {versions[i]}\n" + content[i])
+        if use_cache:
+            load = lambda: snippet_crypto.get_snippet(s3, BUCKET, key)
+            _, elapsed = timed(snippet_cache.get_or_load, str(i), versions[i], load)
+        else:
+            _, elapsed = timed(snippet_crypto.get_snippet, s3, BUCKET, key)
+        samples.append(elapsed)
+    return summarize(samples)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snippets", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=4096, help="snippet size in bytes")
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024, help="cache budget")
+    parser.add_argument("--encrypt", action="store_true", help="hold cached content encrypted")
+    args = parser.parse_args()
+
+    config = ConfigParser()
+    config.read_dict({
+        "encryption": {"fernet_key": Fernet.generate_key().decode()},
+        "cache": {"max_bytes": str(args.max_bytes), "encrypt": str(args.encrypt).lower()},
+    })
+    snippet_crypto.configure(config)
+    snippet_cache.configure(config)
+
+    rng = random.Random(42)
+    content = [base64.b64encode(rng.randbytes(args.size * 3 // 4)).decode() for _ in range(args.snippets)]
+    order = zipf_order(args.snippets, args.reads, rng)
+
+    with tempfile.TemporaryDirectory() as root:
+        s3 = local_aws.LocalS3(root)
+        for i, text in enumerate(content):
+            snippet_crypto.put_snippet(s3, BUCKET, f"snippets/{i}-1", text)
+
+        # get_or_load logs a line per read, which would dominate the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = {"s3_every_read": run(s3, content, order, use_cache=False)}
+            results["cached"] = run(s3, content, order, use_cache=True)
+
+    print_table(results, f"Snippet read latency (ms), {args.snippets} snippets of {args.size} bytes")
+    stats = snippet_cache.get_stats()
+    print(f"\nhit ratio {stats['hitRatio']}, {stats['stale']} stale, {stats['evictions']} evictions, "
+          f"{stats['bytes']} of {stats['maxBytes']} bytes held, encrypted={stats['encrypted']}")
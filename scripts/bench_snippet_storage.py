@@ -0,0 +1,97 @@
+"""
+Compares bytes stored and encrypt/decrypt time for the snippet storage formats.
+
+    python bench_snippet_storage.py --corpus ~/src/some-project [--extensions .py .js .java]
+
+Every matching file under --corpus is treated as one snippet. "legacy" is the old format
+(Fernet token as base64 text); the other rows are the snippet_crypto envelope with each
+codec and level. zstd rows are skipped when zstandard is not installed.
+"""
+import argparse
+import os
+import sys
+from configparser import ConfigParser
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import snippet_crypto
+
+from bench_common import timed, summarize, print_table, save_results
+
+DEFAULT_EXTENSIONS = [".py", ".js", ".ts", ".java", ".c", ".cpp", ".go", ".rb", ".sql", ".sh"]
+VARIANTS = [("none", 0), ("zlib", 1), ("zlib", 6), ("zlib", 9), ("zstd", 3), ("zstd", 9), ("zstd", 19)]
+
+def load_corpus(root, extensions, max_bytes):
+    snippets = []
+    for directory, _, files in os.walk(root):
+        for name in sorted(files):
+            if os.path.splitext(name)[1] not in extensions:
+                continue
+            path = os.path.join(directory, name)
+            if os.path.getsize(path) > max_bytes:
+                continue
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            if text:
+                snippets.append(text)
+    return snippets
+
+def make_config(key, codec, level):
+    config = ConfigParser()
+    config.read_dict({"encryption": {"fernet_key": key, "codec": codec, "compression_level": str(level)}})
+    return config
+
+def measure(snippets, encrypt, decrypt):
+    stored_bytes = 0
+    encrypt_ms = []
+    decrypt_ms = []
+    for text in snippets:
+        stored, elapsed = timed(encrypt, text)
+        encrypt_ms.append(elapsed)
+        stored_bytes += len(stored)
+        result, elapsed = timed(decrypt, stored)
+        decrypt_ms.append(elapsed)
+        assert result == text
+    return stored_bytes, summarize(encrypt_ms), summarize(decrypt_ms)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), ".."))
+    parser.add_argument("--extensions", nargs="+", default=DEFAULT_EXTENSIONS)
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024, help="skip files larger than this")
+    parser.add_argument("--save", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    snippets = load_corpus(args.corpus, set(args.extensions), args.max_bytes)
+    plaintext_bytes = sum(len(text.encode()) for text in snippets)
+    print(f"Corpus: {len(snippets)} snippets, {plaintext_bytes} bytes of plaintext")
+
+    key = Fernet.generate_key().decode()
+    cipher = Fernet(key.encode())
+    sizes = {}
+    results = {}
+
+    sizes["legacy"], results["legacy_encrypt"], results["legacy_decrypt"] = measure(
+        snippets,
+        lambda text: cipher.encrypt(text.encode()).decode().encode(),
+        lambda stored: cipher.decrypt(stored).decode(),
+    )
+
+    for codec, level in VARIANTS:
+        if codec == "zstd" and snippet_crypto.zstandard is None:
+            continue
+        name = f"{codec}_{level}"
+        snippet_crypto.configure(make_config(key, codec, level))
+        sizes[name], results[f"{name}_encrypt"], results[f"{name}_decrypt"] = measure(
+            snippets, snippet_crypto.encrypt_snippet, snippet_crypto.decrypt_snippet
+        )
+
+    print("\n=== Bytes stored ===")
+    print(f"{'format':<12}{'bytes':>14}{'vs plaintext':>14}{'vs legacy':>12}")
+    for name, stored_bytes in sizes.items():
+        print(f"{name:<12}{stored_bytes:>14}{stored_bytes / plaintext_bytes:>13.2f}x{stored_bytes / sizes['legacy']:>11.2f}x")
+
+    print_table(results, "Per-snippet encrypt / decrypt time (ms)")
+    if args.save:
+        save_results(args.save, {"sizes": sizes, "plaintextBytes": plaintext_bytes, **results})
@@ -0,0 +1,57 @@
+"""
+Compares token validation cost: Tokens-table lookup vs. signed token verification.
+
+    python bench_token_validation.py --config bench_config.ini --user-id <existing userId>
+
+bench_config.ini needs an [rds] section (same keys as the lambda configs) and an
+[auth] token_secret. A temporary Tokens row is inserted for the run and removed afterwards.
+"""
+import argparse
+import datetime
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import token_auth
+
+from bench_common import timed, summarize, print_table, load_config, get_db_connection
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    token_auth.configure(config)
+    # Measure the raw lookup, not the warm-container cache
+    token_auth.REVOCATION_WINDOW_SECONDS = 0
+
+    connection = get_db_connection(config)
+    expiration = datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
+    opaque_token = str(uuid.uuid4())
+    signed_token = token_auth.issue_signed_token(args.user_id, expiration)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO Tokens (token, userId, expiration_utc) VALUES (%s, %s, %s)",
+                           (opaque_token, args.user_id, expiration))
+        connection.commit()
+
+        results = {}
+        for name, token in [("tokens_table", opaque_token), ("signed", signed_token)]:
+            samples = []
+            for _ in range(args.iterations):
+                (user_id, error), elapsed = timed(token_auth.check_token, connection, token)
+                assert user_id == args.user_id, error
+                samples.append(elapsed)
+            results[name] = summarize(samples)
+
+        print_table(results, "Token validation (ms)")
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM Tokens WHERE token = %s", (opaque_token,))
+        connection.commit()
+        connection.close()
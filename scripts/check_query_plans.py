@@ -0,0 +1,69 @@
+"""
+Runs EXPLAIN on the snippet lookup, dashboard and search queries the handlers use and fails if
+any of them falls back to a full table scan (EXPLAIN type ALL). Scans of derived tables
+and union results (<derived2>, <union2,3>) are expected and not counted.
+
+    python check_query_plans.py --config bench_config.ini
+
+Exits with status 1 when a plan regresses, so it can gate a deployment or a migration.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import content_index
+import search_index
+import snippet_lookup
+
+from bench_common import load_config, get_db_connection
+
+SAMPLE_USER_ID = "00000000-0000-0000-0000-000000000000"
+SAMPLE_FILE_NAME = "example.py"
+
+# name -> (sql, params)
+CHECKED_QUERIES = {
+    "owned_snippet": (snippet_lookup.OWNED_SNIPPET_SQL, (SAMPLE_USER_ID, SAMPLE_FILE_NAME)),
+    "owned_snippets": (snippet_lookup.OWNED_SNIPPETS_SQL, (SAMPLE_USER_ID, (SAMPLE_FILE_NAME, "other.py"))),
+    "accessible_snippet": (snippet_lookup.ACCESSIBLE_SNIPPET_SQL,
+                           (SAMPLE_USER_ID, SAMPLE_FILE_NAME, SAMPLE_USER_ID, SAMPLE_FILE_NAME)),
+    "dashboard_page": (snippet_lookup.DASHBOARD_PAGE_SQL,
+                       {"user": SAMPLE_USER_ID, "after_time": "9999-12-31 23:59:59", "after_id": "", "limit": 51}),
+    "search_postings": (search_index.ACCESSIBLE_POSTINGS_SQL, {"user": SAMPLE_USER_ID, "terms": ("sort", "bubble")}),
+    "search_results": (search_index.SEARCH_RESULTS_SQL, (("00000000-0000-0000-0000-000000000001",),)),
+    "content_candidates": (content_index.ACCESSIBLE_CANDIDATES_SQL,
+                           {"user": SAMPLE_USER_ID, "trigrams": (1, 2, 3), "count": 3}),
+    "content_partial": (content_index.ACCESSIBLE_PARTIAL_SQL, {"user": SAMPLE_USER_ID}),
+    "content_snippets": (content_index.CANDIDATE_SNIPPETS_SQL, (("00000000-0000-0000-0000-000000000001",),)),
+}
+
+def check_plans(connection):
+    failures = []
+    with connection.cursor() as cursor:
+        for name, (sql, params) in CHECKED_QUERIES.items():
+            cursor.execute("EXPLAIN " + sql, params)
+            for row in cursor.fetchall():
+                table = row.get("table")
+                access = row.get("type")
+                print(f"{name:<24}{str(table):<24}{str(access):<10}{str(row.get('key'))}")
+                if access == "ALL" and not str(table).startswith("<"):
+                    failures.append(f"{name}: full scan on {table}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    try:
+        failures = check_plans(connection)
+    finally:
+        connection.close()
+
+    if failures:
+        print("\nFull table scans found:")
+        for failure in failures:
+            print(f"- {failure}")
+        sys.exit(1)
+    print("\nAll snippet queries use an index.")
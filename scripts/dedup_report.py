@@ -0,0 +1,74 @@
+"""
+Reports how much content-addressed storage saves.
+
+    python dedup_report.py --config bench_config.ini [--top 10]
+
+Logical bytes count every snippet's object as if it were stored separately; stored bytes
+count each SnippetObjects row once. Snippets uploaded before sql/008 (contentHash NULL)
+still own one object each and are listed separately.
+"""
+import argparse
+
+from bench_common import load_config, get_db_connection
+
+def human(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+
+def report(connection, top):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) AS objects,
+                   IFNULL(SUM(refCount), 0) AS refs,
+                   IFNULL(SUM(sizeBytes), 0) AS storedBytes,
+                   IFNULL(SUM(sizeBytes * refCount), 0) AS logicalBytes
+            FROM SnippetObjects
+        """)
+        totals = cursor.fetchone()
+
+        cursor.execute("SELECT COUNT(*) AS legacy FROM Snippets WHERE contentHash IS NULL")
+        legacy = cursor.fetchone()["legacy"]
+
+        cursor.execute("""
+            SELECT contentHash, refCount, sizeBytes
+            FROM SnippetObjects
+            WHERE refCount > 1
+            ORDER BY sizeBytes * (refCount - 1) DESC
+            LIMIT %s
+        """, (top,))
+        shared = cursor.fetchall()
+
+    objects, refs = int(totals["objects"]), int(totals["refs"])
+    stored, logical = int(totals["storedBytes"]), int(totals["logicalBytes"])
+    ratio = logical / stored if stored else 1.0
+
+    print(f"Snippets on content-addressed storage: {refs}")
+    print(f"Distinct objects:                      {objects}")
+    print(f"Logical size:                          {human(logical)}")
+    print(f"Stored size:                           {human(stored)}")
+    print(f"Dedup ratio:                           {ratio:.2f}x")
+    print(f"Bytes saved:                           {human(logical - stored)} ({logical - stored} bytes)")
+    print(f"Legacy snippets (own object each):     {legacy}")
+
+    if shared:
+        print("\nMost shared objects:")
+        print(f"{'contentHash':<20}{'refs':>8}{'size':>12}{'saved':>12}")
+        for row in shared:
+            saved = int(row["sizeBytes"]) * (int(row["refCount"]) - 1)
+            print(f"{row['contentHash'][:16] + '...':<20}{row['refCount']:>8}{human(int(row['sizeBytes'])):>12}{human(saved):>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="bench_config.ini")
+    parser.add_argument("--top", type=int, default=10, help="list this many of the most shared objects")
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    try:
+        report(connection, args.top)
+    finally:
+        connection.close()
@@ -0,0 +1,249 @@
+"""
+Runs the lambda handlers on this machine against the local backends (see shared_layer/python/backends.py).
+
+    python local_run.py smoke [--verbose]
+    python local_run.py bench [--iterations 50] [--save local.json]
+    python local_run.py --compare before.json after.json
+
+No network or AWS account is needed: MySQL is replaced by a SQLite file, S3 by a
+directory, Lambda invoke by an in-process dispatcher and Comprehend by a deterministic
+stand-in. The Python packages the handlers import (pymysql, boto3, bcrypt, cryptography)
+must still be installed. All state lives under --local-dir, so delete it to start over.
+
+"smoke" calls every handler once and checks the responses; "bench" times each handler
+(in-process, so the numbers are handler + SQLite cost, not network or RDS latency).
+"""
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import os
+import re
+import sys
+import uuid
+from configparser import ConfigParser
+
+from cryptography.fernet import Fernet
+
+from bench_common import timed, summarize, print_table, save_results, compare_results
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "shared_layer", "python"))
+import backends
+
+# Name under which upload/update invoke the metadata extractor
+FUNCTION_NAMES = {"extract_metadata_lambda": "project_extract_metadata"}
+
+def write_configs(local_dir):
+    """Writes one config with every section the handlers read, under each handler's config file name."""
+    key_path = os.path.join(local_dir, "fernet.key")
+    if not os.path.exists(key_path):
+        with open(key_path, "w") as f:
+            f.write(Fernet.generate_key().decode())
+    with open(key_path) as f:
+        fernet_key = f.read().strip()
+
+    config = ConfigParser()
+    config.read_dict({
+        "rds": {"endpoint": "localhost", "port_number": "3306", "user_name": "local", "user_pwd": "local", "db_name": "snippet_hub"},
+        "s3": {"bucket_name": "snippet-hub-local", "snippets_folder": "snippets"},
+        "encryption": {"fernet_key": fernet_key},
+        "aws": {"region": "us-east-1"},
+    })
+
+    names = set()
+    for path in glob.glob(os.path.join(REPO_ROOT, "*_lambda", "lambda_function.py")):
+        with open(path) as f:
+            names.update(re.findall(r"config_file\s*=\s*['\"]([\w.]+\.ini)['\"]", f.read()))
+    for name in names:
+        with open(os.path.join(local_dir, name), "w") as f:
+            config.write(f)
+
+def load_handlers():
+    """Imports every lambda_function.py as <folder>.lambda_handler and registers them for invoke."""
+    handlers = {}
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, "*_lambda", "lambda_function.py"))):
+        folder = os.path.basename(os.path.dirname(path))
+        spec = importlib.util.spec_from_file_location(f"{folder}_function", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        handlers[folder] = module.lambda_handler
+        backends.register_function(FUNCTION_NAMES.get(folder, folder), module.lambda_handler)
+    return handlers
+
+class LocalApi:
+    """Calls handlers with API Gateway-shaped events, then runs any queued async invocations."""
+
+    def __init__(self, handlers, verbose=False):
+        self.handlers = handlers
+        self.verbose = verbose
+        self.token = None
+
+    def call(self, name, body=None, query=None, headers=None):
+        event = {"headers": dict(headers or {})}
+        if self.token:
+            event["headers"].setdefault("Authorization", f"Bearer {self.token}")
+        if body is not None:
+            event["body"] = json.dumps(body)
+        if query is not None:
+            event["queryStringParameters"] = query
+
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            response = self.handlers[name](event, None)
+            backends.run_pending_invocations()
+        return response
+
+def start(local_dir, verbose=False):
+    """Switches to the local backends under local_dir, loads every handler and returns a LocalApi."""
+    local_dir = os.path.abspath(local_dir)
+    os.makedirs(local_dir, exist_ok=True)
+    os.environ["SNIPPET_HUB_BACKEND"] = "local"
+    os.environ["SNIPPET_HUB_LOCAL_DIR"] = local_dir
+    write_configs(local_dir)
+    # Handlers read their config file from the working directory when imported
+    os.chdir(local_dir)
+    return LocalApi(load_handlers(), verbose=verbose)
+
+def payload(response):
+    return json.loads(response["body"]) if response.get("body") else {}
+
+def expect(response, status, label):
+    if response["statusCode"] != status:
+        raise SystemExit(f"FAIL {label}: expected {status}, got {response['statusCode']}: {response.get('body')}")
+    print(f"ok   {label}")
+    return payload(response)
+
+def smoke(api):
+    suffix = uuid.uuid4().hex[:8]
+    alice, bob = f"alice_{suffix}", f"bob_{suffix}"
+
+    for user in (alice, bob):
+        expect(api.call("create_account_lambda", {"username": user, "password": "secret"}), 200, f"create_account {user}")
+    bob_token = expect(api.call("sign_in_lambda", {"username": bob, "password": "secret"}), 200, "sign_in bob")["token"]
+    api.token = expect(api.call("auth_lambda", {"username": alice, "password": "secret"}), 200, "auth alice")["token"]
+    expect(api.call("auth_lambda", {"token": api.token}), 200, "auth validate token")
+
+    content = "import os\n\ndef list_files(path):\n    return sorted(os.listdir(path))\n"
+    expect(api.call("upload_snippet_lambda", {"fileName": "files.py", "fileContent": content}), 200, "upload")
+    downloaded = expect(api.call("download_lambda", {"fileName": "files.py"}), 200, "download")
+    assert downloaded["content"] == content, "downloaded content differs"
+
+    patch = "@@ -4 +4 @@\n-    return sorted(os.listdir(path))\n+    return sorted(os.listdir(path or '.'))\n"
+    expect(api.call("update_lambda", {"fileName": "files.py", "patch": patch, "baseVersion": downloaded["version"]}), 200, "update (patch)")
+    expect(api.call("update_lambda", {"fileName": "files.py", "fileContent": "x = 1\n", "baseVersion": downloaded["version"]}), 409, "update (stale version)")
+    assert payload(api.call("download_lambda", {"fileName": "files.py"}))["content"] == content.replace("listdir(path)", "listdir(path or '.')")
+
+    # Growing past inline_max_bytes moves the content to S3; shrinking brings it back into the row
+    for label, text in [("to S3", content * 200), ("back inline", content)]:
+        version = expect(api.call("download_lambda", {"fileName": "files.py", "mode": "edit"}), 200, "download (edit)")["version"]
+        expect(api.call("update_lambda", {"fileName": "files.py", "fileContent": text, "baseVersion": version}), 200, f"update (moves {label})")
+        assert payload(api.call("download_lambda", {"fileName": "files.py"}))["content"] == text, f"content differs after moving {label}"
+
+    found = expect(api.call("search_lambda", {"query": "list files"}), 200, "search")
+    assert [result["fileName"] for result in found["results"]][:1] == ["files.py"], "search did not rank files.py first"
+    expect(api.call("search_lambda", {}), 400, "search (missing query)")
+    found = expect(api.call("search_lambda", {"query": "os.listdir(", "mode": "substring"}), 200, "search (content substring)")
+    assert [result["fileName"] for result in found["results"]] == ["files.py"], "substring search did not find files.py"
+    found = expect(api.call("search_lambda", {"query": r"def \w+_files\(", "mode": "regex"}), 200, "search (content regex)")
+    assert found["results"] and found["results"][0]["lines"][0]["line"] == 3, "regex search did not find the def line"
+    assert not payload(api.call("search_lambda", {"query": "listdir(path or", "mode": "substring"}))["results"], "stale content still matched"
+    expect(api.call("search_lambda", {"query": r"\w+", "mode": "regex"}), 400, "search (regex without literals)")
+    alice_token, api.token = api.token, bob_token
+    assert not payload(api.call("search_lambda", {"query": "list files"}))["results"], "search returned a snippet bob cannot access"
+    assert not payload(api.call("search_lambda", {"query": "os.listdir(", "mode": "substring"}))["results"], "content search returned a snippet bob cannot access"
+    api.token = alice_token
+    expect(api.call("set_permissions_lambda", {"fileName": "files.py", "targetUsername": bob, "permissionAction": "grant"}), 200, "set_permissions grant")
+
+    page = expect(api.call("dashboard_lambda", query={}), 200, "dashboard")
+    etag = api.call("dashboard_lambda", query={})["headers"]["ETag"]
+    expect(api.call("dashboard_lambda", query={}, headers={"If-None-Match": etag}), 304, "dashboard (not modified)")
+    assert any(s["fileName"] == "files.py" for s in page["snippets"]), "uploaded snippet missing from dashboard"
+
+    started = expect(api.call("upload_snippet_lambda", {"fileName": "blob.bin", "mode": "presigned"}), 200, "upload (presigned)")
+    backends.client("s3").put_object(Bucket="snippet-hub-local", Key=started["fields"]["key"], Body=b"client-encrypted bytes")
+    expect(api.call("upload_snippet_lambda", {"mode": "complete", "uploadId": started["uploadId"]}), 200, "upload (complete)")
+    expect(api.call("download_lambda", {"fileName": "blob.bin", "mode": "presigned"}), 200, "download (presigned)")
+    blob = expect(api.call("download_lambda", {"fileName": "blob.bin", "mode": "edit"}), 200, "download (edit, client-encrypted)")
+    assert blob["clientEncrypted"] and "content" not in blob, "edit mode returned content of a client-encrypted snippet"
+
+    expect(api.call("summary_lambda", query={}), 200, "summary")
+    expect(api.call("download_counter_lambda", {}), 200, "download_counter")
+
+    alice_token, api.token = api.token, bob_token
+    shared = expect(api.call("download_lambda", {"fileName": "files.py"}), 200, "download as grantee")
+    assert shared["downloadCount"] >= 1, "flushed downloads missing from downloadCount"
+    found = expect(api.call("search_lambda", {"query": "list_files"}), 200, "search as grantee")
+    assert [result["fileName"] for result in found["results"]] == ["files.py"], "grantee cannot find the shared snippet"
+    found = expect(api.call("search_lambda", {"query": "SORTED(OS", "mode": "substring", "ignoreCase": True}), 200, "search content as grantee")
+    assert [result["fileName"] for result in found["results"]] == ["files.py"], "grantee cannot search the shared snippet's content"
+    api.token = alice_token
+
+    expect(api.call("delete_lambda", {"fileName": "files.py"}), 200, "delete")
+    expect(api.call("delete_lambda", {"fileName": "blob.bin"}), 200, "delete (direct upload)")
+    large = "".join(f"value_{i} = {i}\n" for i in range(1000))
+    expect(api.call("upload_snippet_lambda", {"fileName": "large.py", "fileContent": large}), 200, "upload (S3 object)")
+    expect(api.call("delete_lambda", {"fileName": "large.py"}), 200, "delete (S3 object)")
+    assert not payload(api.call("search_lambda", {"query": "list files"}))["results"], "deleted snippet still found by search"
+    assert not payload(api.call("search_lambda", {"query": "os.listdir(", "mode": "substring"}))["results"], "deleted snippet still found by content search"
+    expect(api.call("token_reaper_lambda", {}), 200, "token_reaper")
+    swept = expect(api.call("object_sweeper_lambda", {}), 200, "object_sweeper")
+    assert swept["objectsRemoved"] >= 1, "released content object was not swept"
+    expect(api.call("sign_out_lambda", {"token": api.token}), 200, "sign_out")
+    print("\nAll handlers responded as expected.")
+
+def bench(api, iterations):
+    suffix = uuid.uuid4().hex[:8]
+    username = f"bench_{suffix}"
+    api.call("create_account_lambda", {"username": username, "password": "secret"})
+    api.token = payload(api.call("sign_in_lambda", {"username": username, "password": "secret"}))["token"]
+
+    samples = {name: [] for name in ["upload", "download", "update", "search", "dashboard", "summary", "delete"]}
+    for i in range(iterations):
+        file_name = f"bench_{i}.py"
+        content = f"def bench_{i}(value):\n    return value * {i}\n"
+        response, elapsed = timed(api.call, "upload_snippet_lambda", {"fileName": file_name, "fileContent": content})
+        samples["upload"].append(elapsed)
+        response, elapsed = timed(api.call, "download_lambda", {"fileName": file_name})
+        samples["download"].append(elapsed)
+        version = payload(response)["version"]
+        calls = [
+            ("update", "update_lambda", {"fileName": file_name, "fileContent": content + "# edited\n", "baseVersion": version}, None),
+            ("search", "search_lambda", {"query": f"bench {i}"}, None),
+            ("dashboard", "dashboard_lambda", None, {}),
+            ("summary", "summary_lambda", None, {}),
+            ("delete", "delete_lambda", {"fileName": file_name}, None),
+        ]
+        for name, handler, body, query in calls:
+            response, elapsed = timed(api.call, handler, body, query)
+            if response["statusCode"] >= 400:
+                print(f"{name} failed ({response['statusCode']}): {response.get('body')}")
+                continue
+            samples[name].append(elapsed)
+
+    return {name: summarize(values) for name, values in samples.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["smoke", "bench"], default="smoke")
+    parser.add_argument("--local-dir", default=os.path.join(REPO_ROOT, ".snippet_hub_local"))
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--verbose", action="store_true", help="show the handlers' own log output")
+    parser.add_argument("--save", help="write bench results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        sys.exit(0)
+
+    api = start(args.local_dir, verbose=args.verbose)
+    if args.command == "smoke":
+        smoke(api)
+    else:
+        results = bench(api, args.iterations)
+        print_table(results, f"Handler latency, local backends (ms, {args.iterations} iterations)")
+        if args.save:
+            save_results(args.save, results)
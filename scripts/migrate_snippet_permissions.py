@@ -0,0 +1,96 @@
+"""
+Backfills SnippetPermissions from the JSON arrays in Snippets.allowedUsers.
+
+    python migrate_snippet_permissions.py --config migrate_config.ini [--batch-size 1000]
+
+Apply sql/003_snippet_permissions.sql first. Snippets are walked in snippetId order in
+small batches, each committed on its own, so the run never holds long locks and can be
+stopped and re-run safely (existing grants are left alone).
+
+allowedUsers entries are normally userIds, but older dashboard code compared usernames,
+so entries that match a username are resolved to that user's id as well.
+"""
+import argparse
+import json
+import time
+
+from bench_common import load_config, get_db_connection
+
+def backfill(connection, batch_size):
+    last_snippet_id = ""
+    scanned = 0
+    granted = 0
+    unresolved = 0
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT snippetId, allowedUsers
+                FROM Snippets
+                WHERE snippetId > %s
+                ORDER BY snippetId
+                LIMIT %s
+            """, (last_snippet_id, batch_size))
+            snippets = cursor.fetchall()
+            if not snippets:
+                break
+
+            last_snippet_id = snippets[-1]["snippetId"]
+            scanned += len(snippets)
+
+            entries = {}
+            for snippet in snippets:
+                try:
+                    allowed = json.loads(snippet["allowedUsers"] or "[]")
+                except (TypeError, ValueError):
+                    allowed = []
+                if allowed:
+                    entries[snippet["snippetId"]] = [str(entry) for entry in allowed]
+
+            names = {entry for allowed in entries.values() for entry in allowed}
+            if not names:
+                continue
+
+            cursor.execute(
+                "SELECT userId, username FROM Users WHERE userId IN %s OR username IN %s",
+                (tuple(names), tuple(names))
+            )
+            user_ids = {}
+            for row in cursor.fetchall():
+                user_ids[row["userId"]] = row["userId"]
+                user_ids[row["username"]] = row["userId"]
+
+            rows = set()
+            for snippet_id, allowed in entries.items():
+                for entry in allowed:
+                    if entry in user_ids:
+                        rows.add((snippet_id, user_ids[entry]))
+                    else:
+                        unresolved += 1
+
+            if rows:
+                cursor.executemany(
+                    "INSERT IGNORE INTO SnippetPermissions (snippetId, userId, role) VALUES (%s, %s, 'editor')",
+                    sorted(rows)
+                )
+                granted += cursor.rowcount
+        connection.commit()
+        print(f"Scanned {scanned} snippets, {granted} grants inserted so far...")
+
+    return scanned, granted, unresolved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="migrate_config.ini")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    start = time.perf_counter()
+    try:
+        scanned, granted, unresolved = backfill(connection, args.batch_size)
+    finally:
+        connection.close()
+
+    print(f"Done in {time.perf_counter() - start:.1f}s: {scanned} snippets scanned, "
+          f"{granted} grants inserted, {unresolved} entries did not match any user.")
@@ -0,0 +1,86 @@
+"""
+Indexes the content of every server-encrypted snippet for content search (shared_layer/python/content_index.py).
+
+    python rebuild_content_index.py --config migrate_config.ini [--workers 8] [--batch-size 200]
+
+Run once after applying sql/014_content_index.sql; upload and update keep the index up to
+date from then on. The config needs the same [rds], [s3] and [encryption] sections as the
+upload lambda. Snippets are read in snippetId order; their content is fetched and decrypted
+by a thread pool, then indexed and committed one batch at a time. index_content only writes
+the postings that differ, so the run can be interrupted and repeated.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import backends
+import content_index
+import snippet_crypto
+import snippet_keys
+import snippet_lookup
+import snippet_objects
+
+from bench_common import load_config
+from rotate_snippet_keys import connect
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="migrate_config.ini")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    snippet_crypto.configure(config)
+    snippet_keys.configure(config)
+    content_index.configure(config)
+    bucket = config["s3"]["bucket_name"]
+    s3 = backends.client("s3")
+
+    connection = connect(config)
+    start = time.perf_counter()
+    indexed = failed = plaintext_bytes = 0
+    last_id = ""
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            while True:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT {", ".join(snippet_lookup.SNIPPET_COLUMNS)}
+                        FROM Snippets
+                        WHERE snippetId > %s AND clientEncrypted = 0
+                        ORDER BY snippetId
+                        LIMIT %s
+                    """, (last_id, args.batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1]["snippetId"]
+
+                    futures = [(row, pool.submit(snippet_objects.load_content, s3, bucket, row)) for row in rows]
+                    for row, future in futures:
+                        try:
+                            text = future.result()
+                        except Exception as e:
+                            print(f"FAILED {row['snippetId']}: {e}")
+                            failed += 1
+                            continue
+                        # index_content logs a line per snippet, which would bury the progress lines
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            content_index.index_content(cursor, row["snippetId"], text)
+                        indexed += 1
+                        plaintext_bytes += len(text.encode())
+                connection.commit()
+                elapsed = time.perf_counter() - start
+                print(f"Indexed {indexed} snippets so far, {failed} failed | {plaintext_bytes / elapsed / (1024 * 1024):.2f} MB/s")
+    finally:
+        connection.close()
+
+    print(f"\nIndexed {indexed} snippets ({plaintext_bytes} bytes) in {time.perf_counter() - start:.1f}s; "
+          f"{failed} failed (run again to retry).")
+    sys.exit(1 if failed else 0)
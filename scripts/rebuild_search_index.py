@@ -0,0 +1,57 @@
+"""
+Indexes every SnippetMetadata row for /search (shared_layer/python/search_index.py).
+
+    python rebuild_search_index.py --config migrate_config.ini [--batch-size 500]
+
+Run once after applying sql/013_search_index.sql; extract_metadata_lambda keeps the index up
+to date from then on. Each snippet is reindexed with search_index.index_snippet, which
+replaces its postings, so the run can be interrupted and repeated and is safe while the
+lambdas are live. Rows are read in snippetId order and committed one batch at a time.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import search_index
+
+from bench_common import load_config, get_db_connection
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="migrate_config.ini")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    start = time.perf_counter()
+    indexed = 0
+    last_id = ""
+    try:
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT snippetId, fileName, fileType, keyPhrases, entities
+                    FROM SnippetMetadata
+                    WHERE snippetId > %s
+                    ORDER BY snippetId
+                    LIMIT %s
+                """, (last_id, args.batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    search_index.index_snippet(
+                        cursor, row["snippetId"], row["fileName"] or "", row["fileType"] or "",
+                        json.loads(row["keyPhrases"] or "[]"), json.loads(row["entities"] or "[]")
+                    )
+            connection.commit()
+            indexed += len(rows)
+            last_id = rows[-1]["snippetId"]
+            print(f"Indexed {indexed} snippets...")
+    finally:
+        connection.close()
+
+    print(f"Indexed {indexed} snippets in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,44 @@
+"""
+Recomputes UserStats from Snippets, for every user or just one.
+
+    python rebuild_user_stats.py --config migrate_config.ini [--user-id <userId>]
+
+Each user is rebuilt and committed on its own, so the run can be interrupted and repeated.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import user_stats
+
+from bench_common import load_config, get_db_connection
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="migrate_config.ini")
+    parser.add_argument("--user-id", help="rebuild only this user")
+    args = parser.parse_args()
+
+    connection = get_db_connection(load_config(args.config))
+    start = time.perf_counter()
+    rebuilt = 0
+    try:
+        with connection.cursor() as cursor:
+            if args.user_id:
+                user_ids = [args.user_id]
+            else:
+                cursor.execute("SELECT userId FROM Users ORDER BY userId")
+                user_ids = [row["userId"] for row in cursor.fetchall()]
+
+            for user_id in user_ids:
+                user_stats.rebuild_user_stats(cursor, user_id)
+                connection.commit()
+                rebuilt += 1
+                if rebuilt % 1000 == 0:
+                    print(f"Rebuilt {rebuilt} / {len(user_ids)} users...")
+    finally:
+        connection.close()
+
+    print(f"Rebuilt stats for {rebuilt} users in {time.perf_counter() - start:.1f}s.")
@@ -0,0 +1,276 @@
+"""
+Master key rotation and legacy re-encryption for per-object data keys (shared_layer/python/snippet_keys.py).
+
+    python rotate_snippet_keys.py rewrap --config migrate_config.ini [--batch-size 500]
+    python rotate_snippet_keys.py reencrypt --config migrate_config.ini [--workers 8] [--batch-size 200] [--limit N]
+    python rotate_snippet_keys.py status --config migrate_config.ini
+
+The config needs the same [rds], [s3] (bucket_name, snippets_folder), [encryption] and
+[storage] sections as the upload lambda.
+
+rewrap: after adding a new master key to master_keys and pointing master_key_id at it in
+every lambda config, rewraps each SnippetObjects and Snippets encryptionKey under it. Only
+the small key strings change; no object is read or written. Keep the old master key in
+master_keys until the run reports nothing left to rewrap.
+
+reencrypt: moves content still encrypted with the global fernet_key onto its own data key.
+Shared objects are re-encrypted to <object>.dk and every snippet using them is switched in
+the same transaction; snippets from before content addressing, and inline snippets, are
+stored again through snippet_objects.store_content (so they are deduplicated or inlined like
+a new upload). Objects are processed by a thread pool, each worker with its own database
+connection and each object in its own transaction; old objects are deleted after the
+commit, a legacy snippets/<fileName> object only once no snippet points at it any more.
+Only rows that still need it are selected, so an interrupted run is resumed by running it
+again, and failed items are reported and retried next time.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared_layer", "python"))
+import backends
+import snippet_crypto
+import snippet_keys
+import snippet_objects
+
+from bench_common import load_config
+
+WRAPPED_PATTERN = snippet_keys.WRAPPED_PREFIX + "%"
+
+# Content still under the global key, by kind: (table, primary key, selection)
+LEGACY_CONTENT = {
+    "object": ("SnippetObjects", "contentHash", "encryptionKey IS NULL AND refCount > 0"),
+    "snippet": ("Snippets", "snippetId", "encryptionKey IS NULL AND clientEncrypted = 0 AND contentHash IS NULL"),
+    "inline": ("Snippets", "snippetId", "encryptionKey IS NULL AND clientEncrypted = 0 AND inlineContent IS NOT NULL"),
+}
+
+def connect(config):
+    return backends.connect_db(
+        config["rds"]["endpoint"],
+        config["rds"]["user_name"],
+        config["rds"]["user_pwd"],
+        config["rds"]["db_name"],
+        int(config["rds"]["port_number"])
+    )
+
+def rewrap(connection, batch_size):
+    """Rewraps every data key not wrapped with the current master key. Returns rows rewrapped per table."""
+    current = snippet_keys.current_key_id()
+    rewrapped = {}
+    for table, key_column in [("SnippetObjects", "contentHash"), ("Snippets", "snippetId")]:
+        last_key = ""
+        rewrapped[table] = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {key_column} AS rowKey, encryptionKey
+                    FROM {table}
+                    WHERE {key_column} > %s AND encryptionKey LIKE %s
+                    ORDER BY {key_column}
+                    LIMIT %s
+                """, (last_key, WRAPPED_PATTERN, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_key = rows[-1]["rowKey"]
+
+                # Compare-and-set, so a key replaced by a concurrent upload or update is left alone
+                changes = [
+                    (snippet_keys.rewrap(row["encryptionKey"]), row["rowKey"], row["encryptionKey"])
+                    for row in rows if snippet_keys.key_id_of(row["encryptionKey"]) != current
+                ]
+                if changes:
+                    cursor.executemany(
+                        f"UPDATE {table} SET encryptionKey = %s WHERE {key_column} = %s AND encryptionKey = %s",
+                        changes
+                    )
+            connection.commit()
+            rewrapped[table] += len(changes)
+            if len(rows) < batch_size:
+                break
+        print(f"{table}: rewrapped {rewrapped[table]} keys to master key {current!r}")
+    return rewrapped
+
+def count_remaining(connection):
+    """Returns how much content is still under the global key, and how many keys are not on the current master key."""
+    current_pattern = f"{snippet_keys.WRAPPED_PREFIX}{snippet_keys.current_key_id()}.%"
+    counts = {}
+    with connection.cursor() as cursor:
+        for kind, (table, _, selection) in LEGACY_CONTENT.items():
+            cursor.execute(f"SELECT COUNT(*) AS remaining FROM {table} WHERE {selection}")
+            counts[f"global key ({kind})"] = cursor.fetchone()["remaining"]
+        for table in ["SnippetObjects", "Snippets"]:
+            cursor.execute(
+                f"SELECT COUNT(*) AS remaining FROM {table} WHERE encryptionKey LIKE %s AND encryptionKey NOT LIKE %s",
+                (WRAPPED_PATTERN, current_pattern)
+            )
+            counts[f"old master key ({table})"] = cursor.fetchone()["remaining"]
+    connection.rollback()
+    return counts
+
+class Reencryptor:
+    """Re-encrypts one legacy item per call; safe to call from several threads."""
+
+    def __init__(self, config):
+        self.config = config
+        self.bucket = config["s3"]["bucket_name"]
+        self.folder = config["s3"]["snippets_folder"]
+        self.hash_key = config["encryption"]["fernet_key"]
+        self.s3 = backends.client("s3")
+        self._local = threading.local()
+
+    def _connection(self):
+        if not hasattr(self._local, "connection"):
+            self._local.connection = connect(self.config)
+        return self._local.connection
+
+    def run(self, kind, row_key):
+        """Returns the plaintext bytes re-encrypted (0 if the item no longer needed it)."""
+        connection = self._connection()
+        try:
+            if kind == "object":
+                return self._object(connection, row_key)
+            return self._snippet(connection, row_key)
+        except Exception:
+            connection.rollback()
+            raise
+
+    def _object(self, connection, digest):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT s3Path, encryptionKey, refCount FROM SnippetObjects WHERE contentHash = %s FOR UPDATE",
+                (digest,)
+            )
+            row = cursor.fetchone()
+            if not row or row["encryptionKey"] is not None or row["refCount"] <= 0:
+                connection.rollback()
+                return 0
+
+            old_key = snippet_objects.s3_key_of(row["s3Path"], self.bucket)
+            text = snippet_crypto.get_snippet(self.s3, self.bucket, old_key)
+            data_key, wrapped_key = snippet_keys.new_data_key()
+            new_key = f"{old_key}.dk"
+            new_path = f"s3://{self.bucket}/{new_key}"
+            size_bytes = snippet_crypto.put_snippet(self.s3, self.bucket, new_key, text, data_key)
+
+            cursor.execute(
+                "UPDATE SnippetObjects SET s3Path = %s, encryptionKey = %s, sizeBytes = %s WHERE contentHash = %s",
+                (new_path, wrapped_key, size_bytes, digest)
+            )
+            cursor.execute(
+                "UPDATE Snippets SET s3Path = %s, encryptionKey = %s WHERE contentHash = %s AND s3Path = %s",
+                (new_path, wrapped_key, digest, row["s3Path"])
+            )
+        connection.commit()
+        snippet_objects.delete_owned_objects(self.s3, self.bucket, [row["s3Path"]])
+        return len(text.encode())
+
+    def _snippet(self, connection, snippet_id):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT s3Path, inlineContent, encryptionKey, contentHash, clientEncrypted
+                FROM Snippets WHERE snippetId = %s FOR UPDATE
+            """, (snippet_id,))
+            row = cursor.fetchone()
+            if not row or row["encryptionKey"] is not None or row["clientEncrypted"]:
+                connection.rollback()
+                return 0
+
+            text = snippet_objects.load_content(self.s3, self.bucket, row)
+            digest = snippet_objects.content_hash(self.hash_key, text)
+            s3_path, inline_content, wrapped_key = snippet_objects.store_content(
+                cursor, self.s3, self.bucket, self.folder, digest, text
+            )
+            cursor.execute(
+                "UPDATE Snippets SET s3Path = %s, inlineContent = %s, encryptionKey = %s, contentHash = %s WHERE snippetId = %s",
+                (s3_path, inline_content, wrapped_key, digest, snippet_id)
+            )
+        connection.commit()
+        # Before content addressing the key was snippets/<fileName>, so two users' snippets can share
+        # one object; it is deleted by whichever of them is switched over last
+        if row["inlineContent"] is None and not self._referenced(connection, row["s3Path"]):
+            snippet_objects.delete_owned_objects(self.s3, self.bucket, [row["s3Path"]])
+        return len(text.encode())
+
+    def _referenced(self, connection, s3_path):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM Snippets WHERE s3Path = %s LIMIT 1", (s3_path,))
+            referenced = cursor.fetchone() is not None
+        connection.rollback()
+        return referenced
+
+def reencrypt(config, connection, workers, batch_size, limit):
+    reencryptor = Reencryptor(config)
+    done = failed = skipped = plaintext_bytes = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for kind, (table, key_column, selection) in LEGACY_CONTENT.items():
+            last_key = ""
+            while limit is None or done + failed < limit:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT {key_column} AS rowKey FROM {table}
+                        WHERE {key_column} > %s AND {selection}
+                        ORDER BY {key_column}
+                        LIMIT %s
+                    """, (last_key, batch_size if limit is None else min(batch_size, limit - done - failed)))
+                    row_keys = [row["rowKey"] for row in cursor.fetchall()]
+                connection.rollback()
+                if not row_keys:
+                    break
+                last_key = row_keys[-1]
+
+                futures = {pool.submit(reencryptor.run, kind, row_key): row_key for row_key in row_keys}
+                for future, row_key in futures.items():
+                    try:
+                        size = future.result()
+                    except Exception as e:
+                        print(f"FAILED {kind} {row_key}: {e}")
+                        failed += 1
+                        continue
+                    if size:
+                        done += 1
+                        plaintext_bytes += size
+                    else:
+                        skipped += 1
+
+                elapsed = time.perf_counter() - start
+                print(f"[{kind}] so far {done} re-encrypted, {failed} failed, {skipped} skipped | "
+                      f"{done / elapsed:.1f} items/s, {plaintext_bytes / elapsed / (1024 * 1024):.2f} MB/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nRe-encrypted {done} items ({plaintext_bytes} plaintext bytes) in {elapsed:.1f}s with {workers} workers; "
+          f"{failed} failed (run again to retry).")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rewrap", "reencrypt", "status"])
+    parser.add_argument("--config", default="migrate_config.ini")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--limit", type=int, help="stop after this many items (reencrypt)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    snippet_crypto.configure(config)
+    snippet_keys.configure(config)
+    snippet_objects.configure(config)
+
+    connection = connect(config)
+    failed = 0
+    try:
+        if args.command == "rewrap":
+            rewrap(connection, args.batch_size)
+        elif args.command == "reencrypt":
+            failed = reencrypt(config, connection, args.workers, args.batch_size, args.limit)
+        print()
+        for name, remaining in count_remaining(connection).items():
+            print(f"{name:<32}{remaining:>10}")
+    finally:
+        connection.close()
+    sys.exit(1 if failed else 0)
@@ -1,14 +1,25 @@
 import json
 import pymysql
-import boto3
+import db
+import backends
 from configparser import ConfigParser
-from cryptography.fernet import Fernet
-import requests
+import token_auth
+import snippet_crypto
+import snippet_keys
+import snippet_cache
+import snippet_objects
+import search_index
+import content_index
 
 # Load Config
-config_file = "download_config.ini"
+config_file = "search_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
+snippet_crypto.configure(config)
+snippet_keys.configure(config)
+snippet_cache.configure(config)
+content_index.configure(config)
 
 # Database Config
 DB_HOST = config["rds"]["endpoint"]
@@ -17,93 +28,66 @@ DB_PASSWORD = config["rds"]["user_pwd"]
 DB_NAME = config["rds"]["db_name"]
 DB_PORT = int(config["rds"]["port_number"])
 
-# S3 Config
+# S3 Config (content search decrypts candidate snippets to verify them)
 S3_BUCKET = config["s3"]["bucket_name"]
-S3_CLIENT = boto3.client("s3")
+S3_CLIENT = backends.client("s3")
 
-# Auth Config
-AUTH_API_URL = config["auth"]["api_url"]
-
-# Encryption
-FERNET_KEY = config["encryption"]["fernet_key"]
-cipher = Fernet(FERNET_KEY.encode())
+# "metadata" ranks by tags and file names; "substring" and "regex" search snippet content
+SEARCH_MODES = ["metadata", "substring", "regex"]
 
 def get_db_connection():
     """Establish a database connection."""
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-def decrypt_snippet(ciphertext):
-    """Decrypts a given snippet."""
-    return cipher.decrypt(ciphertext.encode()).decode()
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 def lambda_handler(event, context):
     connection = None
     try:
-        print("** Download Lambda Triggered **")
-
-        # Validate Token
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
+        print("** Search Lambda Triggered **")
 
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        connection = get_db_connection()
 
-        requester_id = json.loads(auth_response.text)["userId"]
+        # Validate Token
+        requester_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
         # Parse body
         body = json.loads(event["body"])
-        requested_filename = body.get("fileName")
-        if not requested_filename:
-            return {"statusCode": 400, "body": json.dumps({"error": "Missing fileName"})}
-
-        connection = get_db_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT snippetId, s3Path, ownerId, allowedUsers
-                FROM Snippets
-                WHERE fileName = %s AND (JSON_CONTAINS(allowedUsers, %s) OR ownerId = %s)
-            """, (requested_filename, json.dumps(requester_id), requester_id))
-
-            snippet = cursor.fetchone()
-            if not snippet:
-                return {"statusCode": 403, "body": json.dumps({"error": "Access denied or file not found."})}
-
-            # Fetch and decrypt snippet from S3
-            s3_key = snippet["s3Path"].replace(f"s3://{S3_BUCKET}/", "")
-            s3_response = S3_CLIENT.get_object(Bucket=S3_BUCKET, Key=s3_key)
-            encrypted_content = s3_response["Body"].read().decode()
-            decrypted_content = decrypt_snippet(encrypted_content)
-
-            # Fetch owner's username
-            cursor.execute("SELECT username FROM Users WHERE userId = %s", (snippet["ownerId"],))
-            owner_info = cursor.fetchone()
-            owner_username = owner_info["username"] if owner_info else "Unknown"
-
-            # Update download counts
-            cursor.execute("UPDATE Users SET totalDownloads = totalDownloads + 1 WHERE userId = %s", (requester_id,))
-            cursor.execute("UPDATE Snippets SET downloadCount = IFNULL(downloadCount, 0) + 1 WHERE snippetId = %s", (snippet["snippetId"],))            
-            connection.commit()
-
-        print(f"Snippet Content:\n{decrypted_content}")  # Print the decrypted file
+        query = (body.get("query") or "").strip()
+        if not query:
+            return {"statusCode": 400, "body": json.dumps({"error": "Missing query"})}
+
+        mode = body.get("mode", "metadata")
+        if mode not in SEARCH_MODES:
+            return {"statusCode": 400, "body": json.dumps({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"})}
+
+        try:
+            limit = int(body.get("limit", search_index.DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return {"statusCode": 400, "body": json.dumps({"error": "limit must be a number"})}
+        limit = min(max(limit, 1), search_index.MAX_LIMIT)
+
+        if mode == "metadata":
+            # Ranked over the snippets the requester owns or was granted
+            with connection.cursor() as cursor:
+                results = search_index.search(cursor, requester_id, query, limit)
+            print(f"** Search for {query!r}: {len(results)} results **")
+            return {"statusCode": 200, "body": json.dumps({"query": query, "mode": mode, "results": results})}
+
+        # Content search: the trigram index picks candidates among accessible snippets, which are then checked
+        try:
+            with connection.cursor() as cursor:
+                found = content_index.search(
+                    cursor, requester_id, body.get("query"),
+                    lambda snippet: snippet_objects.load_content(S3_CLIENT, S3_BUCKET, snippet),
+                    regex=(mode == "regex"), ignore_case=bool(body.get("ignoreCase")), limit=limit
+                )
+        except content_index.QueryError as e:
+            return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
 
         return {
             "statusCode": 200,
-            "body": json.dumps({
-                "message": "Snippet download successful.",
-                "snippetId": snippet["snippetId"],
-                "content": decrypted_content  # Return decrypted file content
-            })
+            "body": json.dumps({"query": query, "mode": mode, **found})
         }
 
     except pymysql.MySQLError as e:
@@ -113,5 +97,4 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
@@ -1,12 +1,16 @@
 import json
 import pymysql
+import db
 from configparser import ConfigParser
-import requests
+import token_auth
+import snippet_lookup
+import dashboard_versions
 
 # Load Config
 config_file = "set_permissions_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
 
 # Database Configuration
 DB_HOST = config["rds"]["endpoint"]
@@ -15,19 +19,62 @@ DB_PASSWORD = config["rds"]["user_pwd"]
 DB_NAME = config["rds"]["db_name"]
 DB_PORT = int(config["rds"]["port_number"])
 
-# API Gateway Authentication Endpoint
-AUTH_API_URL = config["auth"]["api_url"]
+# Granted users can download and update a snippet; only the owner can delete it
+DEFAULT_ROLE = "editor"
+
+# Upper bound on fileNames x targetUsernames in one bulk request
+MAX_BULK_ITEMS = 1000
 
 # Function to Connect to MySQL
 def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
+
+def bulk_names(value):
+    """Deduplicated list of names from a bulk field, or None unless it is a list of non-empty strings."""
+    if not isinstance(value, list) or not value or len(value) > MAX_BULK_ITEMS:
+        return None
+    if not all(isinstance(name, str) and name for name in value):
+        return None
+    return list(dict.fromkeys(value))
+
+def apply_bulk_permissions(connection, owner_id, file_names, target_usernames, permission_action):
+    """
+    Grants or revokes access for every (file, user) pair in a single transaction.
+    Files and usernames are each resolved with one query. Returns one result per pair.
+    """
+    results = []
+    with db.transaction(connection):
+        with connection.cursor() as cursor:
+            snippets = snippet_lookup.find_owned_snippets(cursor, owner_id, file_names)
+
+            cursor.execute("SELECT userId, username FROM Users WHERE username IN %s", (tuple(target_usernames),))
+            user_ids = {row["username"]: row["userId"] for row in cursor.fetchall()}
+
+            changes = []
+            for file_name in file_names:
+                for target_username in target_usernames:
+                    result = {"fileName": file_name, "targetUsername": target_username}
+                    if file_name not in snippets:
+                        result.update(statusCode=403, error="You do not own this snippet or it does not exist.")
+                    elif target_username not in user_ids:
+                        result.update(statusCode=404, error="Target user not found.")
+                    else:
+                        changes.append((snippets[file_name]["snippetId"], user_ids[target_username]))
+                        result.update(statusCode=200, message="granted" if permission_action == "grant" else "revoked")
+                    results.append(result)
+
+            if changes and permission_action == "grant":
+                cursor.executemany(
+                    "INSERT IGNORE INTO SnippetPermissions (snippetId, userId, role) VALUES (%s, %s, %s)",
+                    [(snippet_id, user_id, DEFAULT_ROLE) for snippet_id, user_id in changes]
+                )
+            elif changes:
+                cursor.executemany("DELETE FROM SnippetPermissions WHERE snippetId = %s AND userId = %s", changes)
+
+            if changes:
+                dashboard_versions.bump(cursor, [owner_id] + [user_id for _, user_id in changes])
+
+    return results
 
 # Lambda Handler for Setting Permissions
 def lambda_handler(event, context):
@@ -35,28 +82,14 @@ def lambda_handler(event, context):
     try:
         print("** Set Permissions Lambda Triggered **")
 
-        # Validate Token from Authorization header
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            print("** ERROR: Missing Authorization header **")
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if auth_header.startswith("Bearer ") else auth_header
-
-        print(f"** Token received for validation: {token[:6]}... (masked) **")  # Masking for security
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        auth_data = auth_response.json()
+        connection = get_db_connection()
 
-        if auth_response.status_code != 200:
-            response_body = {"error": "Invalid or expired token"}
-            if auth_data.get("loggedOut"):
-                response_body["loggedOut"] = True
-                response_body["error"] = "Session expired. Please log in again."
-            print(f"** ERROR: Authentication failed - {response_body} **")
-            return {"statusCode": 401, "body": json.dumps(response_body)}
+        # Validate Token from Authorization header
+        owner_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            print(f"** ERROR: Authentication failed - {auth_error['body']} **")
+            return auth_error
 
-        owner_id = auth_data["userId"]
         print(f"** Authenticated User ID: {owner_id} **")
 
         if "body" not in event:
@@ -70,6 +103,24 @@ def lambda_handler(event, context):
             print("** ERROR: Invalid JSON body **")
             return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON format"})}
 
+        # Bulk form: many files x many usernames, applied together
+        if "fileNames" in body or "targetUsernames" in body:
+            file_names = bulk_names(body.get("fileNames"))
+            target_usernames = bulk_names(body.get("targetUsernames"))
+            permission_action = body.get("permissionAction")
+
+            if not file_names or not target_usernames or permission_action not in ["grant", "revoke"]:
+                print("** ERROR: Missing or invalid bulk permission fields **")
+                return {"statusCode": 400, "body": json.dumps({"error": "fileNames and targetUsernames must be non-empty lists of names, with a valid permissionAction."})}
+
+            if len(file_names) * len(target_usernames) > MAX_BULK_ITEMS:
+                return {"statusCode": 400, "body": json.dumps({"error": f"Too many changes in one request (max {MAX_BULK_ITEMS})."})}
+
+            results = apply_bulk_permissions(connection, owner_id, file_names, target_usernames, permission_action)
+            applied = sum(1 for result in results if result["statusCode"] == 200)
+            print(f"** Bulk {permission_action}: {applied} of {len(results)} changes applied **")
+            return {"statusCode": 200, "body": json.dumps({"message": f"{applied} of {len(results)} permission changes applied.", "results": results})}
+
         file_name = body.get("fileName")  # User provides fileName instead of snippetId
         target_username = body.get("targetUsername")
         permission_action = body.get("permissionAction")  # "grant" or "revoke"
@@ -78,20 +129,15 @@ def lambda_handler(event, context):
             print(f"** ERROR: Missing required fields: fileName={file_name}, targetUsername={target_username}, permissionAction={permission_action} **")
             return {"statusCode": 400, "body": json.dumps({"error": "Missing or invalid required fields."})}
 
-        connection = get_db_connection()
-
         with connection.cursor() as cursor:
             # Retrieve the snippetId based on filename & ownerId
-            cursor.execute("SELECT snippetId, allowedUsers FROM Snippets WHERE s3Path LIKE %s AND ownerId = %s", 
-                           (f"%/{file_name}", owner_id))
-            snippet = cursor.fetchone()
+            snippet = snippet_lookup.find_owned_snippet(cursor, owner_id, file_name)
 
             if not snippet:
                 print(f"** ERROR: User {owner_id} does not own snippet {file_name} or it does not exist **")
                 return {"statusCode": 403, "body": json.dumps({"error": "Access denied: You do not own this snippet or it does not exist."})}
 
             snippet_id = snippet["snippetId"]
-            allowed_users = json.loads(snippet["allowedUsers"] or "[]")
 
             # Check if the target user exists
             cursor.execute("SELECT userId FROM Users WHERE username = %s", (target_username,))
@@ -104,25 +150,23 @@ def lambda_handler(event, context):
             target_user_id = target_user["userId"]
 
             if permission_action == "grant":
-                if target_user_id not in allowed_users:
-                    allowed_users.append(target_user_id)
-                    cursor.execute(
-                        "UPDATE Snippets SET allowedUsers = %s WHERE snippetId = %s",
-                        (json.dumps(allowed_users), snippet_id)
-                    )
-                    connection.commit()
-                    print(f"** Access granted: {target_username} can now access {file_name} **")
+                cursor.execute(
+                    "INSERT IGNORE INTO SnippetPermissions (snippetId, userId, role) VALUES (%s, %s, %s)",
+                    (snippet_id, target_user_id, DEFAULT_ROLE)
+                )
+                dashboard_versions.bump(cursor, [owner_id, target_user_id])
+                connection.commit()
+                print(f"** Access granted: {target_username} can now access {file_name} **")
                 return {"statusCode": 200, "body": json.dumps({"message": f"User '{target_username}' has been granted access to '{file_name}'."})}
 
             elif permission_action == "revoke":
-                if target_user_id in allowed_users:
-                    allowed_users.remove(target_user_id)
-                    cursor.execute(
-                        "UPDATE Snippets SET allowedUsers = %s WHERE snippetId = %s",
-                        (json.dumps(allowed_users), snippet_id)
-                    )
-                    connection.commit()
-                    print(f"** Access revoked: {target_username} can no longer access {file_name} **")
+                cursor.execute(
+                    "DELETE FROM SnippetPermissions WHERE snippetId = %s AND userId = %s",
+                    (snippet_id, target_user_id)
+                )
+                dashboard_versions.bump(cursor, [owner_id, target_user_id])
+                connection.commit()
+                print(f"** Access revoked: {target_username} can no longer access {file_name} **")
                 return {"statusCode": 200, "body": json.dumps({"message": f"User '{target_username}' has been revoked access to '{file_name}'."})}
 
     except pymysql.MySQLError as e:
@@ -135,5 +179,4 @@ def lambda_handler(event, context):
 
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
@@ -0,0 +1,51 @@
+import os
+
+# Selects the services the handlers talk to. The default ("aws") is RDS MySQL
+# through pymysql and boto3 clients. With SNIPPET_HUB_BACKEND=local every
+# handler runs on one machine with no network: SQLite instead of MySQL
+# (local_db), a directory instead of S3, an in-process Lambda dispatcher and a
+# deterministic Comprehend stand-in (local_aws). Local state lives under
+# SNIPPET_HUB_LOCAL_DIR. scripts/local_run.py drives the handlers this way.
+
+DEFAULT_LOCAL_DIR = ".snippet_hub_local"
+
+def is_local():
+    return os.environ.get("SNIPPET_HUB_BACKEND", "aws").lower() == "local"
+
+def local_dir():
+    return os.environ.get("SNIPPET_HUB_LOCAL_DIR", DEFAULT_LOCAL_DIR)
+
+def connect_db(host, user, password, database, port):
+    """Opens a DictCursor-style connection to the configured database."""
+    if is_local():
+        import local_db
+        return local_db.connect(os.path.join(local_dir(), f"{database}.sqlite3"))
+
+    import pymysql
+    return pymysql.connect(
+        host=host,
+        user=user,
+        password=password,
+        database=database,
+        port=port,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+def client(service, **kwargs):
+    """Returns a boto3 client, or its local stand-in ("s3", "lambda", "comprehend")."""
+    if is_local():
+        import local_aws
+        return local_aws.client(service, local_dir())
+
+    import boto3
+    return boto3.client(service, **kwargs)
+
+def register_function(name, handler):
+    """Makes handler(event, context) invocable by name through the local Lambda client."""
+    import local_aws
+    local_aws.FUNCTIONS[name] = handler
+
+def run_pending_invocations():
+    """Runs queued InvocationType="Event" invocations (local backend only). Returns how many ran."""
+    import local_aws
+    return local_aws.run_pending_invocations()
@@ -0,0 +1,366 @@
+import hashlib
+import re
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+import snippet_cache
+import snippet_lookup
+
+# Trigram index over snippet content (sql/014_content_index.sql), for substring
+# and regex search in search_lambda. upload_snippet_lambda and update_lambda
+# call index_content with the plaintext they already hold, in the transaction
+# that writes the snippet; delete_lambda calls remove_content. Client-side
+# encrypted snippets are never seen in clear and are not indexed.
+#
+#   SnippetTextIndex  one row per indexed snippet: a small integer docId, the
+#                     snippet's trigram list (packed) so updates and deletes can
+#                     touch only the postings that change, and whether the snippet
+#                     was longer than max_indexed_bytes (partial)
+#   SnippetTrigrams   one row per (trigram, docId)
+#
+# Trigrams are taken from the lowercased text and stored as 32-bit keyed hashes
+# (BLAKE2b, key derived from fernet_key), so the index neither holds snippet
+# text nor lets it be rebuilt from guessable trigrams. Collisions only add
+# candidates. A query is reduced to trigrams every match must contain (AND
+# within a literal, OR across regex alternatives); the index narrows the
+# caller's accessible snippets to candidates, newest first, and each candidate
+# is decrypted (through snippet_cache) and checked line by line. Partially
+# indexed snippets could match past the indexed prefix, so every accessible one
+# is a candidate for every query.
+NGRAM = 3
+DEFAULT_MAX_INDEXED_BYTES = 256 * 1024
+TRIGRAM_KEY_INFO = b"snippet-hub trigram index v1"
+MAX_QUERY_LENGTH = 256
+MAX_LEAF_TRIGRAMS = 16
+MAX_EXACT_STRINGS = 16
+MAX_CANDIDATES = 1000
+VERIFY_BATCH = 25
+LOAD_WORKERS = 8
+MAX_LINES_PER_RESULT = 5
+MAX_LINE_LENGTH = 200
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+DELETE_CHUNK = 1000
+
+_settings = {"key": None, "max_indexed_bytes": DEFAULT_MAX_INDEXED_BYTES}
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)}
+
+_DOCUMENT_COLUMNS = ", ".join(f"s.{column}" for column in snippet_lookup.SNIPPET_COLUMNS)
+
+# Snippets the user owns, then those shared with them, whose content has every trigram in %(trigrams)s
+ACCESSIBLE_CANDIDATES_SQL = """
+    SELECT s.snippetId, s.lastUpdated
+    FROM Snippets s
+    JOIN SnippetTextIndex d ON d.snippetId = s.snippetId
+    JOIN SnippetTrigrams t ON t.docId = d.docId
+    WHERE s.ownerId = %(user)s AND t.trigram IN %(trigrams)s
+    GROUP BY s.snippetId, s.lastUpdated
+    HAVING COUNT(*) = %(count)s
+    UNION
+    SELECT s.snippetId, s.lastUpdated
+    FROM SnippetPermissions g
+    JOIN Snippets s ON s.snippetId = g.snippetId
+    JOIN SnippetTextIndex d ON d.snippetId = g.snippetId
+    JOIN SnippetTrigrams t ON t.docId = d.docId
+    WHERE g.userId = %(user)s AND t.trigram IN %(trigrams)s
+    GROUP BY s.snippetId, s.lastUpdated
+    HAVING COUNT(*) = %(count)s
+"""
+
+# Partially indexed snippets the user owns or was granted; few, as only very large snippets are partial
+ACCESSIBLE_PARTIAL_SQL = """
+    SELECT s.snippetId, s.lastUpdated
+    FROM SnippetTextIndex d
+    JOIN Snippets s ON s.snippetId = d.snippetId
+    WHERE d.partial = 1 AND s.ownerId = %(user)s
+    UNION
+    SELECT s.snippetId, s.lastUpdated
+    FROM SnippetTextIndex d
+    JOIN SnippetPermissions g ON g.snippetId = d.snippetId
+    JOIN Snippets s ON s.snippetId = d.snippetId
+    WHERE d.partial = 1 AND g.userId = %(user)s
+"""
+
+CANDIDATE_SNIPPETS_SQL = f"""
+    SELECT {_DOCUMENT_COLUMNS}, s.lastUpdated, u.username AS ownerUsername
+    FROM Snippets s
+    JOIN Users u ON u.userId = s.ownerId
+    WHERE s.snippetId IN %s
+"""
+
+class QueryError(ValueError):
+    """The query is invalid or too unspecific to be answered from the index."""
+
+def configure(config):
+    """Derives the trigram hash key from fernet_key and reads the optional [search] max_indexed_bytes."""
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=TRIGRAM_KEY_INFO)
+    _settings["key"] = hkdf.derive(config["encryption"]["fernet_key"].encode())
+    _settings["max_indexed_bytes"] = config.getint("search", "max_indexed_bytes", fallback=DEFAULT_MAX_INDEXED_BYTES)
+
+def _hash(trigram):
+    digest = hashlib.blake2b(trigram.encode(), digest_size=4, key=_settings["key"]).digest()
+    return int.from_bytes(digest, "big")
+
+def _trigrams(text):
+    """Distinct lowercase trigrams of text in order of appearance, without all-whitespace ones (in every file)."""
+    text = text.lower()
+    seen = dict.fromkeys(text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1))
+    return [trigram for trigram in seen if not trigram.isspace()]
+
+def _indexed_text(text):
+    """(indexed prefix, partial): at most max_indexed_bytes of text's UTF-8, cut on a character boundary."""
+    data = text.encode()
+    if len(data) <= _settings["max_indexed_bytes"]:
+        return text, False
+    # A character split by the cut is dropped rather than decoded as garbage
+    return data[:_settings["max_indexed_bytes"]].decode(errors="ignore"), True
+
+def content_trigrams(text):
+    """The sorted trigram hashes indexed for a snippet's content."""
+    return sorted({_hash(trigram) for trigram in _trigrams(_indexed_text(text)[0])})
+
+def _pack(trigrams):
+    return zlib.compress(struct.pack(f"<{len(trigrams)}I", *trigrams))
+
+def _unpack(packed):
+    raw = zlib.decompress(packed) if packed else b""
+    return list(struct.unpack(f"<{len(raw) // 4}I", raw))
+
+def _delete_postings(cursor, doc_id, trigrams):
+    for start in range(0, len(trigrams), DELETE_CHUNK):
+        cursor.execute("DELETE FROM SnippetTrigrams WHERE docId = %s AND trigram IN %s",
+                       (doc_id, tuple(trigrams[start:start + DELETE_CHUNK])))
+
+def index_content(cursor, snippet_id, text):
+    """(Re)indexes a snippet's plaintext, writing only the postings that changed; commit with the caller's transaction."""
+    indexed, partial = _indexed_text(text)
+    new_trigrams = content_trigrams(indexed)
+    cursor.execute("SELECT docId, trigrams FROM SnippetTextIndex WHERE snippetId = %s FOR UPDATE", (snippet_id,))
+    row = cursor.fetchone()
+    if row:
+        doc_id = row["docId"]
+        old_trigrams = set(_unpack(row["trigrams"]))
+    else:
+        cursor.execute("INSERT INTO SnippetTextIndex (snippetId, trigrams) VALUES (%s, %s)", (snippet_id, _pack([])))
+        doc_id = cursor.lastrowid
+        old_trigrams = set()
+
+    removed = sorted(old_trigrams.difference(new_trigrams))
+    added = sorted(set(new_trigrams) - old_trigrams)
+    _delete_postings(cursor, doc_id, removed)
+    if added:
+        cursor.executemany("INSERT INTO SnippetTrigrams (trigram, docId) VALUES (%s, %s)", [(trigram, doc_id) for trigram in added])
+    cursor.execute("UPDATE SnippetTextIndex SET trigrams = %s, partial = %s WHERE docId = %s",
+                   (_pack(new_trigrams), int(partial), doc_id))
+    print(f"** Content index for {snippet_id}: {len(new_trigrams)} trigrams, {len(added)} added, {len(removed)} removed"
+          f"{' (partial)' if partial else ''} **")
+
+def remove_content(cursor, snippet_id):
+    """Drops a snippet from the content index; commit with the caller's transaction."""
+    cursor.execute("SELECT docId, trigrams FROM SnippetTextIndex WHERE snippetId = %s FOR UPDATE", (snippet_id,))
+    row = cursor.fetchone()
+    if not row:
+        return
+    _delete_postings(cursor, row["docId"], _unpack(row["trigrams"]))
+    cursor.execute("DELETE FROM SnippetTextIndex WHERE docId = %s", (row["docId"],))
+
+# A requirement is None (anything matches), ("all", trigram hashes) or ("and" | "or", [requirements])
+
+def _all_of(parts):
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ("and", parts)
+
+def _any_of(parts):
+    if not parts or any(part is None for part in parts):
+        return None
+    return parts[0] if len(parts) == 1 else ("or", parts)
+
+def _literal(text):
+    trigrams = _trigrams(text)
+    if not trigrams:
+        return None
+    if len(trigrams) > MAX_LEAF_TRIGRAMS:
+        # Any subset is still implied by the literal; spread it out over the whole string
+        step = len(trigrams) / MAX_LEAF_TRIGRAMS
+        trigrams = [trigrams[int(i * step)] for i in range(MAX_LEAF_TRIGRAMS)]
+    return ("all", tuple(sorted({_hash(trigram) for trigram in trigrams})))
+
+def _exact_strings(op, arg):
+    """The strings a single regex node matches, when that is a small known set, else None."""
+    if op is sre_constants.LITERAL:
+        return {chr(arg)}
+    if op is sre_constants.IN:
+        if any(item_op is not sre_constants.LITERAL for item_op, _ in arg) or len(arg) > MAX_EXACT_STRINGS:
+            return None
+        return {chr(code) for _, code in arg}
+    if op is sre_constants.SUBPATTERN:
+        return _analyze(arg[-1])[0]
+    if op is sre_constants.BRANCH:
+        strings = set()
+        for branch in arg[1]:
+            exact = _analyze(branch)[0]
+            if exact is None:
+                return None
+            strings |= exact
+        return strings if len(strings) <= MAX_EXACT_STRINGS else None
+    return None
+
+def _analyze(items):
+    """
+    Returns (exact, requirement) for a parsed regex sequence. exact is the small set of strings the
+    sequence matches (None if unknown), built by concatenating neighbouring literals, character
+    classes and alternations, so trigrams that cross a group boundary are kept. Where a set grows
+    too large, or a node is not exact, the set so far becomes an OR of its strings' trigrams.
+    """
+    parts = []
+    current = {""}
+    fully_exact = True
+
+    def flush():
+        if current != {""}:
+            parts.append(_any_of([_literal(string) for string in current]))
+
+    for op, arg in items:
+        exact = _exact_strings(op, arg)
+        if exact is not None and len(current) * len(exact) <= MAX_EXACT_STRINGS:
+            current = {prefix + string for prefix in current for string in exact}
+            continue
+        flush()
+        if exact is not None:
+            current = exact
+            continue
+        fully_exact = False
+        current = {""}
+        if op is sre_constants.SUBPATTERN:
+            parts.append(_analyze(arg[-1])[1])
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            parts.append(_analyze(arg)[1])
+        elif op is sre_constants.BRANCH:
+            parts.append(_any_of([_analyze(branch)[1] for branch in arg[1]]))
+        elif op in _REPEATS and arg[0] >= 1:
+            parts.append(_analyze(arg[2])[1])
+    exact = current if fully_exact and not parts else None
+    flush()
+    return exact, _all_of(parts)
+
+def parse_query(query, regex=False, ignore_case=False):
+    """Returns (compiled matcher, requirement), or raises QueryError."""
+    if not query or len(query) > MAX_QUERY_LENGTH:
+        raise QueryError(f"Query must be 1 to {MAX_QUERY_LENGTH} characters.")
+    pattern = query if regex else re.escape(query)
+    try:
+        matcher = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    except re.error as e:
+        raise QueryError(f"Invalid regular expression: {e}")
+    requirement = _analyze(sre_parse.parse(pattern))[1] if regex else _literal(query)
+    if requirement is None:
+        raise QueryError(f"Query needs at least {NGRAM} consecutive literal characters (outside of optional parts).")
+    return matcher, requirement
+
+def _candidates(cursor, user_id, requirement):
+    """{snippetId: lastUpdated} of the user's accessible snippets that satisfy the requirement."""
+    kind, value = requirement
+    if kind == "all":
+        cursor.execute(ACCESSIBLE_CANDIDATES_SQL, {"user": user_id, "trigrams": value, "count": len(value)})
+        return {row["snippetId"]: row["lastUpdated"] for row in cursor.fetchall()}
+    if kind == "and":
+        found = None
+        for part in value:
+            matches = _candidates(cursor, user_id, part)
+            found = matches if found is None else {key: found[key] for key in found.keys() & matches.keys()}
+            if not found:
+                return {}
+        return found
+    found = {}
+    for part in value:
+        found.update(_candidates(cursor, user_id, part))
+    return found
+
+def _load_texts(rows, load):
+    """{snippetId: plaintext} for rows, from this container's cache or (in parallel) from storage."""
+    texts = {}
+    missing = []
+    for row in rows:
+        text = snippet_cache.get(row["snippetId"], row["version"])
+        if text is None:
+            missing.append(row)
+        else:
+            texts[row["snippetId"]] = text
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(missing))) as pool:
+            for row, text in zip(missing, pool.map(load, missing)):
+                snippet_cache.put(row["snippetId"], row["version"], text)
+                texts[row["snippetId"]] = text
+    return texts
+
+def _matching_lines(matcher, text):
+    lines = []
+    count = 0
+    for number, line in enumerate(text.splitlines(), start=1):
+        if matcher.search(line):
+            count += 1
+            if len(lines) < MAX_LINES_PER_RESULT:
+                lines.append({"line": number, "text": line[:MAX_LINE_LENGTH]})
+    return count, lines
+
+def search(cursor, user_id, query, load, regex=False, ignore_case=False, limit=DEFAULT_LIMIT):
+    """
+    Returns the user's accessible snippets whose content matches query (a substring, or a regex
+    with regex=True), newest first, with the matching lines. load(snippet row) returns the
+    plaintext of a snippet missing from snippet_cache; it is called from worker threads.
+    """
+    matcher, requirement = parse_query(query, regex, ignore_case)
+    candidates = _candidates(cursor, user_id, requirement)
+    # The index only vouches for the start of a partial snippet, so check the rest of it too
+    cursor.execute(ACCESSIBLE_PARTIAL_SQL, {"user": user_id})
+    candidates.update({row["snippetId"]: row["lastUpdated"] for row in cursor.fetchall()})
+    ordered = sorted(candidates, key=lambda snippet_id: (candidates[snippet_id], snippet_id), reverse=True)
+
+    results = []
+    verified = 0
+    for start in range(0, min(len(ordered), MAX_CANDIDATES), VERIFY_BATCH):
+        batch = ordered[start:min(start + VERIFY_BATCH, MAX_CANDIDATES)]
+        cursor.execute(CANDIDATE_SNIPPETS_SQL, (tuple(batch),))
+        rows = {row["snippetId"]: row for row in cursor.fetchall() if not row["clientEncrypted"]}
+        texts = _load_texts([rows[snippet_id] for snippet_id in batch if snippet_id in rows], load)
+        for snippet_id in batch:
+            verified += 1
+            if snippet_id not in texts:
+                continue
+            count, lines = _matching_lines(matcher, texts[snippet_id])
+            if not count:
+                continue
+            row = rows[snippet_id]
+            results.append({
+                "snippetId": snippet_id,
+                "fileName": row["fileName"],
+                "owner": row["ownerUsername"],
+                "lastModified": row["lastUpdated"].strftime('%Y-%m-%d %H:%M:%S') if row["lastUpdated"] else None,
+                "matchCount": count,
+                "lines": lines,
+            })
+            if len(results) >= limit:
+                break
+        if len(results) >= limit:
+            break
+
+    print(f"** Content search: {len(candidates)} candidates, {verified} verified, {len(results)} matched **")
+    return {
+        "results": results,
+        "candidates": len(candidates),
+        "verified": verified,
+        "truncated": verified < len(candidates),
+    }
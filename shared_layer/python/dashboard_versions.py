@@ -0,0 +1,22 @@
+# Per-user dashboard versions (DashboardVersions). Any handler that changes
+# what a user's dashboard shows bumps that user's version in the same
+# transaction; dashboard_lambda derives its ETag from the version.
+
+def bump(cursor, user_ids):
+    """Marks the dashboards of user_ids as changed; commit with the caller's transaction."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    cursor.executemany("""
+        INSERT INTO DashboardVersions (userId, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, [(user_id,) for user_id in user_ids])
+
+def bump_for_snippet(cursor, snippet_id):
+    """Marks the dashboards of the snippet's owner and everyone it is shared with as changed."""
+    cursor.execute("""
+        SELECT ownerId AS userId FROM Snippets WHERE snippetId = %s
+        UNION
+        SELECT userId FROM SnippetPermissions WHERE snippetId = %s
+    """, (snippet_id, snippet_id))
+    bump(cursor, [row["userId"] for row in cursor.fetchall()])
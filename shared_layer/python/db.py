@@ -0,0 +1,69 @@
+import backends
+from contextlib import contextmanager
+
+# Shared data-access layer. Each warm container keeps one MySQL connection at
+# module level and reuses it across invocations instead of reconnecting (TLS
+# and auth handshake included) every time. The connection is pinged before
+# reuse and replaced if the server has dropped it.
+
+_connection = None
+_stats = {"connects": 0, "reuses": 0, "reconnects": 0}
+
+def _connect(host, user, password, database, port):
+    return backends.connect_db(host, user, password, database, port)
+
+def _discard():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except Exception:
+            pass
+    _connection = None
+
+def get_connection(host, user, password, database, port):
+    """Returns this container's connection, reconnecting if it is missing or stale."""
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.ping(reconnect=False)
+            _stats["reuses"] += 1
+            return _connection
+        except Exception as e:
+            print(f"** Stale database connection, reconnecting: {str(e)} **")
+            _discard()
+            _stats["reconnects"] += 1
+
+    _connection = _connect(host, user, password, database, port)
+    _stats["connects"] += 1
+    return _connection
+
+def release(connection):
+    """
+    Ends the invocation's use of the connection without closing it.
+    Uncommitted work is rolled back so the next invocation starts with a clean
+    transaction (and a fresh snapshot); a connection that fails here is dropped.
+    """
+    if connection is None:
+        return
+    try:
+        connection.rollback()
+    except Exception as e:
+        print(f"** Dropping broken database connection: {str(e)} **")
+        if connection is _connection:
+            _discard()
+    print(f"** DB connections: {_stats['connects']} opened, {_stats['reuses']} reused, {_stats['reconnects']} reconnected **")
+
+@contextmanager
+def transaction(connection):
+    """Commits the block's statements together, or rolls them all back on error."""
+    try:
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+def get_stats():
+    """Returns how many connects this container made and how many it avoided."""
+    return dict(_stats)
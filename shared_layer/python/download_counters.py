@@ -0,0 +1,54 @@
+from collections import Counter
+import db
+
+# Write-behind download counters. Downloads append a row to DownloadEvents
+# (no shared row locks), and a scheduled job folds pending events into
+# Snippets.downloadCount / Users.totalDownloads. Readers that need fresh
+# numbers add the still-pending events to the stored counters.
+
+def record_download(cursor, snippet_id, user_id):
+    """Appends a download event; commit with the caller's transaction."""
+    cursor.execute("INSERT INTO DownloadEvents (snippetId, userId) VALUES (%s, %s)", (snippet_id, user_id))
+
+def get_user_download_total(cursor, user_id):
+    """Returns how many downloads the user has made, including events not yet flushed."""
+    cursor.execute("""
+        SELECT IFNULL(totalDownloads, 0)
+             + (SELECT COUNT(*) FROM DownloadEvents WHERE userId = %s) AS downloads
+        FROM Users
+        WHERE userId = %s
+    """, (user_id, user_id))
+    row = cursor.fetchone()
+    return int(row["downloads"]) if row else 0
+
+def flush_download_events(connection, batch_size):
+    """
+    Folds up to batch_size of the oldest download events into the counters and
+    deletes them, all in one transaction. The events are read with FOR UPDATE so
+    two overlapping flushes can never count the same event twice.
+    Returns the number of events flushed.
+    """
+    with db.transaction(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT eventId, snippetId, userId FROM DownloadEvents ORDER BY eventId LIMIT %s FOR UPDATE",
+                (batch_size,)
+            )
+            events = cursor.fetchall()
+            if not events:
+                return 0
+
+            snippet_counts = Counter(event["snippetId"] for event in events)
+            user_counts = Counter(event["userId"] for event in events)
+
+            cursor.executemany(
+                "UPDATE Snippets SET downloadCount = IFNULL(downloadCount, 0) + %s WHERE snippetId = %s",
+                [(count, snippet_id) for snippet_id, count in sorted(snippet_counts.items())]
+            )
+            cursor.executemany(
+                "UPDATE Users SET totalDownloads = IFNULL(totalDownloads, 0) + %s WHERE userId = %s",
+                [(count, user_id) for user_id, count in sorted(user_counts.items())]
+            )
+            cursor.execute("DELETE FROM DownloadEvents WHERE eventId IN %s",
+                           (tuple(event["eventId"] for event in events),))
+    return len(events)
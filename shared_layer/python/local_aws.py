@@ -0,0 +1,162 @@
+import collections
+import io
+import json
+import os
+import re
+import shutil
+import time
+
+from botocore.exceptions import ClientError
+
+# Local stand-ins for the boto3 clients the handlers use, selected by
+# backends.client() when SNIPPET_HUB_BACKEND=local. Each implements only the
+# calls this project makes, with the same argument names and response shapes.
+
+# Lambda functions invocable by name (see backends.register_function) and the
+# InvocationType="Event" calls waiting to run
+FUNCTIONS = {}
+_pending_invocations = collections.deque()
+
+# Optional delay added to every S3 call, to approximate real request latency in benchmarks
+S3_LATENCY_ENV = "SNIPPET_HUB_LOCAL_S3_LATENCY_MS"
+
+def client(service, root):
+    if service == "s3":
+        return LocalS3(os.path.join(root, "s3"), float(os.environ.get(S3_LATENCY_ENV, "0")) / 1000)
+    if service == "lambda":
+        return LocalLambda()
+    if service == "comprehend":
+        return LocalComprehend()
+    raise ValueError(f"No local backend for AWS service: {service}")
+
+def _error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+class LocalS3:
+    """Stores objects as files under root/<bucket>/<key>, optionally sleeping latency seconds per request."""
+
+    def __init__(self, root, latency=0.0):
+        self.root = root
+        self.latency = latency
+
+    def _request(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket, key):
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise _error("InvalidKey", f"Key escapes the bucket: {key}", "PutObject")
+        return path
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._request()
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(Body.encode() if isinstance(Body, str) else bytes(Body))
+        return {"ETag": f'"{os.path.getmtime(path)}"'}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self._request()
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(Fileobj, f)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._request()
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _error("NoSuchKey", f"The specified key does not exist: {Key}", "GetObject")
+        with open(path, "rb") as f:
+            data = f.read()
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._request()
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _error("404", "Not Found", "HeadObject")
+        return {"ContentLength": os.path.getsize(path)}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self._request()
+        source = self._path(CopySource["Bucket"], CopySource["Key"])
+        if not os.path.exists(source):
+            raise _error("NoSuchKey", f"The specified key does not exist: {CopySource['Key']}", "CopyObject")
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source, path)
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._request()
+        path = self._path(Bucket, Key)
+        if os.path.exists(path):
+            os.remove(path)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **kwargs):
+        return "file://" + self._path(Params["Bucket"], Params["Key"])
+
+    def generate_presigned_post(self, Bucket, Key, Conditions=None, ExpiresIn=3600, **kwargs):
+        return {"url": "file://" + os.path.abspath(os.path.join(self.root, Bucket)), "fields": {"key": Key}}
+
+class LocalLambda:
+    """Invokes registered handlers in-process. Event invocations run when the caller drains the queue."""
+
+    def invoke(self, FunctionName, Payload=b"{}", InvocationType="RequestResponse", **kwargs):
+        if FunctionName not in FUNCTIONS:
+            raise _error("ResourceNotFoundException", f"Function not found: {FunctionName}", "Invoke")
+        event = json.loads(Payload)
+        if InvocationType == "Event":
+            _pending_invocations.append((FunctionName, event))
+            return {"StatusCode": 202, "Payload": io.BytesIO(b"")}
+        result = FUNCTIONS[FunctionName](event, None)
+        return {"StatusCode": 200, "Payload": io.BytesIO(json.dumps(result).encode())}
+
+def run_pending_invocations():
+    ran = 0
+    while _pending_invocations:
+        name, event = _pending_invocations.popleft()
+        FUNCTIONS[name](event, None)
+        ran += 1
+    return ran
+
+# Words that say nothing about what a snippet does
+_STOP_WORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "return", "import", "def", "class", "self",
+    "function", "const", "let", "var", "int", "str", "none", "null", "true", "false", "if", "else",
+    "elif", "while", "in", "is", "not", "or", "of", "to", "a", "an", "public", "private", "static",
+    "void", "new", "print", "range", "len",
+}
+
+class LocalComprehend:
+    """Deterministic approximation of detect_key_phrases / detect_entities for code."""
+
+    def detect_key_phrases(self, Text, LanguageCode="en", **kwargs):
+        first_seen = {}
+        counts = collections.Counter()
+        for match in re.finditer(r"[A-Za-z][A-Za-z0-9_]{2,}", Text):
+            word = match.group(0)
+            if word.lower() in _STOP_WORDS:
+                continue
+            counts[word] += 1
+            first_seen.setdefault(word, match.start())
+        top = sorted(counts, key=lambda word: (-counts[word], first_seen[word]))[:10]
+        return {"KeyPhrases": [
+            {"Text": word, "Score": 1.0, "BeginOffset": first_seen[word], "EndOffset": first_seen[word] + len(word)}
+            for word in top
+        ]}
+
+    def detect_entities(self, Text, LanguageCode="en", **kwargs):
+        entities = []
+        seen = set()
+        for match in re.finditer(r"\b(?:def|class|function|import|from|struct|interface)\s+([A-Za-z_][\w.]*)", Text):
+            name = match.group(1)
+            if name not in seen:
+                seen.add(name)
+                entities.append({"Text": name, "Type": "OTHER", "Score": 1.0,
+                                 "BeginOffset": match.start(1), "EndOffset": match.end(1)})
+        return {"Entities": entities}
@@ -0,0 +1,315 @@
+import datetime
+import functools
+import os
+import re
+import sqlite3
+
+import pymysql
+
+# SQLite stand-in for RDS MySQL, used when SNIPPET_HUB_BACKEND=local (see
+# backends.py). connect() returns an object that behaves like a pymysql
+# connection with DictCursor for the statements this project issues: MySQL
+# syntax is rewritten to SQLite (placeholders, IN %s, INSERT IGNORE, ON
+# DUPLICATE KEY UPDATE, FOR UPDATE, NOW/UTC_TIMESTAMP, GREATEST/LEAST,
+# JSON_ARRAYAGG), DATETIME columns come back as datetime objects, and SQLite
+# errors are raised as the pymysql exceptions the handlers catch.
+#
+# The schema is created on first connect and mirrors the RDS tables plus
+# everything added under sql/.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Users (
+    userId         TEXT PRIMARY KEY,
+    username       TEXT NOT NULL UNIQUE,
+    passwordHash   TEXT NOT NULL,
+    totalUploads   INTEGER DEFAULT 0,
+    totalDownloads INTEGER DEFAULT 0,
+    createdAt      DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS Tokens (
+    token          TEXT PRIMARY KEY,
+    userId         TEXT NOT NULL,
+    expiration_utc DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tokens_expiration ON Tokens (expiration_utc);
+
+CREATE TABLE IF NOT EXISTS Snippets (
+    snippetId       TEXT PRIMARY KEY,
+    ownerId         TEXT NOT NULL REFERENCES Users (userId),
+    ownerUsername   TEXT,
+    fileName        TEXT NOT NULL,
+    fileType        TEXT,
+    s3Path          TEXT NOT NULL,
+    encryptionKey   TEXT,
+    allowedUsers    TEXT DEFAULT '[]',
+    downloadCount   INTEGER DEFAULT 0,
+    lastUpdated     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    contentHash     TEXT,
+    clientEncrypted INTEGER NOT NULL DEFAULT 0,
+    version         INTEGER NOT NULL DEFAULT 1,
+    inlineContent   BLOB,
+    UNIQUE (ownerId, fileName)
+);
+CREATE INDEX IF NOT EXISTS idx_snippets_owner_updated ON Snippets (ownerId, lastUpdated, snippetId);
+CREATE INDEX IF NOT EXISTS idx_snippets_content_hash ON Snippets (contentHash);
+CREATE INDEX IF NOT EXISTS idx_snippets_encryption_key ON Snippets (encryptionKey);
+
+CREATE TABLE IF NOT EXISTS SnippetMetadata (
+    snippetId   TEXT PRIMARY KEY,
+    fileType    TEXT,
+    keyPhrases  TEXT,
+    entities    TEXT,
+    lastUpdated DATETIME,
+    popularity  INTEGER DEFAULT 0,
+    fileName    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS RevokedTokens (
+    jti            TEXT PRIMARY KEY,
+    userId         TEXT NOT NULL,
+    expiration_utc DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expiration ON RevokedTokens (expiration_utc);
+
+CREATE TABLE IF NOT EXISTS SnippetPermissions (
+    snippetId TEXT NOT NULL,
+    userId    TEXT NOT NULL,
+    role      TEXT NOT NULL DEFAULT 'editor',
+    grantedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (snippetId, userId)
+);
+CREATE INDEX IF NOT EXISTS idx_snippet_permissions_user ON SnippetPermissions (userId, snippetId);
+
+CREATE TABLE IF NOT EXISTS DownloadEvents (
+    eventId   INTEGER PRIMARY KEY AUTOINCREMENT,
+    snippetId TEXT NOT NULL,
+    userId    TEXT NOT NULL,
+    createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS UserStats (
+    userId         TEXT PRIMARY KEY,
+    fileTypeCounts TEXT NOT NULL,
+    updatedAt      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS DashboardVersions (
+    userId  TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SnippetObjects (
+    contentHash   TEXT PRIMARY KEY,
+    s3Path        TEXT NOT NULL,
+    refCount      INTEGER NOT NULL DEFAULT 0,
+    sizeBytes     INTEGER NOT NULL,
+    encryptionKey TEXT,
+    createdAt     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_snippet_objects_ref_count ON SnippetObjects (refCount);
+CREATE INDEX IF NOT EXISTS idx_snippet_objects_encryption_key ON SnippetObjects (encryptionKey);
+
+CREATE TABLE IF NOT EXISTS PendingUploads (
+    uploadId       TEXT PRIMARY KEY,
+    ownerId        TEXT NOT NULL,
+    fileName       TEXT NOT NULL,
+    s3Key          TEXT NOT NULL,
+    createdAt      DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expiration_utc DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_uploads_expiration ON PendingUploads (expiration_utc);
+
+CREATE TABLE IF NOT EXISTS SearchPostings (
+    term      TEXT NOT NULL,
+    snippetId TEXT NOT NULL,
+    weight    REAL NOT NULL,
+    docLength REAL NOT NULL,
+    PRIMARY KEY (term, snippetId)
+);
+CREATE INDEX IF NOT EXISTS idx_search_postings_snippet ON SearchPostings (snippetId);
+
+CREATE TABLE IF NOT EXISTS SearchTerms (
+    term          TEXT PRIMARY KEY,
+    documentCount INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS SearchStats (
+    statsId       INTEGER PRIMARY KEY,
+    documentCount INTEGER NOT NULL DEFAULT 0,
+    totalLength   REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO SearchStats (statsId, documentCount, totalLength) VALUES (1, 0, 0);
+
+CREATE TABLE IF NOT EXISTS SnippetTextIndex (
+    docId     INTEGER PRIMARY KEY AUTOINCREMENT,
+    snippetId TEXT NOT NULL UNIQUE,
+    trigrams  BLOB NOT NULL,
+    partial   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_snippet_text_index_partial ON SnippetTextIndex (partial, snippetId);
+
+CREATE TABLE IF NOT EXISTS SnippetTrigrams (
+    trigram INTEGER NOT NULL,
+    docId   INTEGER NOT NULL,
+    PRIMARY KEY (trigram, docId)
+);
+"""
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# MySQL DATETIME has no fractional seconds by default; store the same strings it would
+sqlite3.register_adapter(datetime.datetime, lambda value: value.strftime(DATETIME_FORMAT))
+sqlite3.register_converter("DATETIME", lambda value: datetime.datetime.fromisoformat(value.decode()))
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s")
+
+@functools.lru_cache(maxsize=512)
+def translate(sql):
+    """Rewrites one MySQL statement into SQLite syntax (placeholders become ? / :name)."""
+    parts = _STRING_LITERAL.split(sql)
+    for i in range(0, len(parts), 2):
+        code = parts[i]
+        code = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", code, flags=re.I)
+        upsert = re.search(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", code, flags=re.I)
+        if upsert:
+            assignments = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", code[upsert.end():], flags=re.I)
+            code = code[:upsert.start()] + "ON CONFLICT DO UPDATE SET" + assignments
+        code = re.sub(r"\bFOR\s+UPDATE\b", "", code, flags=re.I)
+        code = re.sub(r"\b(NOW|UTC_TIMESTAMP)\(\)", "CURRENT_TIMESTAMP", code, flags=re.I)
+        code = re.sub(r"\bGREATEST\(", "MAX(", code, flags=re.I)
+        code = re.sub(r"\bLEAST\(", "MIN(", code, flags=re.I)
+        code = re.sub(r"\bJSON_ARRAYAGG\(", "json_group_array(", code, flags=re.I)
+        code = _PLACEHOLDER.sub(lambda match: f":{match.group(1)}" if match.group(1) else "?", code)
+        parts[i] = code.replace("%%", "%")
+    return "".join(parts)
+
+def _is_sequence(value):
+    return isinstance(value, (list, tuple, set, frozenset))
+
+def _outside_literals(statement, pattern, replace):
+    parts = _STRING_LITERAL.split(statement)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(pattern, replace, parts[i])
+    return "".join(parts)
+
+def bind(sql, params):
+    """Translates sql and expands sequence parameters (IN %s) the way pymysql escapes them."""
+    statement = translate(sql)
+    if params is None:
+        return statement, ()
+
+    if isinstance(params, dict):
+        bound = {}
+        def expand_named(match):
+            name = match.group(1)
+            value = params[name]
+            if not _is_sequence(value):
+                bound[name] = value
+                return match.group(0)
+            names = [f"{name}__{j}" for j in range(len(value))]
+            bound.update(zip(names, value))
+            return "(" + ", ".join(f":{n}" for n in names) + ")"
+        return _outside_literals(statement, r":(\w+)", expand_named), bound
+
+    values = iter(params)
+    bound = []
+    def expand_positional(match):
+        value = next(values)
+        if not _is_sequence(value):
+            bound.append(value)
+            return "?"
+        bound.extend(value)
+        return "(" + ", ".join("?" for _ in value) + ")"
+    return _outside_literals(statement, r"\?", expand_positional), bound
+
+def _mysql_error(error):
+    """Maps a sqlite3 error to the pymysql exception (and message) MySQL would have produced."""
+    message = str(error)
+    if isinstance(error, sqlite3.IntegrityError):
+        if "UNIQUE" in message or "PRIMARY KEY" in message:
+            return pymysql.err.IntegrityError(1062, f"Duplicate entry ({message})")
+        if "FOREIGN KEY" in message:
+            return pymysql.err.IntegrityError(1452, f"Cannot add or update a child row: a foreign key constraint fails ({message})")
+        return pymysql.err.IntegrityError(1048, message)
+    if isinstance(error, sqlite3.OperationalError):
+        return pymysql.err.OperationalError(1105, message)
+    return pymysql.err.ProgrammingError(1064, message)
+
+class Cursor:
+    """The parts of pymysql's DictCursor the handlers use."""
+
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _rows(self, rows):
+        columns = [column[0] for column in self._cursor.description or []]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def execute(self, sql, params=None):
+        statement, bound = bind(sql, params)
+        try:
+            self._cursor.execute(statement, bound)
+        except sqlite3.Error as e:
+            raise _mysql_error(e) from e
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        total = 0
+        for params in seq_of_params:
+            self.execute(sql, params)
+            total += max(self.rowcount, 0)
+        self.rowcount = total
+        return total
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._rows([row])[0] if row is not None else None
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def fetchmany(self, size=1):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def close(self):
+        self._cursor.close()
+
+class Connection:
+    """The parts of a pymysql connection the handlers and db.py use."""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def cursor(self):
+        return Cursor(self._connection)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self, reconnect=False):
+        self._connection.execute("SELECT 1")
+
+    def close(self):
+        self._connection.close()
+
+def connect(path):
+    """Opens (creating if needed) the local database file at path."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return Connection(path)
@@ -0,0 +1,171 @@
+import heapq
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+# Inverted index over SnippetMetadata (sql/013_search_index.sql), used by
+# search_lambda. extract_metadata_lambda calls index_snippet in the transaction
+# that writes the metadata and delete_lambda calls remove_snippet, so the index
+# never lags the metadata it is built from.
+#
+#   SearchPostings  one row per (term, snippet): the term's field-weighted
+#                   frequency in the snippet and the snippet's weighted length
+#   SearchTerms     how many snippets contain each term (document frequency)
+#   SearchStats     one row with the number of indexed snippets and their total
+#                   length, for the BM25 average
+#
+# Queries are scored with BM25 over the postings of the snippets the caller owns
+# or was granted, so other users' snippets never reach the scorer.
+FIELD_WEIGHTS = {"fileName": 3.0, "entities": 2.0, "keyPhrases": 1.0, "fileType": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TERM_LENGTH = 64
+MAX_DOCUMENT_TERMS = 200
+MAX_QUERY_TERMS = 16
+MAX_TAGS = 10
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+             "that", "the", "this", "to", "with"}
+
+_WORD = re.compile(r"[A-Za-z0-9]+(?:_+[A-Za-z0-9]+)*")
+_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# Postings of the query terms for the snippets the user owns, then for those shared with them
+ACCESSIBLE_POSTINGS_SQL = """
+    SELECT p.term, p.snippetId, p.weight, p.docLength
+    FROM Snippets s
+    JOIN SearchPostings p ON p.snippetId = s.snippetId
+    WHERE s.ownerId = %(user)s AND p.term IN %(terms)s
+    UNION
+    SELECT p.term, p.snippetId, p.weight, p.docLength
+    FROM SnippetPermissions g
+    JOIN SearchPostings p ON p.snippetId = g.snippetId
+    WHERE g.userId = %(user)s AND p.term IN %(terms)s
+"""
+
+SEARCH_RESULTS_SQL = """
+    SELECT m.snippetId, m.fileName, m.fileType, m.keyPhrases, m.entities, s.lastUpdated, u.username AS ownerUsername
+    FROM SnippetMetadata m
+    JOIN Snippets s ON s.snippetId = m.snippetId
+    JOIN Users u ON u.userId = s.ownerId
+    WHERE m.snippetId IN %s
+"""
+
+def tokenize(text):
+    """Lowercase terms of text. Identifiers are split on camelCase and underscores and also kept joined."""
+    terms = []
+    for word in _WORD.findall(text or ""):
+        parts = [part.lower() for part in _PART.findall(word)]
+        if len(parts) > 1:
+            parts.append("".join(parts))
+        terms.extend(part for part in parts if 1 < len(part) <= MAX_TERM_LENGTH and part not in STOPWORDS)
+    return terms
+
+def query_terms(query):
+    """The distinct terms of a search query, in order, at most MAX_QUERY_TERMS."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+def document_terms(file_name, file_type, key_phrases, entities):
+    """Returns {term: field-weighted frequency} for one snippet's metadata."""
+    weights = Counter()
+    for field, values in [("fileName", [file_name]), ("fileType", [file_type]),
+                          ("keyPhrases", key_phrases), ("entities", entities)]:
+        for value in values:
+            for term in tokenize(value):
+                weights[term] += FIELD_WEIGHTS[field]
+    # Comprehend returns a phrase for nearly every line of a large file; keep the strongest terms
+    return dict(weights.most_common(MAX_DOCUMENT_TERMS))
+
+def _replace_postings(cursor, snippet_id, weights):
+    cursor.execute("SELECT term, docLength FROM SearchPostings WHERE snippetId = %s FOR UPDATE", (snippet_id,))
+    old_rows = cursor.fetchall()
+    old_terms = {row["term"] for row in old_rows}
+    old_length = old_rows[0]["docLength"] if old_rows else 0.0
+    new_length = sum(weights.values())
+
+    cursor.execute("DELETE FROM SearchPostings WHERE snippetId = %s", (snippet_id,))
+    if weights:
+        cursor.executemany(
+            "INSERT INTO SearchPostings (term, snippetId, weight, docLength) VALUES (%s, %s, %s, %s)",
+            [(term, snippet_id, weight, new_length) for term, weight in sorted(weights.items())]
+        )
+
+    # Document frequencies in term order, so concurrent index writes lock SearchTerms rows in the same order
+    changes = sorted([(term, 1) for term in set(weights) - old_terms] + [(term, -1) for term in old_terms - set(weights)])
+    for term, delta in changes:
+        if delta > 0:
+            cursor.execute("""
+                INSERT INTO SearchTerms (term, documentCount) VALUES (%s, 1)
+                ON DUPLICATE KEY UPDATE documentCount = documentCount + 1
+            """, (term,))
+        else:
+            cursor.execute("UPDATE SearchTerms SET documentCount = GREATEST(documentCount - 1, 0) WHERE term = %s", (term,))
+
+    document_delta = (1 if weights else 0) - (1 if old_rows else 0)
+    if document_delta or new_length != old_length:
+        cursor.execute(
+            "UPDATE SearchStats SET documentCount = documentCount + %s, totalLength = totalLength + %s WHERE statsId = 1",
+            (document_delta, new_length - old_length)
+        )
+
+def index_snippet(cursor, snippet_id, file_name, file_type, key_phrases, entities):
+    """(Re)indexes one snippet's metadata; commit with the caller's transaction."""
+    _replace_postings(cursor, snippet_id, document_terms(file_name, file_type, key_phrases, entities))
+
+def remove_snippet(cursor, snippet_id):
+    """Drops a snippet from the index; commit with the caller's transaction."""
+    _replace_postings(cursor, snippet_id, {})
+
+def _tags(row):
+    tags = json.loads(row["keyPhrases"] or "[]") + json.loads(row["entities"] or "[]")
+    return list(dict.fromkeys(tags))[:MAX_TAGS]
+
+def search(cursor, user_id, query, limit=DEFAULT_LIMIT):
+    """Returns up to limit snippets the user can access, best BM25 match first."""
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    cursor.execute("SELECT term, documentCount FROM SearchTerms WHERE term IN %s AND documentCount > 0", (tuple(terms),))
+    document_counts = {row["term"]: row["documentCount"] for row in cursor.fetchall()}
+    if not document_counts:
+        return []
+    cursor.execute("SELECT documentCount, totalLength FROM SearchStats WHERE statsId = 1")
+    stats = cursor.fetchone()
+    total_documents = max(stats["documentCount"], 1)
+    average_length = stats["totalLength"] / total_documents or 1.0
+
+    idf = {
+        term: math.log(1 + (total_documents - count + 0.5) / (count + 0.5))
+        for term, count in document_counts.items()
+    }
+    cursor.execute(ACCESSIBLE_POSTINGS_SQL, {"user": user_id, "terms": tuple(document_counts)})
+    scores = defaultdict(float)
+    for row in cursor.fetchall():
+        weight = row["weight"]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * row["docLength"] / average_length)
+        scores[row["snippetId"]] += idf[row["term"]] * weight * (BM25_K1 + 1) / (weight + norm)
+
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+    if not top:
+        return []
+    cursor.execute(SEARCH_RESULTS_SQL, (tuple(snippet_id for snippet_id, _ in top),))
+    rows = {row["snippetId"]: row for row in cursor.fetchall()}
+
+    results = []
+    for snippet_id, score in top:
+        row = rows.get(snippet_id)
+        if not row:
+            continue
+        results.append({
+            "snippetId": snippet_id,
+            "fileName": row["fileName"],
+            "fileType": row["fileType"],
+            "owner": row["ownerUsername"],
+            "lastModified": row["lastUpdated"].strftime('%Y-%m-%d %H:%M:%S') if row["lastUpdated"] else None,
+            "tags": _tags(row),
+            "score": round(score, 4),
+        })
+    return results
@@ -0,0 +1,107 @@
+import os
+import sys
+from collections import OrderedDict
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# Decrypted snippet content cached per warm container, so a popular snippet is
+# not fetched from S3 and decrypted again on every download. Entries are keyed
+# by snippetId and checked against the snippet's version column: update_lambda
+# bumps the version, so the next read misses and replaces the stale entry
+# without any cross-container invalidation.
+#
+# The cache is bounded by bytes, not entries (one large snippet can weigh as
+# much as thousands of small ones), and evicts least recently used entries
+# first. Snippets bigger than max_entry_bytes are never cached. With
+# encrypt = true the content is held AES-GCM encrypted under a random key that
+# only exists in this container's memory, so a memory dump does not expose it in
+# clear text, at the cost of one decrypt per hit.
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+NONCE_SIZE = 12
+
+_entries = OrderedDict()  # snippetId -> (version, payload, size)
+_settings = {"max_bytes": DEFAULT_MAX_BYTES, "max_entry_bytes": DEFAULT_MAX_BYTES // 8, "cipher": None}
+_stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "bytes": 0}
+
+def configure(config):
+    """Reads the optional max_bytes / max_entry_bytes / encrypt settings from the [cache] section."""
+    max_bytes = config.getint("cache", "max_bytes", fallback=DEFAULT_MAX_BYTES)
+    _settings["max_bytes"] = max_bytes
+    _settings["max_entry_bytes"] = config.getint("cache", "max_entry_bytes", fallback=max_bytes // 8)
+    encrypt = config.getboolean("cache", "encrypt", fallback=False)
+    _settings["cipher"] = AESGCM(AESGCM.generate_key(bit_length=256)) if encrypt else None
+    clear()
+
+def clear():
+    _entries.clear()
+    _stats["bytes"] = 0
+
+def _seal(text):
+    cipher = _settings["cipher"]
+    if cipher is None:
+        return text, sys.getsizeof(text)
+    nonce = os.urandom(NONCE_SIZE)
+    sealed = nonce + cipher.encrypt(nonce, text.encode(), None)
+    return sealed, sys.getsizeof(sealed)
+
+def _open(payload):
+    cipher = _settings["cipher"]
+    if cipher is None:
+        return payload
+    return cipher.decrypt(payload[:NONCE_SIZE], payload[NONCE_SIZE:], None).decode()
+
+def _drop(snippet_id):
+    _, _, size = _entries.pop(snippet_id)
+    _stats["bytes"] -= size
+
+def get(snippet_id, version):
+    """Returns the cached content for this version of the snippet, or None."""
+    entry = _entries.get(snippet_id)
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+    if entry[0] != version:
+        _drop(snippet_id)
+        _stats["stale"] += 1
+        _stats["misses"] += 1
+        return None
+    _entries.move_to_end(snippet_id)
+    _stats["hits"] += 1
+    return _open(entry[1])
+
+def put(snippet_id, version, text):
+    """Caches text as this version of the snippet, evicting older entries to stay within max_bytes."""
+    payload, size = _seal(text)
+    if size > _settings["max_entry_bytes"]:
+        return
+    if snippet_id in _entries:
+        _drop(snippet_id)
+    _entries[snippet_id] = (version, payload, size)
+    _stats["bytes"] += size
+    while _stats["bytes"] > _settings["max_bytes"]:
+        evicted_id = next(iter(_entries))
+        _drop(evicted_id)
+        _stats["evictions"] += 1
+
+def get_or_load(snippet_id, version, load):
+    """Returns the snippet's content from the cache, or calls load() and caches what it returns."""
+    text = get(snippet_id, version)
+    if text is None:
+        text = load()
+        put(snippet_id, version, text)
+
+    stats = get_stats()
+    print(f"** Snippet cache: {stats['hits']} hits / {stats['misses']} misses, "
+          f"{stats['entries']} snippets, {stats['bytes']} bytes held (hit ratio {stats['hitRatio']}) **")
+    return text
+
+def get_stats():
+    """Returns hit/miss counters and how much content this container holds."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "maxBytes": _settings["max_bytes"],
+        "encrypted": _settings["cipher"] is not None,
+        "hitRatio": round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+    }
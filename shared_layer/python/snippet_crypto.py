@@ -0,0 +1,278 @@
+import base64
+import codecs
+import functools
+import io
+import itertools
+import os
+import zlib
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+# Snippet storage format, shared by the handlers that write and read snippet
+# objects. Content is compressed and then Fernet-encrypted, and the token is
+# stored as raw bytes behind a small header:
+#
+#     b"SNP" | format version (1 byte) | codec (1 byte) | Fernet token bytes
+#
+# Objects written before the envelope are base64 Fernet tokens, which always
+# start with "gAAAAA" and so can never be mistaken for the header.
+#
+# Snippets of stream_threshold_bytes or more use format version 2 instead: the
+# compressed stream is cut into fixed-size chunks, each sealed with AES-GCM, so
+# it is encrypted while it uploads and decrypted while it downloads without
+# holding the whole ciphertext in memory:
+#
+#     b"SNP" | 2 | codec | chunk size (4 bytes) | nonce prefix (8 bytes) | chunks...
+#
+# Chunk i uses nonce prefix + i and authenticates the header plus a final-chunk
+# flag, so chunks cannot be reordered, dropped or truncated from the end. The
+# AES key is derived from the Fernet key with HKDF.
+#
+# Both formats take an optional data_key (see snippet_keys): content stored since
+# per-object data keys is encrypted with its own Fernet key instead of the global
+# fernet_key, which is still used when data_key is None.
+ENVELOPE_MAGIC = b"SNP"
+ENVELOPE_VERSION = 1
+STREAM_VERSION = 2
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_NONCE_PREFIX_SIZE = 8
+STREAM_TAG_SIZE = 16
+STREAM_HEADER_SIZE = len(ENVELOPE_MAGIC) + 2 + 4 + STREAM_NONCE_PREFIX_SIZE
+STREAM_KEY_INFO = b"snippet-hub stream v2"
+DEFAULT_STREAM_THRESHOLD = 64 * 1024
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+DEFAULT_CODEC = "zlib"
+DEFAULT_LEVEL = 6
+
+_settings = {"cipher": None, "stream_cipher": None, "codec": CODEC_ZLIB, "level": DEFAULT_LEVEL,
+             "stream_threshold": DEFAULT_STREAM_THRESHOLD}
+
+def configure(config):
+    """Reads fernet_key and the optional codec / compression_level / stream_threshold_bytes from the [encryption] section."""
+    codec_name = config.get("encryption", "codec", fallback=DEFAULT_CODEC).lower()
+    if codec_name not in CODECS:
+        raise ValueError(f"Unknown snippet codec: {codec_name}")
+    if codec_name == "zstd" and zstandard is None:
+        print("** zstandard is not installed, compressing snippets with zlib **")
+        codec_name = "zlib"
+
+    fernet_key = config["encryption"]["fernet_key"].encode()
+    _settings["cipher"] = Fernet(fernet_key)
+    _settings["stream_cipher"] = AESGCM(derive_stream_key(fernet_key))
+    _settings["codec"] = CODECS[codec_name]
+    _settings["level"] = config.getint("encryption", "compression_level", fallback=DEFAULT_LEVEL)
+    _settings["stream_threshold"] = config.getint("encryption", "stream_threshold_bytes", fallback=DEFAULT_STREAM_THRESHOLD)
+
+def derive_stream_key(fernet_key):
+    """256-bit AES-GCM key for format version 2, derived from the Fernet key."""
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=STREAM_KEY_INFO)
+    return hkdf.derive(base64.urlsafe_b64decode(fernet_key))
+
+@functools.lru_cache(maxsize=256)
+def _data_key_ciphers(data_key):
+    return Fernet(data_key), AESGCM(derive_stream_key(data_key))
+
+def _ciphers(data_key):
+    """(Fernet, AESGCM) for a data key, or the global ones for None."""
+    if data_key is None:
+        return _settings["cipher"], _settings["stream_cipher"]
+    return _data_key_ciphers(data_key)
+
+def compress(data, codec, level):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, level)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+class _Passthrough:
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+def compressor(codec, level):
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(level)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    return _Passthrough()
+
+def decompressor(codec):
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Snippet is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == CODEC_NONE:
+        return _Passthrough()
+    raise ValueError(f"Unknown snippet codec id: {codec}")
+
+def decompress(data, codec):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Snippet is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_NONE:
+        return data
+    raise ValueError(f"Unknown snippet codec id: {codec}")
+
+def encrypt_snippet(snippet_text, data_key=None):
+    """Returns the stored (enveloped) bytes for a snippet."""
+    codec = _settings["codec"]
+    payload = compress(snippet_text.encode(), codec, _settings["level"])
+    token = _ciphers(data_key)[0].encrypt(payload)
+    return ENVELOPE_MAGIC + bytes([ENVELOPE_VERSION, codec]) + base64.urlsafe_b64decode(token)
+
+def decrypt_snippet(stored, data_key=None):
+    """Returns the snippet text from stored bytes in any of the storage formats."""
+    cipher = _ciphers(data_key)[0]
+    if not stored.startswith(ENVELOPE_MAGIC):
+        return cipher.decrypt(stored).decode()
+    if stored[len(ENVELOPE_MAGIC)] == STREAM_VERSION:
+        return _decode_text(decrypt_stream(io.BytesIO(stored), data_key))
+
+    header_size = len(ENVELOPE_MAGIC) + 2
+    version, codec = stored[len(ENVELOPE_MAGIC)], stored[len(ENVELOPE_MAGIC) + 1]
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported snippet format version: {version}")
+    payload = cipher.decrypt(base64.urlsafe_b64encode(stored[header_size:]))
+    return decompress(payload, codec).decode()
+
+def _chunk_nonce(prefix, index):
+    return prefix + index.to_bytes(4, "big")
+
+def encrypt_stream(chunks, chunk_size=STREAM_CHUNK_SIZE, data_key=None):
+    """Yields the format version 2 object for an iterable of plaintext byte chunks."""
+    aead = _ciphers(data_key)[1]
+    codec = _settings["codec"]
+    prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+    header = ENVELOPE_MAGIC + bytes([STREAM_VERSION, codec]) + chunk_size.to_bytes(4, "big") + prefix
+    yield header
+
+    stream = compressor(codec, _settings["level"])
+    buffer = bytearray()
+    index = 0
+    for chunk in chunks:
+        buffer += stream.compress(chunk)
+        # Keep at least one byte back so the last chunk is always the one flagged final
+        while len(buffer) > chunk_size:
+            yield aead.encrypt(_chunk_nonce(prefix, index), bytes(buffer[:chunk_size]), header + b"\x00")
+            del buffer[:chunk_size]
+            index += 1
+    buffer += stream.flush()
+    while len(buffer) > chunk_size:
+        yield aead.encrypt(_chunk_nonce(prefix, index), bytes(buffer[:chunk_size]), header + b"\x00")
+        del buffer[:chunk_size]
+        index += 1
+    yield aead.encrypt(_chunk_nonce(prefix, index), bytes(buffer), header + b"\x01")
+
+def _read_full(fileobj, size):
+    parts = []
+    while size > 0:
+        part = fileobj.read(size)
+        if not part:
+            break
+        parts.append(part)
+        size -= len(part)
+    return b"".join(parts)
+
+def decrypt_stream(fileobj, data_key=None):
+    """Yields plaintext byte chunks from a file-like object holding a format version 2 object."""
+    header = _read_full(fileobj, STREAM_HEADER_SIZE)
+    if len(header) != STREAM_HEADER_SIZE or header[:len(ENVELOPE_MAGIC)] != ENVELOPE_MAGIC or header[3] != STREAM_VERSION:
+        raise ValueError("Not a format version 2 snippet object")
+    aead = _ciphers(data_key)[1]
+    stream = decompressor(header[4])
+    chunk_size = int.from_bytes(header[5:9], "big")
+    prefix = header[9:]
+
+    block = _read_full(fileobj, chunk_size + STREAM_TAG_SIZE)
+    index = 0
+    while True:
+        next_block = _read_full(fileobj, chunk_size + STREAM_TAG_SIZE)
+        final = not next_block
+        payload = aead.decrypt(_chunk_nonce(prefix, index), block, header + (b"\x01" if final else b"\x00"))
+        yield stream.decompress(payload)
+        if final:
+            break
+        block = next_block
+        index += 1
+    yield stream.flush()
+
+class _IterReader(io.RawIOBase):
+    """Read-only file object over an iterable of byte chunks, counting the bytes read."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        self.bytes_read += size
+        return size
+
+def _slices(data, size):
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+def put_snippet(s3_client, bucket, s3_key, snippet_text, data_key=None):
+    """Encrypts and uploads a snippet, streaming it when it is large. Returns the stored size in bytes."""
+    data = snippet_text.encode()
+    if len(data) < _settings["stream_threshold"]:
+        stored = encrypt_snippet(snippet_text, data_key)
+        s3_client.put_object(Bucket=bucket, Key=s3_key, Body=stored)
+        return len(stored)
+
+    reader = _IterReader(encrypt_stream(_slices(data, STREAM_CHUNK_SIZE), data_key=data_key))
+    s3_client.upload_fileobj(io.BufferedReader(reader, STREAM_CHUNK_SIZE), bucket, s3_key)
+    return reader.bytes_read
+
+def _decode_text(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = [decoder.decode(chunk) for chunk in chunks]
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+def get_snippet(s3_client, bucket, s3_key, data_key=None):
+    """Downloads and decrypts a snippet in any storage format, decrypting version 2 objects as they stream in."""
+    body = s3_client.get_object(Bucket=bucket, Key=s3_key)["Body"]
+    prefix = _read_full(body, len(ENVELOPE_MAGIC) + 1)
+    if prefix != ENVELOPE_MAGIC + bytes([STREAM_VERSION]):
+        return decrypt_snippet(prefix + body.read(), data_key)
+
+    chunks = itertools.chain([prefix], iter(lambda: body.read(STREAM_CHUNK_SIZE), b""))
+    return _decode_text(decrypt_stream(io.BufferedReader(_IterReader(chunks), STREAM_CHUNK_SIZE), data_key))
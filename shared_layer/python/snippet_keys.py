@@ -0,0 +1,88 @@
+import base64
+import os
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Envelope encryption for snippet content. Every stored copy of a snippet body
+# (each SnippetObjects object, and each inline snippet) is encrypted with its
+# own random data key. The data key is wrapped with a master key and kept next
+# to the content's row, in SnippetObjects.encryptionKey and in
+# Snippets.encryptionKey of every snippet that uses it:
+#
+#     "wk1." <master key id> "." base64url(nonce | AES-GCM(master key, data key))
+#
+# Rotating the master key only rewraps these strings
+# (scripts/rotate_snippet_keys.py rewrap); no object is re-encrypted. Rows with
+# a NULL encryptionKey hold content encrypted with the global fernet_key from
+# before this scheme, which `rotate_snippet_keys.py reencrypt` migrates.
+#
+# Master keys come from the [encryption] section: master_keys lists
+# "<id>:<base64 32-byte key>" pairs and master_key_id names the one new data
+# keys are wrapped with. Without them a master key with id "fernet" is derived
+# from fernet_key, so the scheme works before any master key is provisioned.
+WRAPPED_PREFIX = "wk1."
+DERIVED_KEY_ID = "fernet"
+DERIVED_KEY_INFO = b"snippet-hub master key v1"
+NONCE_SIZE = 12
+
+_settings = {"keys": {}, "current": None}
+
+def configure(config):
+    """Reads fernet_key and the optional master_keys / master_key_id from the [encryption] section."""
+    fernet_key = config["encryption"]["fernet_key"].encode()
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=DERIVED_KEY_INFO)
+    keys = {DERIVED_KEY_ID: AESGCM(hkdf.derive(base64.urlsafe_b64decode(fernet_key)))}
+
+    for entry in config.get("encryption", "master_keys", fallback="").split(","):
+        if not entry.strip():
+            continue
+        key_id, _, encoded = entry.strip().partition(":")
+        if not key_id or "." in key_id or not encoded:
+            raise ValueError(f"master_keys entries must look like <id>:<base64 key>, got {entry.strip()!r}")
+        keys[key_id] = AESGCM(base64.b64decode(encoded))
+
+    current = config.get("encryption", "master_key_id", fallback=DERIVED_KEY_ID)
+    if current not in keys:
+        raise ValueError(f"master_key_id {current!r} is not in master_keys")
+    _settings["keys"] = keys
+    _settings["current"] = current
+
+def current_key_id():
+    return _settings["current"]
+
+def is_wrapped(value):
+    return isinstance(value, str) and value.startswith(WRAPPED_PREFIX)
+
+def key_id_of(wrapped):
+    return wrapped[len(WRAPPED_PREFIX):].split(".", 1)[0]
+
+def wrap(data_key, key_id=None):
+    """Wraps a data key with the current (or the given) master key."""
+    key_id = key_id or _settings["current"]
+    nonce = os.urandom(NONCE_SIZE)
+    sealed = _settings["keys"][key_id].encrypt(nonce, data_key, key_id.encode())
+    return f"{WRAPPED_PREFIX}{key_id}.{base64.urlsafe_b64encode(nonce + sealed).decode()}"
+
+def unwrap(wrapped):
+    """Returns the data key inside a wrapped key string."""
+    key_id, _, encoded = wrapped[len(WRAPPED_PREFIX):].partition(".")
+    if key_id not in _settings["keys"]:
+        raise ValueError(f"Snippet key is wrapped with unknown master key {key_id!r}; add it to master_keys")
+    sealed = base64.urlsafe_b64decode(encoded)
+    return _settings["keys"][key_id].decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], key_id.encode())
+
+def rewrap(wrapped):
+    """Returns the same data key wrapped with the current master key."""
+    return wrap(unwrap(wrapped))
+
+def new_data_key():
+    """Returns (data key, wrapped data key) for content about to be stored."""
+    data_key = Fernet.generate_key()
+    return data_key, wrap(data_key)
+
+def data_key_of(encryption_key):
+    """Returns the data key for a row's encryptionKey, or None for content under the global fernet_key."""
+    return unwrap(encryption_key) if is_wrapped(encryption_key) else None
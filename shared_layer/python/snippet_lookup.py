@@ -0,0 +1,113 @@
+# Shared snippet resolution for the handlers that take a fileName, plus the
+# dashboard page query. Every lookup goes through the unique (ownerId, fileName)
+# or (ownerId, lastUpdated, snippetId) index or the SnippetPermissions
+# (userId, snippetId) index; scripts/check_query_plans.py
+# runs EXPLAIN on these exact statements and fails if one becomes a full scan.
+
+import json
+
+# inlineContent is at most a few KB and saves download a second round trip for small snippets;
+# encryptionKey is the content's wrapped data key (snippet_keys); downloadCount is the stored
+# counter, which lags by the DownloadEvents not yet flushed (download_counters)
+SNIPPET_COLUMNS = ["snippetId", "ownerId", "fileName", "s3Path", "contentHash", "clientEncrypted", "version",
+                   "inlineContent", "encryptionKey", "downloadCount"]
+
+_columns = ", ".join(SNIPPET_COLUMNS)
+_joined_columns = ", ".join(f"s.{column}" for column in SNIPPET_COLUMNS)
+
+OWNED_SNIPPET_SQL = f"""
+    SELECT {_columns}
+    FROM Snippets
+    WHERE ownerId = %s AND fileName = %s
+"""
+
+OWNED_SNIPPETS_SQL = f"""
+    SELECT {_columns}
+    FROM Snippets
+    WHERE ownerId = %s AND fileName IN %s
+"""
+
+# Owned snippet first, otherwise one shared with the user; a UNION has no row order
+# of its own, so _prio makes the owned branch win when both match
+ACCESSIBLE_SNIPPET_SQL = f"""
+    SELECT {_columns}, 0 AS _prio
+    FROM Snippets
+    WHERE ownerId = %s AND fileName = %s
+    UNION ALL
+    SELECT {_joined_columns}, 1 AS _prio
+    FROM SnippetPermissions p
+    JOIN Snippets s ON s.snippetId = p.snippetId
+    WHERE p.userId = %s AND s.fileName = %s
+    ORDER BY _prio
+    LIMIT 1
+"""
+
+# One dashboard page: snippets the user owns or was granted, newest first by the
+# (lastUpdated, snippetId) keyset, with the owner's username and everyone granted
+# access aggregated in the same statement. Each branch of the union stops at
+# %(limit)s rows before the usernames are joined in.
+DASHBOARD_PAGE_SQL = """
+    SELECT page.snippetId, page.fileName, page.lastUpdated,
+           o.username AS ownerUsername,
+           JSON_ARRAYAGG(gu.username) AS usersWithAccess
+    FROM (
+        SELECT * FROM (
+            SELECT snippetId, ownerId, fileName, lastUpdated
+            FROM Snippets
+            WHERE ownerId = %(user)s
+              AND (lastUpdated < %(after_time)s OR (lastUpdated = %(after_time)s AND snippetId < %(after_id)s))
+            ORDER BY lastUpdated DESC, snippetId DESC
+            LIMIT %(limit)s
+        ) owned
+        UNION
+        SELECT * FROM (
+            SELECT s.snippetId, s.ownerId, s.fileName, s.lastUpdated
+            FROM SnippetPermissions p
+            JOIN Snippets s ON s.snippetId = p.snippetId
+            WHERE p.userId = %(user)s
+              AND (s.lastUpdated < %(after_time)s OR (s.lastUpdated = %(after_time)s AND s.snippetId < %(after_id)s))
+            ORDER BY s.lastUpdated DESC, s.snippetId DESC
+            LIMIT %(limit)s
+        ) shared
+        ORDER BY lastUpdated DESC, snippetId DESC
+        LIMIT %(limit)s
+    ) page
+    JOIN Users o ON o.userId = page.ownerId
+    LEFT JOIN SnippetPermissions g ON g.snippetId = page.snippetId
+    LEFT JOIN Users gu ON gu.userId = g.userId
+    GROUP BY page.snippetId, page.fileName, page.lastUpdated, o.username
+    ORDER BY page.lastUpdated DESC, page.snippetId DESC
+"""
+
+def find_owned_snippet(cursor, owner_id, file_name):
+    """Returns the snippet named file_name that owner_id owns, or None."""
+    cursor.execute(OWNED_SNIPPET_SQL, (owner_id, file_name))
+    return cursor.fetchone()
+
+def find_owned_snippets(cursor, owner_id, file_names):
+    """Returns {fileName: snippet} for the given file names that owner_id owns, in one query."""
+    if not file_names:
+        return {}
+    cursor.execute(OWNED_SNIPPETS_SQL, (owner_id, tuple(file_names)))
+    return {snippet["fileName"]: snippet for snippet in cursor.fetchall()}
+
+def find_accessible_snippet(cursor, user_id, file_name):
+    """Returns the snippet named file_name that user_id owns or has been granted access to, or None."""
+    cursor.execute(ACCESSIBLE_SNIPPET_SQL, (user_id, file_name, user_id, file_name))
+    snippet = cursor.fetchone()
+    if snippet:
+        snippet.pop("_prio", None)
+    return snippet
+
+def find_dashboard_page(cursor, user_id, after_time, after_id, limit):
+    """
+    Returns up to limit snippets visible to user_id that sort after (after_time, after_id),
+    each with ownerUsername and a sorted usersWithAccess list.
+    """
+    cursor.execute(DASHBOARD_PAGE_SQL, {"user": user_id, "after_time": after_time, "after_id": after_id, "limit": limit})
+    snippets = cursor.fetchall()
+    for snippet in snippets:
+        # No grants aggregates to [null]
+        usernames = json.loads(snippet["usersWithAccess"] or "[]")
+        snippet["usersWithAccess"] = sorted(username for username in usernames if username is not None)
+    return snippets
@@ -0,0 +1,144 @@
+# Content-addressed snippet storage (SnippetObjects). Identical snippet bodies
+# share one S3 object named after a keyed hash of the plaintext, and the row's
+# refCount tracks how many Snippets point at it. The S3 PUT happens while the
+# SnippetObjects row is locked and before the caller commits, so a concurrent
+# upload of the same content waits for it instead of racing. Objects are never
+# deleted inside a request: releasing the last reference leaves the row at
+# refCount 0 and sweep_unreferenced() removes the object later, under the same
+# row lock, so a commit that fails can never leave a snippet without content.
+#
+# Snippets of up to inline_max_bytes skip S3 altogether: their encrypted
+# envelope is kept in Snippets.inlineContent (sql/011_inline_snippets.sql) and
+# s3Path holds INLINE_S3_PATH. The tier is chosen again on every write, so a
+# snippet moves to S3 when an update grows it past the threshold and back when
+# it shrinks. Inline content has no SnippetObjects row and is not deduplicated.
+#
+# Each new object and each inline snippet gets its own data key (snippet_keys);
+# the wrapped key is stored on the SnippetObjects row and copied to every
+# Snippets row that references the content, so reads need no extra query.
+import hashlib
+import hmac
+
+import snippet_crypto
+import snippet_keys
+
+INLINE_S3_PATH = "inline"
+DEFAULT_INLINE_MAX_BYTES = 4096
+# Snippets.inlineContent is a BLOB (64 KB), which must hold the encrypted envelope
+MAX_INLINE_MAX_BYTES = 32 * 1024
+
+_settings = {"inline_max_bytes": DEFAULT_INLINE_MAX_BYTES}
+
+def configure(config):
+    """Reads the optional inline_max_bytes from the [storage] section (0 stores every snippet in S3)."""
+    inline_max_bytes = config.getint("storage", "inline_max_bytes", fallback=DEFAULT_INLINE_MAX_BYTES)
+    if not 0 <= inline_max_bytes <= MAX_INLINE_MAX_BYTES:
+        raise ValueError(f"inline_max_bytes must be between 0 and {MAX_INLINE_MAX_BYTES}")
+    _settings["inline_max_bytes"] = inline_max_bytes
+
+def content_hash(key, content):
+    """HMAC-SHA256 of the plaintext, so object names don't reveal guessable content."""
+    return hmac.new(key.encode(), content.encode(), hashlib.sha256).hexdigest()
+
+def object_key(folder, digest):
+    return f"{folder}/objects/{digest}"
+
+def s3_key_of(s3_path, bucket):
+    return s3_path.replace(f"s3://{bucket}/", "")
+
+def acquire(cursor, bucket, folder, digest, store):
+    """
+    Adds a reference to the object for digest and returns (s3Path, encryptionKey).
+    store(s3_key, data_key) writes the object encrypted with data_key and returns its
+    size; it is only called for the first reference, which creates the object's key.
+    """
+    s3_path = f"s3://{bucket}/{object_key(folder, digest)}"
+    cursor.execute("""
+        INSERT INTO SnippetObjects (contentHash, s3Path, refCount, sizeBytes) VALUES (%s, %s, 1, 0)
+        ON DUPLICATE KEY UPDATE refCount = refCount + 1
+    """, (digest, s3_path))
+    cursor.execute("SELECT s3Path, refCount, encryptionKey FROM SnippetObjects WHERE contentHash = %s", (digest,))
+    row = cursor.fetchone()
+
+    if row["refCount"] == 1:
+        # A row revived from refCount 0 keeps its s3Path (e.g. <hash>.dk after reencrypt), so the
+        # object is rewritten where the row points instead of at a second key
+        data_key, wrapped_key = snippet_keys.new_data_key()
+        size_bytes = store(s3_key_of(row["s3Path"], bucket), data_key)
+        cursor.execute("UPDATE SnippetObjects SET sizeBytes = %s, encryptionKey = %s WHERE contentHash = %s",
+                       (size_bytes, wrapped_key, digest))
+        print(f"** Stored new object: {row['s3Path']} **")
+        return row["s3Path"], wrapped_key
+
+    print(f"** Reusing object {row['s3Path']} ({row['refCount']} references) **")
+    return row["s3Path"], row["encryptionKey"]
+
+def store_content(cursor, s3_client, bucket, folder, digest, text):
+    """
+    Stores text in the tier its size calls for. Returns (s3Path, inlineContent, encryptionKey)
+    for the Snippets row: inlineContent is the encrypted envelope for inline snippets, else None.
+    """
+    if len(text.encode()) <= _settings["inline_max_bytes"]:
+        data_key, wrapped_key = snippet_keys.new_data_key()
+        return INLINE_S3_PATH, snippet_crypto.encrypt_snippet(text, data_key), wrapped_key
+    s3_path, wrapped_key = acquire(cursor, bucket, folder, digest,
+                                   lambda s3_key, data_key: snippet_crypto.put_snippet(s3_client, bucket, s3_key, text, data_key))
+    return s3_path, None, wrapped_key
+
+def load_content(s3_client, bucket, snippet):
+    """Returns the decrypted text of a server-encrypted snippet from whichever tier holds it."""
+    data_key = snippet_keys.data_key_of(snippet.get("encryptionKey"))
+    if snippet.get("inlineContent") is not None:
+        return snippet_crypto.decrypt_snippet(bytes(snippet["inlineContent"]), data_key)
+    return snippet_crypto.get_snippet(s3_client, bucket, s3_key_of(snippet["s3Path"], bucket), data_key)
+
+def release(cursor, snippet):
+    """
+    Drops the snippet's reference to its content object. Returns the S3 keys the caller
+    should delete once it has committed: snippets from before content addressing and
+    client-side encrypted snippets own their object outright; shared content objects
+    are left to sweep_unreferenced(). Inline content goes with the row.
+    """
+    if snippet.get("inlineContent") is not None:
+        return []
+
+    digest = snippet.get("contentHash")
+    if not digest:
+        return [snippet["s3Path"]]
+
+    cursor.execute("UPDATE SnippetObjects SET refCount = refCount - 1 WHERE contentHash = %s", (digest,))
+    return []
+
+def delete_owned_objects(s3_client, bucket, s3_paths):
+    """Deletes objects returned by release(); call after the commit that dropped the snippet's reference."""
+    for s3_path in s3_paths:
+        s3_client.delete_object(Bucket=bucket, Key=s3_key_of(s3_path, bucket))
+        print(f"** Deleted object: {s3_path} **")
+
+def sweep_unreferenced(connection, s3_client, bucket, batch_size):
+    """
+    Deletes content objects whose refCount has dropped to 0, batch_size rows per transaction.
+    The rows stay locked while their objects are deleted, so an upload that brings the same
+    content back waits and then stores it again. Returns the number of objects removed.
+    """
+    removed = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT contentHash, s3Path FROM SnippetObjects WHERE refCount <= 0 LIMIT %s FOR UPDATE",
+                (batch_size,)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                s3_client.delete_object(Bucket=bucket, Key=s3_key_of(row["s3Path"], bucket))
+            cursor.execute(
+                "DELETE FROM SnippetObjects WHERE contentHash IN %s AND refCount <= 0",
+                (tuple(row["contentHash"] for row in rows),)
+            )
+        connection.commit()
+        removed += len(rows)
+        if len(rows) < batch_size:
+            break
+    return removed
@@ -0,0 +1,80 @@
+import re
+
+# Applies unified diffs (as produced by difflib.unified_diff or `diff -u`) to
+# snippet text, so the client can send only what changed. The patch is made
+# against a known base version, so hunks are applied strictly at the line
+# numbers they state: any context or removed line that does not match exactly
+# rejects the whole patch rather than guessing.
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+NO_NEWLINE_MARKER = "\\"
+
+class PatchError(ValueError):
+    """The patch is malformed or does not apply to the base text."""
+
+def split_lines(text):
+    """Splits on "\n" only, keeping line endings (unlike str.splitlines, which also splits on \r, \f, ...)."""
+    return [line for line in re.split(r"(?<=\n)", text) if line]
+
+def _take(lines, index):
+    """Returns the text of the diff line at index and the next index, honouring a "\\ No newline" marker."""
+    line = lines[index]
+    text = line[1:] if line != "\n" else "\n"  # some tools strip the space from empty context lines
+    index += 1
+    if index < len(lines) and lines[index].startswith(NO_NEWLINE_MARKER):
+        text = text[:-1] if text.endswith("\n") else text
+        index += 1
+    return text, index
+
+def apply_unified_diff(original, diff):
+    """Returns original with diff applied, or raises PatchError."""
+    source = split_lines(original)
+    lines = split_lines(diff)
+    result = []
+    position = 0
+    hunks = 0
+    index = 0
+
+    while index < len(lines):
+        header = HUNK_HEADER.match(lines[index])
+        if not header:
+            if hunks == 0 or lines[index].startswith(("---", "+++", "diff ", "index ")):
+                index += 1
+                continue
+            raise PatchError(f"Unexpected line {index + 1} in patch")
+
+        hunks += 1
+        old_start, old_length = int(header.group(1)), int(header.group(2) or 1)
+        new_length = int(header.group(4) or 1)
+        # An empty old range names the line the insertion follows
+        start = old_start - 1 if old_length else old_start
+        if start < position or start > len(source):
+            raise PatchError(f"Hunk {hunks} is out of order or past the end of the snippet")
+        result.extend(source[position:start])
+        position = start
+        index += 1
+
+        old_seen = new_seen = 0
+        while old_seen < old_length or new_seen < new_length:
+            if index >= len(lines):
+                raise PatchError(f"Hunk {hunks} is truncated")
+            tag = lines[index][0]
+            text, index = _take(lines, index)
+            if tag in " \n-":
+                if position >= len(source) or source[position] != text:
+                    raise PatchError(f"Hunk {hunks} does not match the snippet at line {position + 1}")
+                position += 1
+                old_seen += 1
+                if tag != "-":
+                    result.append(text)
+                    new_seen += 1
+            elif tag == "+":
+                result.append(text)
+                new_seen += 1
+            else:
+                raise PatchError(f"Unexpected line {index} in hunk {hunks}")
+
+    if hunks == 0:
+        raise PatchError("Patch contains no hunks")
+    result.extend(source[position:])
+    return "".join(result)
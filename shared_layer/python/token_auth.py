@@ -0,0 +1,199 @@
+import json
+import datetime
+import time
+import uuid
+import hmac
+import hashlib
+import base64
+from collections import OrderedDict
+
+# Shared token validation, deployed as a Lambda layer so every protected
+# handler can check tokens against the Tokens table directly instead of
+# calling the auth API over HTTP.
+
+# Validated tokens are cached per warm container. An entry is trusted until the
+# token expires or REVOCATION_WINDOW_SECONDS pass, whichever comes first, so a
+# sign-out (DELETE FROM Tokens) is seen by every container within that window.
+TOKEN_CACHE_MAX_ENTRIES = 1024
+REVOCATION_WINDOW_SECONDS = 30
+
+_token_cache = OrderedDict()  # token -> (userId, expiration_utc, recheck_at)
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Signed tokens ("st1.<payload>.<signature>") carry userId and expiry under an
+# HMAC-SHA256 signature and are verified without touching the Tokens table.
+# Signed-out tokens are listed in RevokedTokens until they expire; each container
+# reloads that (small) list at most every REVOCATION_WINDOW_SECONDS.
+SIGNED_TOKEN_PREFIX = "st1."
+
+_token_secret = None
+_revoked = {"jtis": set(), "loaded_at": None}
+
+def configure(config):
+    """Reads optional token settings from the [auth] section of a handler's config."""
+    global _token_secret
+    secret = config.get("auth", "token_secret", fallback=None)
+    _token_secret = secret.encode() if secret else None
+
+def get_token(event):
+    """Returns the token from the Authorization header ("Bearer <token>" or plain token), or None."""
+    headers = event.get("headers") or {}
+    auth_header = headers.get("Authorization")
+    if not auth_header:
+        return None
+    return auth_header.split(" ")[1] if " " in auth_header else auth_header
+
+def get_cache_stats():
+    """Returns hit/miss counters for the token cache of this container."""
+    lookups = _cache_stats["hits"] + _cache_stats["misses"]
+    return {
+        **_cache_stats,
+        "size": len(_token_cache),
+        "hitRatio": round(_cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+    }
+
+def invalidate_token(token):
+    """Drops a token from this container's cache (e.g. after signing it out)."""
+    _token_cache.pop(token, None)
+
+def _cache_get(token):
+    entry = _token_cache.get(token)
+    if not entry:
+        return None
+    user_id, expiration_utc, recheck_at = entry
+    if time.monotonic() >= recheck_at or expiration_utc < datetime.datetime.utcnow():
+        del _token_cache[token]
+        return None
+    _token_cache.move_to_end(token)
+    return user_id
+
+def _cache_put(token, user_id, expiration_utc):
+    # Never trust the entry past the token's own expiration
+    seconds_left = (expiration_utc - datetime.datetime.utcnow()).total_seconds()
+    ttl = min(REVOCATION_WINDOW_SECONDS, seconds_left)
+    if ttl <= 0:
+        return
+    _token_cache[token] = (user_id, expiration_utc, time.monotonic() + ttl)
+    _token_cache.move_to_end(token)
+    while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+        _token_cache.popitem(last=False)
+        _cache_stats["evictions"] += 1
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload_part):
+    return _b64encode(hmac.new(_token_secret, payload_part.encode(), hashlib.sha256).digest())
+
+def issue_signed_token(user_id, expiration_utc):
+    """Creates a signed token for user_id that expires at expiration_utc (naive UTC)."""
+    if not _token_secret:
+        raise ValueError("token_secret is not configured")
+    expires = int(expiration_utc.replace(tzinfo=datetime.timezone.utc).timestamp())
+    payload = {"uid": user_id, "exp": expires, "jti": uuid.uuid4().hex}
+    payload_part = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{SIGNED_TOKEN_PREFIX}{payload_part}.{_sign(payload_part)}"
+
+def decode_signed_token(token):
+    """Returns the payload of a signed token if its signature is valid, otherwise None."""
+    if not _token_secret or not token.startswith(SIGNED_TOKEN_PREFIX):
+        return None
+    try:
+        payload_part, signature = token[len(SIGNED_TOKEN_PREFIX):].split(".")
+        if not hmac.compare_digest(signature, _sign(payload_part)):
+            return None
+        return json.loads(_b64decode(payload_part))
+    except (ValueError, TypeError):
+        return None
+
+def payload_expiration(payload):
+    """Returns the expiry of a signed token payload as a naive UTC datetime."""
+    return datetime.datetime.utcfromtimestamp(payload["exp"])
+
+def _revoked_jtis(dbConn):
+    now = time.monotonic()
+    if _revoked["loaded_at"] is None or now - _revoked["loaded_at"] >= REVOCATION_WINDOW_SECONDS:
+        with dbConn.cursor() as cursor:
+            cursor.execute("SELECT jti FROM RevokedTokens WHERE expiration_utc > %s", (datetime.datetime.utcnow(),))
+            _revoked["jtis"] = {row["jti"] for row in cursor.fetchall()}
+        _revoked["loaded_at"] = now
+    return _revoked["jtis"]
+
+def _check_signed_token(dbConn, token):
+    payload = decode_signed_token(token)
+    if not payload:
+        return None, {"error": "Invalid or expired token", "loggedOut": True}
+
+    if payload["exp"] < time.time():
+        return None, {"error": "Session expired. Please log in again.", "loggedOut": True}
+
+    if payload["jti"] in _revoked_jtis(dbConn):
+        return None, {"error": "Invalid or expired token", "loggedOut": True}
+
+    return payload["uid"], None
+
+def issue_token(dbConn, user_id, duration, token_format="opaque"):
+    """
+    Issues a session token for an already authenticated user, valid for duration minutes.
+    Opaque tokens are stored in the Tokens table; signed tokens need no database write.
+    """
+    expiration_utc = datetime.datetime.utcnow() + datetime.timedelta(minutes=duration)
+
+    if token_format == "signed":
+        return issue_signed_token(user_id, expiration_utc)
+
+    token = str(uuid.uuid4())
+    with dbConn.cursor() as cursor:
+        cursor.execute("INSERT INTO Tokens (token, userId, expiration_utc) VALUES (%s, %s, %s)",
+                       (token, user_id, expiration_utc))
+    dbConn.commit()
+    return token
+
+def check_token(dbConn, token):
+    """
+    Validates an authentication token and checks if it has expired.
+    Returns (userId, None) if the token is valid, otherwise (None, error_body).
+    Valid tokens are served from the warm-container cache when possible.
+    """
+    if token.startswith(SIGNED_TOKEN_PREFIX):
+        return _check_signed_token(dbConn, token)
+
+    cached_user_id = _cache_get(token)
+    if cached_user_id:
+        _cache_stats["hits"] += 1
+        return cached_user_id, None
+    _cache_stats["misses"] += 1
+
+    with dbConn.cursor() as cursor:
+        cursor.execute("SELECT userId, expiration_utc FROM Tokens WHERE token = %s", (token,))
+        user = cursor.fetchone()
+
+    if not user:
+        return None, {"error": "Invalid or expired token", "loggedOut": True}
+
+    if user["expiration_utc"] < datetime.datetime.utcnow():
+        return None, {"error": "Session expired. Please log in again.", "loggedOut": True}
+
+    _cache_put(token, user["userId"], user["expiration_utc"])
+    return user["userId"], None
+
+def authenticate(dbConn, event):
+    """
+    Validates the Authorization header of an API Gateway event.
+    Returns (userId, None) on success, or (None, response) with a ready-to-return 401 response.
+    """
+    token = get_token(event)
+    if not token:
+        return None, {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
+
+    user_id, error = check_token(dbConn, token)
+    if error:
+        print(f"** Token rejected: {error['error']} **")
+        return None, {"statusCode": 401, "body": json.dumps(error)}
+
+    stats = get_cache_stats()
+    print(f"** Token cache: {stats['hits']} hits / {stats['misses']} misses ({stats['size']} cached) **")
+    return user_id, None
@@ -0,0 +1,55 @@
+import json
+from collections import Counter
+
+# Incrementally maintained per-user statistics (UserStats). Handlers call
+# record_upload / record_delete inside the transaction that changes Snippets,
+# so the histogram can never drift from the rows it describes. Callers make
+# their Snippets change first; a user's first stats row is built from Snippets.
+
+def file_type_of(file_name):
+    """Returns the extension counted in the summary, or None for names without one."""
+    return file_name.split(".")[-1] if "." in file_name else None
+
+def _adjust_file_type(cursor, user_id, file_name, delta):
+    file_type = file_type_of(file_name)
+    if not file_type:
+        return
+
+    # Lock the user's row so concurrent uploads serialize their read-modify-write
+    cursor.execute("SELECT fileTypeCounts FROM UserStats WHERE userId = %s FOR UPDATE", (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        # First change for this user: count everything they own, including this change
+        rebuild_user_stats(cursor, user_id)
+        return
+    counts = json.loads(row["fileTypeCounts"] or "{}")
+
+    counts[file_type] = counts.get(file_type, 0) + delta
+    if counts[file_type] <= 0:
+        del counts[file_type]
+
+    cursor.execute("UPDATE UserStats SET fileTypeCounts = %s WHERE userId = %s", (json.dumps(counts), user_id))
+
+def record_upload(cursor, user_id, file_name):
+    """Counts a new snippet in the owner's histogram; commit with the caller's transaction."""
+    _adjust_file_type(cursor, user_id, file_name, 1)
+
+def record_delete(cursor, user_id, file_name):
+    """Removes a deleted snippet from the owner's histogram; commit with the caller's transaction."""
+    _adjust_file_type(cursor, user_id, file_name, -1)
+
+def rebuild_user_stats(cursor, user_id):
+    """Recomputes one user's histogram from Snippets and returns it."""
+    cursor.execute("SELECT fileName FROM Snippets WHERE ownerId = %s", (user_id,))
+    counts = Counter(file_type_of(row["fileName"]) for row in cursor.fetchall())
+    counts.pop(None, None)
+
+    cursor.execute("""
+        INSERT INTO UserStats (userId, fileTypeCounts) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE fileTypeCounts = VALUES(fileTypeCounts)
+    """, (user_id, json.dumps(dict(counts))))
+    return dict(counts)
+
+def top_file_types(counts, limit=3):
+    """Returns the limit most common file types as {fileType: count}."""
+    return dict(Counter(counts).most_common(limit))
@@ -1,13 +1,15 @@
 import json
 import pymysql
-import boto3
+import db
 import bcrypt
 import configparser
+import token_auth
 
 # Load configuration
 config_file = "sign_in_config.ini"
 config = configparser.ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
 
 # RDS MySQL Configuration
 DB_HOST = config["rds"]["endpoint"]
@@ -16,28 +18,23 @@ DB_PASSWORD = config["rds"]["user_pwd"]
 DB_NAME = config["rds"]["db_name"]
 DB_PORT = int(config["rds"]["port_number"])
 
-# AWS Lambda Client (to call Auth Lambda)
-lambda_client = boto3.client("lambda")
+# Token Configuration ("opaque" Tokens rows or "signed" stateless tokens)
+TOKEN_FORMAT = config.get("auth", "token_format", fallback="opaque")
+TOKEN_DURATION_MINUTES = 30
 
 # Establish MySQL Connection
 def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 # Sign-In Function
 def lambda_handler(event, context):
     """
     Authenticates a user by verifying the username and hashed password.
-    If valid, calls Auth Lambda to generate a token.
+    If valid, issues a token directly; the password is checked exactly once.
     """
     print("** Sign-In Lambda Triggered **")
 
+    connection = None
     try:
         # Parse request body
         if "body" not in event:
@@ -77,36 +74,10 @@ def lambda_handler(event, context):
 
             user_id = user["userId"]
 
-        # Close DB connection
-        connection.close()
         print(f"** User {username} authenticated successfully **")
 
-        # Call Auth Lambda to get a token
-        auth_payload = {
-            "body": json.dumps({"username": username, "password": password, "duration": 30})  # 30 min token
-        }
-        print("** Invoking Auth Lambda to generate token **")
-
-        auth_response = lambda_client.invoke(
-            FunctionName="project_auth",
-            InvocationType="RequestResponse",
-            Payload=json.dumps(auth_payload),
-        )
-
-        # Read and parse the response
-        auth_result = json.loads(auth_response["Payload"].read().decode())
-        print(f"** Auth Lambda Response: {auth_result} **")
-
-        if auth_result["statusCode"] != 200:
-            print("** ERROR: Failed to generate token from Auth Lambda **")
-            return {"statusCode": 500, "body": json.dumps({"error": "Failed to generate token"})}
-
-        token_data = json.loads(auth_result["body"])
-        token = token_data.get("token")
-
-        if not token:
-            print("** ERROR: Token missing from Auth Lambda response **")
-            return {"statusCode": 500, "body": json.dumps({"error": "Token generation failed"})}
+        # Issue the token on the same connection
+        token = token_auth.issue_token(connection, user_id, TOKEN_DURATION_MINUTES, TOKEN_FORMAT)
 
         print(f"** Token generated successfully for user {username} **")
 
@@ -119,3 +90,7 @@ def lambda_handler(event, context):
     except Exception as e:
         print(f"** GENERAL ERROR: {str(e)} **")
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+    finally:
+        if connection:
+            db.release(connection)
@@ -1,11 +1,15 @@
 import json
 import pymysql
+import db
+import datetime
 from configparser import ConfigParser
+import token_auth
 
 # Load configuration
 config_file = "sign_out_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
 
 # RDS MySQL Configuration
 DB_HOST = config.get("rds", "endpoint")
@@ -16,20 +20,14 @@ DB_PORT = int(config.get("rds", "port_number"))
 
 # Establish MySQL Connection
 def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 # Sign-Out Function
 def lambda_handler(event, context):
     """
     Logs out a user by deleting their authentication token from the database.
     """
+    connection = None
     try:
         print("** Sign-Out Lambda Triggered **")
 
@@ -51,25 +49,35 @@ def lambda_handler(event, context):
         print("** Connected to Database **")
 
         with connection.cursor() as cursor:
-            # Check if token exists
-            sql = "SELECT userId FROM Tokens WHERE token = %s"
-            cursor.execute(sql, (token,))
-            user = cursor.fetchone()
-
-            if not user:
-                print("** ERROR: Invalid or expired token **")
-                return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
-
-            # Delete token from database
-            delete_sql = "DELETE FROM Tokens WHERE token = %s"
-            cursor.execute(delete_sql, (token,))
-            connection.commit()
-
-            print(f"** Token deleted successfully for user {user['userId']} **")
-
-        # Close DB connection
-        connection.close()
-        print("** Database Connection Closed **")
+            payload = token_auth.decode_signed_token(token)
+
+            if payload:
+                # Signed tokens stay valid until they expire, so record them as revoked until then
+                now = datetime.datetime.utcnow()
+                cursor.execute("DELETE FROM RevokedTokens WHERE expiration_utc < %s", (now,))
+                cursor.execute(
+                    "INSERT IGNORE INTO RevokedTokens (jti, userId, expiration_utc) VALUES (%s, %s, %s)",
+                    (payload["jti"], payload["uid"], token_auth.payload_expiration(payload))
+                )
+                connection.commit()
+
+                print(f"** Signed token revoked for user {payload['uid']} **")
+            else:
+                # Check if token exists
+                sql = "SELECT userId FROM Tokens WHERE token = %s"
+                cursor.execute(sql, (token,))
+                user = cursor.fetchone()
+
+                if not user:
+                    print("** ERROR: Invalid or expired token **")
+                    return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+
+                # Delete token from database
+                delete_sql = "DELETE FROM Tokens WHERE token = %s"
+                cursor.execute(delete_sql, (token,))
+                connection.commit()
+
+                print(f"** Token deleted successfully for user {user['userId']} **")
 
         return {"statusCode": 200, "body": json.dumps({"message": "Sign out successful"})}
 
@@ -80,3 +88,7 @@ def lambda_handler(event, context):
     except Exception as e:
         print("** ERROR: General error **", str(e))
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+    finally:
+        if connection:
+            db.release(connection)
@@ -0,0 +1,9 @@
+-- Revocation list for signed session tokens (token_format = signed).
+-- sign_out_lambda inserts a row per signed-out token and prunes rows past their expiry.
+CREATE TABLE IF NOT EXISTS RevokedTokens (
+    jti            CHAR(32)    NOT NULL,
+    userId         VARCHAR(36) NOT NULL,
+    expiration_utc DATETIME    NOT NULL,
+    PRIMARY KEY (jti),
+    INDEX idx_revoked_tokens_expiration (expiration_utc)
+);
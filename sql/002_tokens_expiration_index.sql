@@ -0,0 +1,2 @@
+-- Lets token_reaper_lambda find expired rows by range scan instead of a full table scan.
+CREATE INDEX idx_tokens_expiration ON Tokens (expiration_utc);
@@ -0,0 +1,11 @@
+-- Normalized access list, replacing JSON_CONTAINS(Snippets.allowedUsers, ...).
+-- The primary key serves "who can access this snippet"; the secondary index serves
+-- "which snippets can this user access". Backfill with scripts/migrate_snippet_permissions.py.
+CREATE TABLE IF NOT EXISTS SnippetPermissions (
+    snippetId VARCHAR(36) NOT NULL,
+    userId    VARCHAR(36) NOT NULL,
+    role      VARCHAR(16) NOT NULL DEFAULT 'editor',
+    grantedAt DATETIME    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (snippetId, userId),
+    INDEX idx_snippet_permissions_user (userId, snippetId)
+);
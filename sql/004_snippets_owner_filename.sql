@@ -0,0 +1,5 @@
+-- One file name per owner, enforced and indexed. snippet_lookup resolves every
+-- fileName through this index (and SnippetPermissions for shared snippets).
+-- Check for existing duplicates first; the ALTER fails while any remain:
+--   SELECT ownerId, fileName, COUNT(*) FROM Snippets GROUP BY ownerId, fileName HAVING COUNT(*) > 1;
+ALTER TABLE Snippets ADD UNIQUE INDEX uq_snippets_owner_filename (ownerId, fileName);
@@ -0,0 +1,12 @@
+-- Append-only download log. download_lambda inserts one row per download instead of
+-- updating the Users/Snippets counter rows; download_counter_lambda folds the rows into
+-- Snippets.downloadCount and Users.totalDownloads in batches and deletes them.
+CREATE TABLE IF NOT EXISTS DownloadEvents (
+    eventId   BIGINT      NOT NULL AUTO_INCREMENT,
+    snippetId VARCHAR(36) NOT NULL,
+    userId    VARCHAR(36) NOT NULL,
+    createdAt DATETIME    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (eventId),
+    INDEX idx_download_events_snippet (snippetId),
+    INDEX idx_download_events_user (userId)
+);
@@ -0,0 +1,9 @@
+-- Per-user file-type histogram, maintained by upload/delete in the same transaction as
+-- the Snippets change, so /summary is a single-row read. Rebuild with
+-- scripts/rebuild_user_stats.py. Upload and download totals stay in Users.
+CREATE TABLE IF NOT EXISTS UserStats (
+    userId         VARCHAR(36) NOT NULL,
+    fileTypeCounts JSON        NOT NULL,
+    updatedAt      DATETIME    NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (userId)
+);
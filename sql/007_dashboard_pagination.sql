@@ -0,0 +1,15 @@
+-- Keyset pagination and conditional GET for dashboard_lambda.
+
+-- Bumped whenever anything on a user's dashboard changes (own uploads/deletes, updates to
+-- snippets they can see, grants and revokes). The dashboard ETag is derived from it, so an
+-- unchanged dashboard is answered with 304 without reading any snippet rows.
+CREATE TABLE IF NOT EXISTS DashboardVersions (
+    userId  VARCHAR(36) NOT NULL,
+    version BIGINT      NOT NULL DEFAULT 0,
+    PRIMARY KEY (userId)
+);
+
+-- Pages are ordered by (lastUpdated, snippetId), so lastUpdated must always be set.
+UPDATE Snippets SET lastUpdated = UTC_TIMESTAMP() WHERE lastUpdated IS NULL;
+ALTER TABLE Snippets MODIFY lastUpdated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX idx_snippets_owner_updated ON Snippets (ownerId, lastUpdated, snippetId);
@@ -0,0 +1,14 @@
+-- Content-addressed snippet storage. Each distinct snippet body is stored once in S3 under
+-- its content hash; Snippets rows point at it and SnippetObjects counts the references.
+CREATE TABLE IF NOT EXISTS SnippetObjects (
+    contentHash CHAR(64)     NOT NULL,
+    s3Path      VARCHAR(512) NOT NULL,
+    refCount    INT          NOT NULL DEFAULT 0,
+    sizeBytes   BIGINT       NOT NULL,
+    createdAt   DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (contentHash)
+);
+
+-- NULL for snippets uploaded before content addressing; those keep their own s3Path object.
+ALTER TABLE Snippets ADD COLUMN contentHash CHAR(64) NULL;
+CREATE INDEX idx_snippets_content_hash ON Snippets (contentHash);
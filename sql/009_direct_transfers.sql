@@ -0,0 +1,20 @@
+-- Presigned direct uploads and downloads (client-side encrypted snippets).
+
+-- An upload the client has been given a presigned POST for but has not completed yet.
+-- The object sits under <snippets_folder>/pending/ until the completion call registers it;
+-- expired rows are removed by token_reaper_lambda and abandoned objects by an S3
+-- lifecycle rule on the pending/ prefix.
+CREATE TABLE IF NOT EXISTS PendingUploads (
+    uploadId       VARCHAR(36)  NOT NULL,
+    ownerId        VARCHAR(36)  NOT NULL,
+    fileName       VARCHAR(255) NOT NULL,
+    s3Key          VARCHAR(512) NOT NULL,
+    createdAt      DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expiration_utc DATETIME     NOT NULL,
+    PRIMARY KEY (uploadId),
+    INDEX idx_pending_uploads_expiration (expiration_utc)
+);
+
+-- Content encrypted by the client with its own key. The server never sees the plaintext,
+-- so these snippets own their object (contentHash NULL) and are only served by presigned URL.
+ALTER TABLE Snippets ADD COLUMN clientEncrypted TINYINT(1) NOT NULL DEFAULT 0;
@@ -0,0 +1,7 @@
+-- Optimistic concurrency for updates. Every content change increments version; update_lambda
+-- only applies an edit whose baseVersion matches, so concurrent editors get a 409 instead of
+-- overwriting each other.
+ALTER TABLE Snippets ADD COLUMN version INT NOT NULL DEFAULT 1;
+
+-- Content objects whose last reference was released are swept by object_sweeper_lambda.
+CREATE INDEX idx_snippet_objects_ref_count ON SnippetObjects (refCount);
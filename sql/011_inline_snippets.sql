@@ -0,0 +1,3 @@
+-- Small snippets are stored encrypted in the row instead of S3 (s3Path = 'inline'), so their
+-- upload, download and update skip the S3 round trip. NULL for snippets whose content is in S3.
+ALTER TABLE Snippets ADD COLUMN inlineContent BLOB NULL;
@@ -0,0 +1,14 @@
+-- Per-object data keys (shared_layer/python/snippet_keys.py). encryptionKey holds the object's
+-- data key wrapped with a master key ("wk1.<key id>.<...>"); NULL for objects still encrypted
+-- with the global fernet_key, which scripts/rotate_snippet_keys.py reencrypt migrates.
+ALTER TABLE SnippetObjects ADD COLUMN encryptionKey VARCHAR(255) NULL;
+
+-- Snippets.encryptionKey carries the same wrapped key for the snippet's content ('client' for
+-- client-side encrypted snippets). Rows written before this change hold the global fernet_key
+-- itself; clear it so the key is no longer stored in the database. NULL means "global key".
+ALTER TABLE Snippets MODIFY encryptionKey VARCHAR(255) NULL;
+UPDATE Snippets SET encryptionKey = NULL WHERE clientEncrypted = 0 AND encryptionKey NOT LIKE 'wk1.%';
+
+-- Lets the re-encryption job find content still under the global key (encryptionKey IS NULL).
+CREATE INDEX idx_snippets_encryption_key ON Snippets (encryptionKey);
+CREATE INDEX idx_snippet_objects_encryption_key ON SnippetObjects (encryptionKey);
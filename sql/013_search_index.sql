@@ -0,0 +1,28 @@
+-- Inverted index over SnippetMetadata for /search (shared_layer/python/search_index.py).
+-- extract_metadata_lambda rewrites a snippet's postings in the same transaction as its
+-- metadata and delete_lambda removes them. Index existing metadata with
+-- scripts/rebuild_search_index.py after applying this.
+CREATE TABLE IF NOT EXISTS SearchPostings (
+    term      VARCHAR(64) NOT NULL,
+    snippetId VARCHAR(36) NOT NULL,
+    weight    FLOAT       NOT NULL,
+    docLength FLOAT       NOT NULL,
+    PRIMARY KEY (term, snippetId),
+    KEY idx_search_postings_snippet (snippetId)
+);
+
+-- Number of indexed snippets containing each term
+CREATE TABLE IF NOT EXISTS SearchTerms (
+    term          VARCHAR(64) NOT NULL,
+    documentCount INT         NOT NULL DEFAULT 0,
+    PRIMARY KEY (term)
+);
+
+-- Single row (statsId = 1): indexed snippets and the sum of their lengths
+CREATE TABLE IF NOT EXISTS SearchStats (
+    statsId       TINYINT NOT NULL,
+    documentCount INT     NOT NULL DEFAULT 0,
+    totalLength   DOUBLE  NOT NULL DEFAULT 0,
+    PRIMARY KEY (statsId)
+);
+INSERT IGNORE INTO SearchStats (statsId, documentCount, totalLength) VALUES (1, 0, 0);
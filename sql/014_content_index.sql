@@ -0,0 +1,23 @@
+-- Trigram index over snippet content for substring and regex search
+-- (shared_layer/python/content_index.py). Upload and update index the plaintext in the same
+-- transaction as the Snippets write; delete removes it. Trigrams are stored as 32-bit keyed
+-- hashes, never as text. Index existing snippets with scripts/rebuild_content_index.py.
+CREATE TABLE IF NOT EXISTS SnippetTextIndex (
+    docId     INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    snippetId VARCHAR(36)  NOT NULL,
+    -- The snippet's sorted trigram hashes, packed and compressed, so a reindex or delete
+    -- touches only the SnippetTrigrams rows that change
+    trigrams  MEDIUMBLOB   NOT NULL,
+    -- 1 when the snippet is longer than max_indexed_bytes and only its start was indexed;
+    -- such snippets are checked against every query instead of being filtered by trigram
+    partial   TINYINT(1)   NOT NULL DEFAULT 0,
+    PRIMARY KEY (docId),
+    UNIQUE KEY uq_snippet_text_index_snippet (snippetId),
+    INDEX idx_snippet_text_index_partial (partial, snippetId)
+);
+
+CREATE TABLE IF NOT EXISTS SnippetTrigrams (
+    trigram INT UNSIGNED NOT NULL,
+    docId   INT UNSIGNED NOT NULL,
+    PRIMARY KEY (trigram, docId)
+);
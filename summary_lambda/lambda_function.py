@@ -1,13 +1,16 @@
 import json
 import pymysql
-import requests
-from collections import Counter
+import db
+import token_auth
+import download_counters
+import user_stats
 from configparser import ConfigParser
 
 # Load Config
 config_file = "summary_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
 
 # Database Config
 DB_HOST = config["rds"]["endpoint"]
@@ -16,42 +19,30 @@ DB_PASSWORD = config["rds"]["user_pwd"]
 DB_NAME = config["rds"]["db_name"]
 DB_PORT = int(config["rds"]["port_number"])
 
-# Auth Config
-AUTH_API_URL = config["auth"]["api_url"]
-
 def get_db_connection():
     """Establishes and returns a database connection."""
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 def lambda_handler(event, context):
     connection = None
     try:
         print("** Summary Lambda Triggered **")
 
-        # Validate Token
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        connection = get_db_connection()
 
-        requester_id = json.loads(auth_response.text)["userId"]
+        # Validate Token
+        requester_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
-        connection = get_db_connection()
         with connection.cursor() as cursor:
-            # Fetch user details
-            cursor.execute("SELECT username, totalUploads, totalDownloads FROM Users WHERE userId = %s", (requester_id,))
+            # Fetch user details and the maintained file-type histogram in one row
+            cursor.execute("""
+                SELECT u.username, u.totalUploads, s.fileTypeCounts
+                FROM Users u
+                LEFT JOIN UserStats s ON s.userId = u.userId
+                WHERE u.userId = %s
+            """, (requester_id,))
             user_data = cursor.fetchone()
 
             if not user_data:
@@ -59,16 +50,17 @@ def lambda_handler(event, context):
 
             username = user_data["username"]
             total_uploads = user_data["totalUploads"]
-            total_downloads = user_data["totalDownloads"]
+            # Include downloads that download_counter_lambda has not folded in yet
+            total_downloads = download_counters.get_user_download_total(cursor, requester_id)
 
-            # Fetch all files uploaded by the user
-            cursor.execute("SELECT fileName FROM Snippets WHERE ownerUsername = %s", (username,))
-            snippets = cursor.fetchall()
+            if user_data["fileTypeCounts"] is None:
+                # No stats row yet (e.g. created before UserStats existed): build it once
+                file_type_counts = user_stats.rebuild_user_stats(cursor, requester_id)
+                connection.commit()
+            else:
+                file_type_counts = json.loads(user_data["fileTypeCounts"])
 
-            # Compute file type distribution
-            file_extensions = [file["fileName"].split('.')[-1] for file in snippets if '.' in file["fileName"]]
-            file_type_counts = Counter(file_extensions)
-            most_active_file_types = dict(file_type_counts.most_common(3))  # Top 3 most uploaded file types
+            most_active_file_types = user_stats.top_file_types(file_type_counts, 3)  # Top 3 most uploaded file types
 
         # Prepare Summary
         summary = {
@@ -90,5 +82,4 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
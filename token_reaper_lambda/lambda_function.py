@@ -0,0 +1,102 @@
+import json
+import time
+import datetime
+import pymysql
+import db
+from configparser import ConfigParser
+
+# Load configuration
+config_file = "token_reaper_config.ini"
+config = ConfigParser()
+config.read(config_file)
+
+# RDS MySQL Configuration
+DB_HOST = config.get("rds", "endpoint")
+DB_USER = config.get("rds", "user_name")
+DB_PASSWORD = config.get("rds", "user_pwd")
+DB_NAME = config.get("rds", "db_name")
+DB_PORT = int(config.get("rds", "port_number"))
+
+# Reaper Settings
+BATCH_SIZE = config.getint("reaper", "batch_size", fallback=500)
+# Keep recently expired tokens a little longer so clients still get "Session expired"
+GRACE_MINUTES = config.getint("reaper", "grace_minutes", fallback=60)
+# Stop before the Lambda timeout; the next scheduled run picks up the rest
+STOP_WHEN_REMAINING_MS = 10000
+
+# Establish MySQL Connection
+def get_db_connection():
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
+
+def reap_expired(connection, table, key_column, cutoff, batch_size, context=None):
+    """
+    Deletes rows of table whose expiration_utc is before cutoff, batch_size rows at a time.
+    Each batch is its own short transaction, so no lock is held across the whole run.
+    Returns the number of rows reclaimed and the number of batches.
+    """
+    reclaimed = 0
+    batches = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {key_column} FROM {table} WHERE expiration_utc < %s ORDER BY expiration_utc LIMIT %s",
+                (cutoff, batch_size)
+            )
+            keys = [row[key_column] for row in cursor.fetchall()]
+            if not keys:
+                break
+
+            cursor.execute(f"DELETE FROM {table} WHERE {key_column} IN %s", (tuple(keys),))
+            reclaimed += cursor.rowcount
+        connection.commit()
+        batches += 1
+
+        if len(keys) < batch_size:
+            break
+        if context and context.get_remaining_time_in_millis() < STOP_WHEN_REMAINING_MS:
+            print(f"** Stopping early on {table} to stay within the Lambda timeout **")
+            break
+
+    return reclaimed, batches
+
+# Token Reaper Function (scheduled)
+def lambda_handler(event, context):
+    """
+    Removes expired rows from Tokens, RevokedTokens and PendingUploads and reports what was reclaimed.
+    """
+    connection = None
+    try:
+        print("** Token Reaper Lambda Triggered **")
+
+        event = event or {}
+        batch_size = int(event.get("batchSize", BATCH_SIZE))
+        now = datetime.datetime.utcnow()
+
+        connection = get_db_connection()
+        print("** Connected to Database **")
+
+        report = {}
+        for table, key_column, cutoff in [
+            ("Tokens", "token", now - datetime.timedelta(minutes=GRACE_MINUTES)),
+            ("RevokedTokens", "jti", now),
+            ("PendingUploads", "uploadId", now),
+        ]:
+            start = time.perf_counter()
+            reclaimed, batches = reap_expired(connection, table, key_column, cutoff, batch_size, context)
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            report[table] = {"rowsReclaimed": reclaimed, "batches": batches, "elapsedMs": elapsed_ms}
+            print(f"** {table}: reclaimed {reclaimed} rows in {batches} batches ({elapsed_ms} ms) **")
+
+        return {"statusCode": 200, "body": json.dumps({"message": "Expired tokens reaped.", "report": report})}
+
+    except pymysql.MySQLError as e:
+        print("** ERROR: Database error **", str(e))
+        return {"statusCode": 500, "body": json.dumps({"error": "Database error", "details": str(e)})}
+
+    except Exception as e:
+        print("** ERROR: General error **", str(e))
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+    finally:
+        if connection:
+            db.release(connection)
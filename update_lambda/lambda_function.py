@@ -1,15 +1,27 @@
 import json
 import pymysql
-import boto3
+import db
+import backends
 from configparser import ConfigParser
-from cryptography.fernet import Fernet
-import requests
+import token_auth
+import snippet_crypto
+import snippet_keys
+import snippet_lookup
+import dashboard_versions
+import snippet_objects
+import snippet_patch
+import content_index
 import datetime
 
 # Load Config
 config_file = "update_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
+snippet_crypto.configure(config)
+snippet_keys.configure(config)
+snippet_objects.configure(config)
+content_index.configure(config)
 
 # Database Config
 DB_HOST = config["rds"]["endpoint"]
@@ -20,102 +32,119 @@ DB_PORT = int(config["rds"]["port_number"])
 
 # S3 Config
 S3_BUCKET = config["s3"]["bucket_name"]
-S3_CLIENT = boto3.client("s3")
+S3_SNIPPETS_FOLDER = config["s3"]["snippets_folder"]
+S3_CLIENT = backends.client("s3")
 
-# Auth Config
-AUTH_API_URL = config["auth"]["api_url"]
-
-# Encryption
+# Keys the content hash; content itself is encrypted with per-object data keys (snippet_keys)
 FERNET_KEY = config["encryption"]["fernet_key"]
-cipher = Fernet(FERNET_KEY.encode())
 
 def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-def encrypt_snippet(snippet_text):
-    return cipher.encrypt(snippet_text.encode()).decode()
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
 
 def lambda_handler(event, context):
     connection = None
     try:
         print("** Update Lambda Triggered **")
 
-        # Validate Token
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
+        connection = get_db_connection()
 
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        # Validate Token
+        requester_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
-        requester_id = json.loads(auth_response.text)["userId"]
+        token = token_auth.get_token(event)
 
         # Parse body
         body = json.loads(event["body"])
         file_name = body.get("fileName")
         new_file_content = body.get("fileContent")
+        patch = body.get("patch")  # unified diff against baseVersion, instead of fileContent
+        base_version = body.get("baseVersion")  # version the client last downloaded
 
-        if not file_name or not new_file_content:
+        if not file_name or not (new_file_content or patch):
             return {"statusCode": 400, "body": json.dumps({"error": "Missing fileName or fileContent"})}
 
-        connection = get_db_connection()
-        with connection.cursor() as cursor:
-            # Verify snippet exists and user has permission to update it
-            cursor.execute("""
-                SELECT snippetId, ownerId, allowedUsers, s3Path, fileName
-                FROM Snippets
-                WHERE fileName = %s AND (ownerId = %s OR JSON_CONTAINS(allowedUsers, %s))
-            """, (file_name, requester_id, json.dumps(requester_id)))
+        if not isinstance(base_version, int):
+            return {"statusCode": 400, "body": json.dumps({"error": "Missing baseVersion. Download the snippet first and send its version."})}
 
-            snippet = cursor.fetchone()
-
-            snippet_id = snippet["snippetId"]
+        with connection.cursor() as cursor:
+            # Verify snippet exists and user has permission to update it (owner or granted access)
+            snippet = snippet_lookup.find_accessible_snippet(cursor, requester_id, file_name)
 
             if not snippet:
                 return {"statusCode": 404, "body": json.dumps({"error": "Snippet not found."})}
 
-            allowed_users = json.loads(snippet["allowedUsers"])
-
-            # Check if requester is either the owner or in the allowedUsers list
-            if requester_id != snippet["ownerId"] and requester_id not in allowed_users:
-                return {"statusCode": 403, "body": json.dumps({"error": "You do not have permission to update this snippet."})}
+            snippet_id = snippet["snippetId"]
 
-            old_s3_key = snippet["s3Path"].replace(f"s3://{S3_BUCKET}/", "")
             file_name = snippet["fileName"]
 
-            # Encrypt new content
-            encrypted_data = encrypt_snippet(new_file_content)
-
-            # Delete old file from S3
-            S3_CLIENT.delete_object(Bucket=S3_BUCKET, Key=old_s3_key)
-            print(f"Deleted old file from S3: {old_s3_key}")
-
-            # Upload new encrypted file to S3
-            S3_CLIENT.put_object(Bucket=S3_BUCKET, Key=old_s3_key, Body=encrypted_data)
-            print(f"Uploaded new version to S3: {old_s3_key}")
-
-            # Update timestamp in DB
+            # Lock the row and compare versions; a concurrent editor waits here and then gets a 409
+            cursor.execute(
+                "SELECT s3Path, inlineContent, encryptionKey, contentHash, clientEncrypted, version FROM Snippets WHERE snippetId = %s FOR UPDATE",
+                (snippet_id,)
+            )
+            current = cursor.fetchone()
+            if not current:
+                return {"statusCode": 404, "body": json.dumps({"error": "Snippet not found."})}
+            if current["version"] != base_version:
+                print(f"** Version conflict on {snippet_id}: base {base_version}, current {current['version']} **")
+                return {
+                    "statusCode": 409,
+                    "body": json.dumps({
+                        "error": "The snippet was changed by someone else since you downloaded it.",
+                        "currentVersion": current["version"]
+                    })
+                }
+
+            # Rebuild the new content from the base version and the client's patch
+            if patch:
+                if current["clientEncrypted"]:
+                    return {"statusCode": 400, "body": json.dumps({"error": "Client-side encrypted snippets cannot be patched; send fileContent."})}
+                base_content = snippet_objects.load_content(S3_CLIENT, S3_BUCKET, current)
+                try:
+                    new_file_content = snippet_patch.apply_unified_diff(base_content, patch)
+                except snippet_patch.PatchError as e:
+                    print(f"** Patch rejected for {snippet_id}: {e} **")
+                    return {"statusCode": 422, "body": json.dumps({"error": f"Patch does not apply: {e}"})}
+                print(f"Applied {len(patch)}-character patch to snippet: {snippet_id}")
+
+            # Write the new content first (nothing if it is already stored, or if it is small enough to
+            # live in the row), then switch the row to it in the same transaction that releases the old
+            # content, so a failure at any point leaves the snippet on either its old or its new content
+            content_hash = snippet_objects.content_hash(FERNET_KEY, new_file_content)
             updated_at = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute("""
-                UPDATE Snippets
-                SET lastUpdated = %s
-                WHERE snippetId = %s
-            """, (updated_at, snippet_id))
+            new_version = current["version"] + 1
+            released_paths = []
+            if content_hash == current["contentHash"]:
+                print(f"Content unchanged for snippet: {snippet_id}")
+                cursor.execute("UPDATE Snippets SET lastUpdated = %s, version = %s WHERE snippetId = %s",
+                               (updated_at, new_version, snippet_id))
+            else:
+                s3_uri, inline_content, encryption_key = snippet_objects.store_content(
+                    cursor, S3_CLIENT, S3_BUCKET, S3_SNIPPETS_FOLDER, content_hash, new_file_content
+                )
+                cursor.execute("""
+                    UPDATE Snippets
+                    SET s3Path = %s, inlineContent = %s, encryptionKey = %s, contentHash = %s, clientEncrypted = 0,
+                        lastUpdated = %s, version = %s
+                    WHERE snippetId = %s
+                """, (s3_uri, inline_content, encryption_key, content_hash, updated_at, new_version, snippet_id))
+                released_paths = snippet_objects.release(cursor, current)
+
+                # Only the postings of trigrams that appeared or disappeared are written
+                content_index.index_content(cursor, snippet_id, new_file_content)
+
+            # lastModified changes on every dashboard that lists the snippet
+            dashboard_versions.bump_for_snippet(cursor, snippet_id)
 
             connection.commit()
 
+            # Objects only this snippet used (legacy or client-side encrypted) go once the switch is committed
+            snippet_objects.delete_owned_objects(S3_CLIENT, S3_BUCKET, released_paths)
+
             # Trigger Extract Metadata Lambda
-            lambda_client = boto3.client("lambda")
+            lambda_client = backends.client("lambda")
 
             extract_payload = {
                 "headers": {
@@ -142,7 +171,8 @@ def lambda_handler(event, context):
             "body": json.dumps({
                 "message": "Snippet updated successfully.",
                 "snippetId": snippet_id,
-                "updatedAt": updated_at
+                "updatedAt": updated_at,
+                "version": new_version
             })
         }
 
@@ -153,5 +183,4 @@ def lambda_handler(event, context):
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
     finally:
         if connection:
-            connection.close()
-            print("** Database Connection Closed **")
+            db.release(connection)
@@ -1,15 +1,29 @@
 import json
 import pymysql
-import boto3
+import db
+import backends
 import uuid
+from botocore.exceptions import ClientError
 from configparser import ConfigParser
-from cryptography.fernet import Fernet
-import requests
+import token_auth
+import snippet_crypto
+import snippet_keys
+import snippet_lookup
+import user_stats
+import dashboard_versions
+import snippet_objects
+import content_index
+import datetime
 
 # Load Config
 config_file = "upload_config.ini"
 config = ConfigParser()
 config.read(config_file)
+token_auth.configure(config)
+snippet_crypto.configure(config)
+snippet_keys.configure(config)
+snippet_objects.configure(config)
+content_index.configure(config)
 
 # Database Configuration
 DB_HOST = config["rds"]["endpoint"]
@@ -21,81 +35,165 @@ DB_PORT = int(config["rds"]["port_number"])
 # S3 Configuration
 S3_BUCKET = config["s3"]["bucket_name"]
 S3_SNIPPETS_FOLDER = config["s3"]["snippets_folder"]
-S3_CLIENT = boto3.client("s3")
+S3_CLIENT = backends.client("s3")
 
-# API Gateway Authentication Endpoint
-AUTH_API_URL = config["auth"]["api_url"]
+# Direct (presigned) uploads of client-side encrypted snippets
+PRESIGNED_URL_SECONDS = config.getint("s3", "presigned_url_seconds", fallback=900)
+DIRECT_UPLOAD_MAX_BYTES = config.getint("s3", "direct_upload_max_bytes", fallback=100 * 1024 * 1024)
+# Time after the URL expires in which a finished upload can still be completed
+COMPLETE_WITHIN_SECONDS = 3600
 
-# Encryption Key
+# Keys the content hash; content itself is encrypted with per-object data keys (snippet_keys)
 FERNET_KEY = config["encryption"]["fernet_key"]
-cipher = Fernet(FERNET_KEY.encode())
 
 # Function to Connect to MySQL
 def get_db_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        cursorclass=pymysql.cursors.DictCursor
+    return db.get_connection(DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT)
+
+def begin_direct_upload(connection, owner_id, file_name):
+    """Registers a pending upload and returns a presigned POST the client sends the (encrypted) bytes to."""
+    if not file_name:
+        return {"statusCode": 400, "body": json.dumps({"error": "Missing required fields"})}
+
+    with connection.cursor() as cursor:
+        if snippet_lookup.find_owned_snippet(cursor, owner_id, file_name):
+            return {"statusCode": 400, "body": json.dumps({"error": "A file with this name already exists for your account."})}
+
+        upload_id = str(uuid.uuid4())
+        s3_key = f"{S3_SNIPPETS_FOLDER}/pending/{upload_id}"
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=PRESIGNED_URL_SECONDS + COMPLETE_WITHIN_SECONDS)
+        cursor.execute(
+            "INSERT INTO PendingUploads (uploadId, ownerId, fileName, s3Key, expiration_utc) VALUES (%s, %s, %s, %s, %s)",
+            (upload_id, owner_id, file_name, s3_key, expires_at.strftime('%Y-%m-%d %H:%M:%S'))
+        )
+    connection.commit()
+
+    post = S3_CLIENT.generate_presigned_post(
+        Bucket=S3_BUCKET,
+        Key=s3_key,
+        Conditions=[["content-length-range", 1, DIRECT_UPLOAD_MAX_BYTES]],
+        ExpiresIn=PRESIGNED_URL_SECONDS
     )
+    print(f"** Presigned upload {upload_id} issued for {file_name} **")
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": "Upload the file to the returned URL, then complete the upload.",
+            "uploadId": upload_id,
+            "url": post["url"],
+            "fields": post["fields"],
+            "expiresIn": PRESIGNED_URL_SECONDS,
+            "maxBytes": DIRECT_UPLOAD_MAX_BYTES
+        })
+    }
+
+def is_duplicate_file_name(error_msg):
+    """True for a unique violation on (ownerId, fileName), from MySQL or the local SQLite backend."""
+    return "uq_snippets_owner_filename" in error_msg or "Snippets.ownerId, Snippets.fileName" in error_msg
+
+def complete_direct_upload(connection, owner_id, upload_id):
+    """Moves an uploaded object out of pending/ and registers it as a client-side encrypted snippet."""
+    if not upload_id:
+        return {"statusCode": 400, "body": json.dumps({"error": "Missing uploadId"})}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT fileName, s3Key FROM PendingUploads WHERE uploadId = %s AND ownerId = %s FOR UPDATE",
+            (upload_id, owner_id)
+        )
+        pending = cursor.fetchone()
+        if not pending:
+            return {"statusCode": 404, "body": json.dumps({"error": "Upload not found or already completed."})}
 
-# Encrypt Function
-def encrypt_snippet(snippet_text):
-    return cipher.encrypt(snippet_text.encode()).decode()
+        try:
+            S3_CLIENT.head_object(Bucket=S3_BUCKET, Key=pending["s3Key"])
+        except ClientError:
+            return {"statusCode": 400, "body": json.dumps({"error": "Nothing has been uploaded for this uploadId yet."})}
+
+        file_name = pending["fileName"]
+        snippet_id = str(uuid.uuid4())
+        s3_key = f"{S3_SNIPPETS_FOLDER}/direct/{snippet_id}"
+        s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
+
+        # Server-side copy; the bytes never pass through Lambda
+        S3_CLIENT.copy_object(Bucket=S3_BUCKET, Key=s3_key, CopySource={"Bucket": S3_BUCKET, "Key": pending["s3Key"]})
+
+        try:
+            cursor.execute("SELECT username FROM Users WHERE userId = %s", (owner_id,))
+            owner_info = cursor.fetchone()
+            owner_username = owner_info["username"] if owner_info else "Unknown"
+
+            uploaded_at = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute("""INSERT INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, contentHash, clientEncrypted, encryptionKey, allowedUsers, lastUpdated)
+                        VALUES (%s, %s, %s, %s, %s, %s, NULL, 1, %s, %s, %s)""",
+                           (snippet_id, owner_id, owner_username, file_name, file_name.split(".")[-1], s3_uri, "client", "[]", uploaded_at))
+
+            cursor.execute("UPDATE Users SET totalUploads = IFNULL(totalUploads, 0) + 1 WHERE userId = %s", (owner_id,))
+            user_stats.record_upload(cursor, owner_id, file_name)
+            dashboard_versions.bump(cursor, [owner_id])
+            cursor.execute("DELETE FROM PendingUploads WHERE uploadId = %s", (upload_id,))
+            connection.commit()
+        except pymysql.MySQLError:
+            # No row points at the copy (e.g. another upload took the file name first); the pending object stays
+            connection.rollback()
+            S3_CLIENT.delete_object(Bucket=S3_BUCKET, Key=s3_key)
+            raise
+
+    S3_CLIENT.delete_object(Bucket=S3_BUCKET, Key=pending["s3Key"])
+    print(f"** Direct upload {upload_id} registered as snippet {snippet_id} **")
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"message": "Upload successful", "snippetId": snippet_id, "s3Uri": s3_uri})
+    }
 
 # Lambda Handler for Upload
 def lambda_handler(event, context):
+    connection = None
     try:
         print("** Upload Lambda Triggered **")
 
-        # Validate Token from Authorization header
-        if "headers" not in event or "Authorization" not in event["headers"]:
-            return {"statusCode": 401, "body": json.dumps({"error": "Missing Authorization token"})}
-
-        auth_header = event["headers"]["Authorization"]
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header  # Support "Bearer <token>" or plain token
-
-        auth_response = requests.post(AUTH_API_URL, json={"token": token})
+        # Database Connection
+        connection = get_db_connection()
 
-        if auth_response.status_code != 200:
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid or expired token"})}
+        # Validate Token from Authorization header
+        authenticated_user_id, auth_error = token_auth.authenticate(connection, event)
+        if auth_error:
+            return auth_error
 
-        # Extract the authenticated userId
-        authenticated_user_id = json.loads(auth_response.text)["userId"]
+        token = token_auth.get_token(event)
 
         # Parse Request
         body = json.loads(event["body"])
         file_name = body.get("fileName")
         file_content = body.get("fileContent")
 
+        # Direct mode: the client transfers client-side encrypted bytes to S3 itself
+        if body.get("mode") == "presigned":
+            return begin_direct_upload(connection, authenticated_user_id, file_name)
+        if body.get("mode") == "complete":
+            return complete_direct_upload(connection, authenticated_user_id, body.get("uploadId"))
+
         if not file_name or not file_content:
             return {"statusCode": 400, "body": json.dumps({"error": "Missing required fields"})}
 
-        # Database Connection
-        connection = get_db_connection()
-
         with connection.cursor() as cursor:
             # CHECK IF FILE ALREADY EXISTS FOR THIS USER
-            cursor.execute("SELECT snippetId FROM Snippets WHERE fileName = %s AND ownerId = %s", 
-                           (file_name, authenticated_user_id))
-            existing_snippet = cursor.fetchone()
+            existing_snippet = snippet_lookup.find_owned_snippet(cursor, authenticated_user_id, file_name)
 
             if existing_snippet:
                 return {"statusCode": 400, "body": json.dumps({"error": "A file with this name already exists for your account."})}
 
-            # Generate new snippet ID and S3 key
+            # Generate new snippet ID
             snippet_id = str(uuid.uuid4())
-            s3_key = f"{S3_SNIPPETS_FOLDER}/{file_name}"
-            s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
-
-            # Encrypt Content
-            encrypted_data = encrypt_snippet(file_content)
 
-            # Upload to S3
-            S3_CLIENT.put_object(Bucket=S3_BUCKET, Key=s3_key, Body=encrypted_data)
-            print(f"** Uploaded to S3: {s3_uri} **")
+            # Small snippets are kept encrypted in the row; larger ones are stored under their hash,
+            # so identical content is uploaded once
+            content_hash = snippet_objects.content_hash(FERNET_KEY, file_content)
+            s3_uri, inline_content, encryption_key = snippet_objects.store_content(
+                cursor, S3_CLIENT, S3_BUCKET, S3_SNIPPETS_FOLDER, content_hash, file_content
+            )
 
             file_extension = file_name.split(".")[-1]
 
@@ -105,20 +203,29 @@ def lambda_handler(event, context):
             owner_username = owner_info["username"] if owner_info else "Unknown"  # Ensure a default value if missing
 
             # Store Metadata in Database with ownerUsername
-            sql = """INSERT INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, encryptionKey, allowedUsers)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-            cursor.execute(sql, (snippet_id, authenticated_user_id, owner_username, file_name, file_extension, s3_uri, FERNET_KEY, "[]"))
+            uploaded_at = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            sql = """INSERT INTO Snippets (snippetId, ownerId, ownerUsername, fileName, fileType, s3Path, inlineContent, contentHash, encryptionKey, allowedUsers, lastUpdated)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+            cursor.execute(sql, (snippet_id, authenticated_user_id, owner_username, file_name, file_extension, s3_uri, inline_content, content_hash, encryption_key, "[]", uploaded_at))
+
+            # Index the plaintext for content search while we still hold it
+            content_index.index_content(cursor, snippet_id, file_content)
 
             # Increment the owner's upload count
             cursor.execute("UPDATE Users SET totalUploads = IFNULL(totalUploads, 0) + 1 WHERE userId = %s", (authenticated_user_id,))
 
+            # Count the file type in the owner's summary stats
+            user_stats.record_upload(cursor, authenticated_user_id, file_name)
+
+            # The new snippet appears on the owner's dashboard
+            dashboard_versions.bump(cursor, [authenticated_user_id])
+
 
         connection.commit()
-        connection.close()
         print(f"** Metadata stored in DB for snippet: {snippet_id} **")
 
         # Initialize Lambda Client
-        lambda_client = boto3.client("lambda")
+        lambda_client = backends.client("lambda")
 
         # Trigger Extract Metadata Lambda
         extract_payload = {
@@ -161,6 +268,9 @@ def lambda_handler(event, context):
                     "details": "The ownerId value in Snippets does not exist in the Users table. Please ensure the user exists before inserting a snippet."
                 })
             }
+        elif is_duplicate_file_name(error_msg):
+            # Another upload created the same (ownerId, fileName) after our existence check
+            return {"statusCode": 400, "body": json.dumps({"error": "A file with this name already exists for your account."})}
         elif "Duplicate entry" in error_msg:
             return {
                 "statusCode": 400,
@@ -180,3 +290,6 @@ def lambda_handler(event, context):
     except Exception as e:
         print(f"** General Error: {str(e)} **")
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+    finally:
+        if connection:
+            db.release(connection)